@@ -0,0 +1,180 @@
+"""
+Benchmark of the is_news_article content check: full cleanHtml against the streaming scorer
+(src/article_scorer.py), which falls back to cleanHtml only when it is unsure.
+
+For every page both checks are run; the report gives how often their verdicts agree, the pages
+where they differ, the CPU time of each, and how often the scorer needed the fallback.
+Pages come from a collector working directory (blobs/index.sqlite and its segments), a tree
+of .html.gz/.html.zst files, WARC files (needs warcio), or the synthetic news sites:
+
+    python benchmarks/article-check-benchmark.py --workdir src
+    python benchmarks/article-check-benchmark.py --html-dir results/html/news --warc results/warc/wget/*.warc.gz
+    python benchmarks/article-check-benchmark.py --sites 16 --pages 32 --output article-check.json
+"""
+import argparse
+import collections
+import json
+import os
+import sqlite3
+import sys
+import time
+
+try:
+    from warcio.archiveiterator import ArchiveIterator
+except ImportError:  # optional: only --warc needs it
+    ArchiveIterator = None
+
+from synthetic_news_server import SyntheticSite
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from NwalaTextUtils.textutils import cleanHtml  # noqa: E402
+
+from article_scorer import MIN_TEXT_CHARS, is_article_text  # noqa: E402
+from compression import read_page  # noqa: E402
+from page_encoding import decode_page, page_encoding  # noqa: E402
+
+
+def pages_from_workdir(workdir, limit):
+    """Read up to limit distinct pages through a collector's blob store, as text."""
+    from blob_store import BLOB_DIR, BLOB_INDEX, BlobStore
+    os.chdir(workdir)
+    db = sqlite3.connect(os.path.join(BLOB_DIR, BLOB_INDEX))
+    rows = db.execute("SELECT sha256, MIN(url) FROM refs GROUP BY sha256 ORDER BY MIN(id) LIMIT ?", (limit,)).fetchall()
+    db.close()
+    store = BlobStore()
+    return [(url, store.get_text(sha256)) for sha256, url in rows]
+
+
+def pages_from_html_dir(html_dir, limit):
+    pages = []
+    for root, _, files in os.walk(html_dir):
+        for filename in sorted(files):
+            if filename.endswith((".html.gz", ".html.zst")) and len(pages) < limit:
+                data = read_page(os.path.join(root, filename))
+                pages.append((os.path.join(root, filename), decode_page(data, page_encoding(data)[0])))
+    return pages
+
+
+def pages_from_warcs(filepaths, limit):
+    """The HTML responses of WARC files."""
+    if ArchiveIterator is None:
+        sys.exit("warcio is required to read WARC files: pip install warcio")
+    pages = []
+    for filepath in filepaths:
+        with open(filepath, 'rb') as f:
+            for record in ArchiveIterator(f):
+                if record.rec_type != 'response' or not record.http_headers:
+                    continue
+                if 'html' not in (record.http_headers.get_header('Content-Type') or ''):
+                    continue
+                data = record.content_stream().read()
+                headers = dict(record.http_headers.headers)
+                pages.append((record.rec_headers.get_header('WARC-Target-URI'),
+                              decode_page(data, page_encoding(data, headers)[0])))
+                if len(pages) >= limit:
+                    return pages
+    return pages
+
+
+def synthetic_pages(nsites, npages, seed):
+    """Article pages and homepages (link lists) of the synthetic sites."""
+    kinds = ['html', 'rss', 'atom', 'redirect']
+    pages = []
+    for i in range(nsites):
+        site = SyntheticSite(i, kinds[i % len(kinds)], seed=seed)
+        pages.append((f"s{i}/", site.homepage()))
+        pages.extend((f"s{i}/{site.article_path(k)}", site.article(k)) for k in range(npages))
+    return pages
+
+
+def cpu_time(function, *args):
+    start = time.process_time()
+    result = function(*args)
+    return result, time.process_time() - start
+
+
+def bench(pages):
+    # Warm up both checks so one-time setup is not counted against the first page
+    cleanHtml(pages[0][1])
+    is_article_text(pages[0][1])
+    results = []
+    for url, html in pages:
+        plaintext, clean_seconds = cpu_time(cleanHtml, html)
+        (verdict, reason), score_seconds = cpu_time(is_article_text, html)
+        results.append({
+            'url': url,
+            'bytes': len(html),
+            'clean_verdict': len(plaintext) > MIN_TEXT_CHARS,
+            'score_verdict': verdict,
+            'reason': reason,
+            'clean_seconds': clean_seconds,
+            'score_seconds': score_seconds,
+        })
+    return results
+
+
+def summarize(results):
+    clean_seconds = sum(result['clean_seconds'] for result in results)
+    score_seconds = sum(result['score_seconds'] for result in results)
+    disagreements = [result for result in results if result['clean_verdict'] != result['score_verdict']]
+    return {
+        'pages': len(results),
+        'articles': sum(1 for result in results if result['clean_verdict']),
+        'agreement': 1 - len(disagreements) / len(results),
+        'false_positives': [result['url'] for result in disagreements if result['score_verdict']],
+        'false_negatives': [result['url'] for result in disagreements if not result['score_verdict']],
+        'reasons': dict(collections.Counter(result['reason'] for result in results)),
+        'clean_cpu_seconds': clean_seconds,
+        'score_cpu_seconds': score_seconds,
+        'speedup': clean_seconds / score_seconds if score_seconds else 0.0,
+    }
+
+
+def print_report(report):
+    print(f"\n{report['pages']} pages ({report['articles']} articles by cleanHtml), "
+          f"verdicts agree on {report['agreement']:.1%}")
+    print(f"  cleanHtml CPU {report['clean_cpu_seconds'] * 1000:.1f}ms, scorer CPU {report['score_cpu_seconds'] * 1000:.1f}ms "
+          f"({report['speedup']:.1f}x faster)")
+    print(f"  scorer verdicts by reason: {report['reasons']}")
+    for label in ('false_positives', 'false_negatives'):
+        for url in report[label][:10]:
+            print(f"  {label[:-1].replace('_', ' ')}: {url}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workdir", help="collector working directory with blobs/ and segments/")
+    parser.add_argument("--html-dir", help="directory tree of stored .html.gz/.html.zst pages")
+    parser.add_argument("--warc", nargs="+", help="WARC files whose HTML responses are checked")
+    parser.add_argument("--sites", type=int, default=16, help="number of synthetic sites")
+    parser.add_argument("--pages", type=int, default=32, help="synthetic articles per site")
+    parser.add_argument("--limit", type=int, default=1000, help="pages read from each source")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    pages = []
+    if args.html_dir:
+        pages += pages_from_html_dir(args.html_dir, args.limit)
+    if args.warc:
+        pages += pages_from_warcs(args.warc, args.limit)
+    if args.workdir:
+        pages += pages_from_workdir(args.workdir, args.limit)
+    if not (args.html_dir or args.warc or args.workdir):
+        pages = synthetic_pages(args.sites, args.pages, args.seed)
+    if not pages:
+        sys.exit("No pages to check")
+
+    results = bench(pages)
+    report = dict(summarize(results), config=vars(args))
+    print_report(report)
+    if output:
+        with open(output, "w") as f:
+            json.dump(dict(report, results=results), f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
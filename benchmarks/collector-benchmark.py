@@ -0,0 +1,208 @@
+"""
+Offline throughput benchmark for the collectors.
+
+Starts a synthetic local news server, runs html-news-collector's process_publication and the
+status/feed-discovery scripts against it, and reports articles/sec, requests per article,
+bytes written and p50/p99 latencies.
+
+    python benchmarks/collector-benchmark.py --sites 32 --output bench.json
+
+With --cassette the collector run is recorded to (or replayed from) an HTTP cassette, so
+CPU-side changes can be compared on identical responses:
+
+    python benchmarks/collector-benchmark.py --port 8765 --cassette run.jsonl.gz --cassette-mode record
+    python benchmarks/collector-benchmark.py --port 8765 --cassette run.jsonl.gz --cassette-latency zero
+"""
+import argparse
+import datetime
+import gzip
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from synthetic_news_server import SyntheticNewsServer
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from http_cassette import install_cassette, uninstall_cassette  # noqa: E402
+from seed_loader import Publication  # noqa: E402
+
+
+def load_script(filename):
+    """Import one of the hyphenated scripts in src/ as a module."""
+    name = filename[:-3].replace("-", "_")
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SRC_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            total += os.path.getsize(os.path.join(root, filename))
+    return total
+
+
+def bench_collector(server, workdir, verbose=False, cassette=None):
+    """Run process_publication/save_publication for every synthetic site."""
+    collector = load_script("html-news-collector.py")
+    collector.ARTICLE_DELAY = 0
+    collector.setup_logging(os.path.join(workdir, "news_scraper.log"), console=verbose)
+    if cassette:
+        install_cassette(*cassette)
+
+    server.stats.reset()
+    latencies = []
+    articles = 0
+    start = time.perf_counter()
+    for entry in server.publications():
+        publication = Publication.from_dict("BENCH", entry['media-class'], entry)
+        timestamp = datetime.datetime.now()
+        publication_start = time.perf_counter()
+        collector.process_publication("BENCH", publication, timestamp.year, timestamp.month, timestamp.day, timestamp)
+        collector.save_publication("BENCH", timestamp.year, timestamp.month, timestamp.day, publication.website, publication)
+        latencies.append(time.perf_counter() - publication_start)
+    elapsed = time.perf_counter() - start
+    if cassette:
+        uninstall_cassette()
+
+    # Articles are the records appended to each <hash>.jsonl.gz
+    for root, _, files in os.walk(os.path.join(workdir, "news")):
+        for filename in files:
+            if filename.endswith(".jsonl.gz"):
+                with gzip.open(os.path.join(root, filename), "rt", encoding="utf-8") as f:
+                    articles += sum(1 for line in f if line.strip())
+
+    stats = server.stats.snapshot()
+    blob_report = collector.BLOB_STORE.report()
+    return {
+        'publications': len(latencies),
+        'articles': articles,
+        'elapsed': elapsed,
+        'articles_per_sec': articles / elapsed if elapsed else 0.0,
+        'requests': stats['requests'],
+        'requests_per_article': stats['total_requests'] / articles if articles else None,
+        'bytes_received': stats['bytes_sent'],
+        'bytes_written': directory_size(os.path.join(workdir, "news")) + blob_report['stored_bytes'],
+        'blob_store': blob_report,
+        'near_duplicates': collector.NEAR_DUPLICATES.report(),
+        'publication_latency_p50': percentile(latencies, 0.5),
+        'publication_latency_p99': percentile(latencies, 0.99),
+        'server_latency_p50': percentile(stats['latencies'], 0.5),
+        'server_latency_p99': percentile(stats['latencies'], 0.99),
+        'stages': collector.METRICS.summary()['stages'],
+    }
+
+
+def bench_script(server, func, workers=10):
+    """Run a per-website function from a preprocessing script over all synthetic sites concurrently."""
+    websites = [publication["website"] for publication in server.publications()]
+    server.stats.reset()
+    latencies = []
+
+    def timed(website):
+        start = time.perf_counter()
+        result = func(website)
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(timed, websites))
+    elapsed = time.perf_counter() - start
+    stats = server.stats.snapshot()
+    return {
+        'websites': len(websites),
+        'found': sum(1 for result in results if result),
+        'elapsed': elapsed,
+        'websites_per_sec': len(websites) / elapsed if elapsed else 0.0,
+        'requests': stats['total_requests'],
+        'latency_p50': percentile(latencies, 0.5),
+        'latency_p99': percentile(latencies, 0.99),
+    }
+
+
+def bench_scripts(server):
+    status = load_script("process-website-status-code.py")
+    feed_types = load_script("update-rss-with-types.py")
+    sitemaps = load_script("update-rss-with-sitemap.py")
+
+    def sitemap_feeds(website):
+        sitemap_url = sitemaps.get_sitemap_url(website) or sitemaps.get_sitemap_from_robots(website)
+        return sitemaps.get_rss_from_sitemap(sitemap_url) if sitemap_url else None
+
+    return {
+        'status_code': bench_script(server, status.get_status_code),
+        'feed_from_html': bench_script(server, feed_types.find_feed_url),
+        'feed_from_sitemap': bench_script(server, sitemap_feeds),
+    }
+
+
+def print_report(report):
+    collector = report['collector']
+    print(f"\ncollector: {collector['publications']} publications, {collector['articles']} articles "
+          f"in {collector['elapsed']:.2f}s")
+    print(f"  articles/sec          {collector['articles_per_sec']:.2f}")
+    print(f"  requests/article      {collector['requests_per_article'] or 0:.2f}  {collector['requests']}")
+    print(f"  bytes received        {collector['bytes_received']}")
+    print(f"  bytes written         {collector['bytes_written']}")
+    print(f"  bytes deduplicated    {collector['blob_store']['deduplicated_bytes']}")
+    print(f"  near-duplicates       {collector['near_duplicates']['near_duplicates']} in {collector['near_duplicates']['clusters']} clusters")
+    print(f"  publication p50/p99   {collector['publication_latency_p50']:.3f}s / {collector['publication_latency_p99']:.3f}s")
+    print(f"  server p50/p99        {collector['server_latency_p50'] * 1000:.2f}ms / {collector['server_latency_p99'] * 1000:.2f}ms")
+    for stage, values in collector['stages'].items():
+        print(f"  stage {stage:<16}{values['seconds']:.3f}s over {values['count']} calls ({values['share']:.0%})")
+    for name, result in report['scripts'].items():
+        print(f"{name}: {result['websites_per_sec']:.2f} websites/sec, found {result['found']}/{result['websites']}, "
+              f"{result['requests']} requests, p50/p99 {result['latency_p50']:.3f}s / {result['latency_p99']:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sites", type=int, default=16, help="number of synthetic sites")
+    parser.add_argument("--links", type=int, default=50, help="article links per homepage")
+    parser.add_argument("--entries", type=int, default=20, help="entries per feed and news sitemap")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="response delay of slow sites, in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the collector's console logging")
+    parser.add_argument("--port", type=int, default=0, help="port of the synthetic server (fix it to replay a cassette)")
+    parser.add_argument("--cassette", help="HTTP cassette of the collector run (.jsonl.gz)")
+    parser.add_argument("--cassette-mode", choices=["record", "replay"], default="replay")
+    parser.add_argument("--cassette-latency", choices=["original", "zero"], default="original",
+                        help="replay with the recorded latency or without any")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    cassette = (os.path.abspath(args.cassette), args.cassette_mode, args.cassette_latency) if args.cassette else None
+    with SyntheticNewsServer(args.sites, args.links, args.entries, args.slow_delay, args.seed, port=args.port) as server, \
+            tempfile.TemporaryDirectory() as workdir:
+        # The collector writes news/, watermarks/ and its log relative to the working directory
+        os.chdir(workdir)
+        report = {
+            'config': vars(args),
+            'collector': bench_collector(server, workdir, args.verbose, cassette),
+            'scripts': bench_scripts(server),
+        }
+        os.chdir(SRC_DIR)
+
+    print_report(report)
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Compression benchmark for stored article pages.
+
+Groups pages by site, trains one zstd dictionary per site on part of its pages and compares,
+on the remaining pages, gzip (the old .html.gz format), zstd without a dictionary and zstd
+with the site's dictionary: compression ratio and compress/decompress throughput. The collectors
+only use dictionaries for homepage snapshots; article pages are stored in gzip WARC segments, so
+the dictionary column for article pages is an upper bound, not what is written to disk.
+
+Pages come from a collector working directory (blobs/index.sqlite and its segments), from
+a tree of .html.gz/.html.zst files, or from the synthetic news sites when neither is given:
+
+    python benchmarks/compression-benchmark.py --workdir src
+    python benchmarks/compression-benchmark.py --html-dir results/html/news
+    python benchmarks/compression-benchmark.py --sites 16 --pages 64 --output compression.json
+"""
+import argparse
+import collections
+import gzip
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+import zstandard
+
+from synthetic_news_server import SyntheticSite
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from compression import DICT_MAX_SAMPLES, DICT_SIZE, GZIP_LEVEL, ZSTD_LEVEL, read_page  # noqa: E402
+
+
+def pages_from_workdir(workdir, limit):
+    """Read up to limit distinct pages per site through a collector's blob store."""
+    from blob_store import BLOB_DIR, BLOB_INDEX, BlobStore
+    os.chdir(workdir)
+    db = sqlite3.connect(os.path.join(BLOB_DIR, BLOB_INDEX))
+    rows = db.execute("SELECT website_hash, sha256 FROM refs WHERE website_hash IS NOT NULL "
+                      "GROUP BY website_hash, sha256 ORDER BY website_hash, MIN(id)").fetchall()
+    db.close()
+    store = BlobStore()
+    sites = collections.defaultdict(list)
+    for website_hash, sha256 in rows:
+        if len(sites[website_hash]) < limit:
+            sites[website_hash].append(store.get(sha256))
+    return sites
+
+
+def pages_from_html_dir(html_dir, limit):
+    """Read up to limit stored pages per site; a page's site is the directory it is in."""
+    sites = collections.defaultdict(list)
+    for root, _, files in os.walk(html_dir):
+        for filename in sorted(files):
+            site = os.path.basename(root)
+            if filename.endswith((".html.gz", ".html.zst")) and len(sites[site]) < limit:
+                sites[site].append(read_page(os.path.join(root, filename)))
+    return sites
+
+
+def synthetic_pages(nsites, limit, seed):
+    kinds = ['html', 'rss', 'atom', 'redirect']
+    return {f"s{i}": [SyntheticSite(i, kinds[i % len(kinds)], seed=seed).article(k).encode('utf-8') for k in range(limit)]
+            for i in range(nsites)}
+
+
+def measure(pages, compress, decompress):
+    """Compress and decompress every page; returns sizes and throughputs."""
+    start = time.perf_counter()
+    compressed = [compress(page) for page in pages]
+    compress_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for data in compressed:
+        decompress(data)
+    decompress_seconds = time.perf_counter() - start
+    size = sum(len(page) for page in pages)
+    stored = sum(len(data) for data in compressed)
+    return {
+        'bytes': size,
+        'stored_bytes': stored,
+        'ratio': size / stored if stored else 0.0,
+        'compress_mb_per_sec': size / compress_seconds / 1e6 if compress_seconds else 0.0,
+        'decompress_mb_per_sec': size / decompress_seconds / 1e6 if decompress_seconds else 0.0,
+    }
+
+
+def bench_site(pages, train_share, rng):
+    """
+    Train on a share of a site's pages and measure the codecs on the rest.
+    Returns (results by codec, training pages, test pages, training seconds or None).
+    """
+    pages = list(pages)
+    rng.shuffle(pages)
+    ntrain = min(DICT_MAX_SAMPLES, max(1, int(len(pages) * train_share)))
+    train, test = pages[:ntrain], pages[ntrain:]
+    results = {
+        'gzip': measure(test, lambda data: gzip.compress(data, compresslevel=GZIP_LEVEL), gzip.decompress),
+        'zstd': measure(test, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress,
+                        zstandard.ZstdDecompressor().decompress),
+    }
+    try:
+        start = time.perf_counter()
+        dictionary = zstandard.train_dictionary(DICT_SIZE, train, level=ZSTD_LEVEL)
+        train_seconds = time.perf_counter() - start
+    except zstandard.ZstdError:
+        return results, len(train), len(test), None
+    dictionary.precompute_compress(level=ZSTD_LEVEL)
+    results['zstd_dict'] = measure(test, zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary).compress,
+                                   zstandard.ZstdDecompressor(dict_data=dictionary).decompress)
+    return results, len(train), len(test), train_seconds
+
+
+def total(site_results, codec):
+    """Combine per-site results of a codec, weighting throughput by bytes."""
+    results = [results[codec] for results in site_results if codec in results]
+    size = sum(result['bytes'] for result in results)
+    stored = sum(result['stored_bytes'] for result in results)
+    compress_seconds = sum(result['bytes'] / result['compress_mb_per_sec'] / 1e6 for result in results if result['compress_mb_per_sec'])
+    decompress_seconds = sum(result['bytes'] / result['decompress_mb_per_sec'] / 1e6 for result in results if result['decompress_mb_per_sec'])
+    return {
+        'sites': len(results),
+        'bytes': size,
+        'stored_bytes': stored,
+        'ratio': size / stored if stored else 0.0,
+        'compress_mb_per_sec': size / compress_seconds / 1e6 if compress_seconds else 0.0,
+        'decompress_mb_per_sec': size / decompress_seconds / 1e6 if decompress_seconds else 0.0,
+    }
+
+
+def print_report(report):
+    print(f"\n{report['sites']} sites, {report['test_pages']} test pages, {report['train_pages']} training pages, "
+          f"dictionaries trained in {report['train_seconds']:.2f}s")
+    print(f"  {'codec':<10}{'ratio':>8}{'stored bytes':>15}{'compress MB/s':>16}{'decompress MB/s':>18}")
+    for codec, result in report['codecs'].items():
+        print(f"  {codec:<10}{result['ratio']:>8.2f}{result['stored_bytes']:>15}"
+              f"{result['compress_mb_per_sec']:>16.1f}{result['decompress_mb_per_sec']:>18.1f}")
+    gzip_bytes = report['codecs']['gzip']['stored_bytes']
+    dict_bytes = report['codecs'].get('zstd_dict', {}).get('stored_bytes')
+    if gzip_bytes and dict_bytes:
+        print(f"  zstd with dictionaries stores {1 - dict_bytes / gzip_bytes:.0%} fewer bytes than gzip")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workdir", help="collector working directory with blobs/ and segments/")
+    parser.add_argument("--html-dir", help="directory tree of stored pages, one directory per site")
+    parser.add_argument("--sites", type=int, default=16, help="number of synthetic sites")
+    parser.add_argument("--pages", type=int, default=64, help="pages per site")
+    parser.add_argument("--train-share", type=float, default=0.5, help="share of a site's pages used for training")
+    parser.add_argument("--min-pages", type=int, default=8, help="skip sites with fewer pages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    if args.workdir:
+        sites = pages_from_workdir(args.workdir, args.pages)
+    elif args.html_dir:
+        sites = pages_from_html_dir(args.html_dir, args.pages)
+    else:
+        sites = synthetic_pages(args.sites, args.pages, args.seed)
+
+    rng = random.Random(args.seed)
+    site_results = []
+    train_seconds = 0.0
+    train_pages = test_pages = 0
+    for _, pages in sorted(sites.items()):
+        if len(pages) < args.min_pages:
+            continue
+        results, ntrain, ntest, seconds = bench_site(pages, args.train_share, rng)
+        site_results.append(results)
+        train_pages += ntrain
+        test_pages += ntest
+        train_seconds += seconds or 0.0
+    if not site_results:
+        sys.exit(f"No site has at least {args.min_pages} pages")
+
+    report = {
+        'config': vars(args),
+        'sites': len(site_results),
+        'train_pages': train_pages,
+        'test_pages': test_pages,
+        'train_seconds': train_seconds,
+        'codecs': {codec: total(site_results, codec) for codec in ('gzip', 'zstd', 'zstd_dict')},
+    }
+    print_report(report)
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Benchmark of homepage link extraction (src/html_links.py): the link parsers against html.parser,
+and parsing in the fetching threads against the LinkParserPool worker processes.
+
+For every installed parser the report gives its CPU time per page and the pages where its link set
+(the <a href> URLs, resolved against the page URL, and the feed <link> find_feed_url would pick)
+differs from html.parser's. The throughput test runs --threads fetcher threads, each waiting
+--fetch-delay seconds per page as for a network fetch and then extracting its links, first in the
+thread and then through the pool. Pages come from stored .html.gz/.html.zst files, WARC files
+(needs warcio), or the synthetic news sites:
+
+    python benchmarks/link-parse-benchmark.py --html-dir results/html/news --warc results/warc/wget/*.warc.gz
+    python benchmarks/link-parse-benchmark.py --sites 32 --links 400 --threads 8 --workers 4 --output links.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+try:
+    from warcio.archiveiterator import ArchiveIterator
+except ImportError:  # optional: only --warc needs it
+    ArchiveIterator = None
+
+from synthetic_news_server import SyntheticSite
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from compression import read_page  # noqa: E402
+from html_links import _BACKENDS, LinkParserPool, find_feed_link, parse_links  # noqa: E402
+
+FEED_TYPES = ["application/rss+xml", "application/atom+xml", "text/xml", "application/xml"]
+
+
+def pages_from_html_dir(html_dir, limit):
+    """Stored pages as fetched (bytes), as the parsers get them from the fetchers."""
+    pages = []
+    for root, _, files in os.walk(html_dir):
+        for filename in sorted(files):
+            if filename.endswith((".html.gz", ".html.zst")) and len(pages) < limit:
+                pages.append((os.path.join(root, filename), read_page(os.path.join(root, filename))))
+    return pages
+
+
+def pages_from_warcs(filepaths, limit):
+    """The HTML responses of WARC files."""
+    if ArchiveIterator is None:
+        sys.exit("warcio is required to read WARC files: pip install warcio")
+    pages = []
+    for filepath in filepaths:
+        with open(filepath, 'rb') as f:
+            for record in ArchiveIterator(f):
+                if record.rec_type != 'response' or not record.http_headers:
+                    continue
+                if 'html' not in (record.http_headers.get_header('Content-Type') or ''):
+                    continue
+                pages.append((record.rec_headers.get_header('WARC-Target-URI'), record.content_stream().read()))
+                if len(pages) >= limit:
+                    return pages
+    return pages
+
+
+def synthetic_pages(nsites, nlinks, seed):
+    """Homepages (link lists) of the synthetic sites, as bytes."""
+    kinds = ['html', 'rss', 'atom', 'redirect']
+    return [(f"http://s{i}.example/", SyntheticSite(i, kinds[i % len(kinds)], nlinks=nlinks, seed=seed).homepage())
+            for i in range(nsites)]
+
+
+def link_set(url, page_links):
+    base = url if url.startswith('http') else 'http://example.com/'
+    return {urljoin(base, href) for href in page_links.anchors}, find_feed_link(page_links.feed_links, FEED_TYPES)
+
+
+def bench_parsers(pages):
+    reference = {url: link_set(url, parse_links(html)) for url, html in pages}
+    results = {}
+    for backend, parser in _BACKENDS.items():
+        if parser is None:
+            continue
+        parse_links(pages[0][1], backend)  # warm up
+        start = time.process_time()
+        parsed = [(url, parse_links(html, backend)) for url, html in pages]
+        seconds = time.process_time() - start
+        differences = []
+        for url, page_links in parsed:
+            anchors, feed_link = link_set(url, page_links)
+            expected_anchors, expected_feed_link = reference[url]
+            if anchors != expected_anchors or feed_link != expected_feed_link:
+                differences.append({'url': url, 'missing': sorted(expected_anchors - anchors)[:5],
+                                    'extra': sorted(anchors - expected_anchors)[:5],
+                                    'feed_link': [expected_feed_link, feed_link]})
+        results[backend] = {
+            'cpu_ms_per_page': seconds * 1000 / len(pages),
+            'links': sum(len(page_links.anchors) for _, page_links in parsed),
+            'same_link_set': 1 - len(differences) / len(pages),
+            'differences': differences,
+        }
+    return results
+
+
+def bench_throughput(pages, threads, fetch_delay, parse):
+    def fetch_and_parse(page):
+        time.sleep(fetch_delay)
+        return len(parse(page[1]).anchors)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(fetch_and_parse, pages))
+    return len(pages) / (time.perf_counter() - start)
+
+
+def print_report(report):
+    print(f"\n{report['pages']} pages")
+    for backend, result in report['parsers'].items():
+        print(f"  {backend:12s} {result['cpu_ms_per_page']:7.2f}ms CPU/page, {result['links']} links, "
+              f"same link set on {result['same_link_set']:.1%} of pages")
+        for difference in result['differences'][:5]:
+            print(f"    differs: {difference['url']} missing {difference['missing']} extra {difference['extra']}")
+    for label, pages_per_second in report['throughput'].items():
+        print(f"  {label:36s} {pages_per_second:8.1f} pages/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--html-dir", help="directory tree of stored .html.gz/.html.zst pages")
+    parser.add_argument("--warc", nargs="+", help="WARC files whose HTML responses are parsed")
+    parser.add_argument("--sites", type=int, default=32, help="number of synthetic sites")
+    parser.add_argument("--links", type=int, default=400, help="links per synthetic homepage")
+    parser.add_argument("--limit", type=int, default=1000, help="pages read from each source")
+    parser.add_argument("--repeat", type=int, default=4, help="times each page is fetched in the throughput test")
+    parser.add_argument("--threads", type=int, default=8, help="fetcher threads")
+    parser.add_argument("--fetch-delay", type=float, default=0.01, help="simulated fetch latency per page")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="parser processes of the pool")
+    parser.add_argument("--max-pending", type=int, default=8, help="pages queued for the pool")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    pages = []
+    if args.html_dir:
+        pages += pages_from_html_dir(args.html_dir, args.limit)
+    if args.warc:
+        pages += pages_from_warcs(args.warc, args.limit)
+    if not (args.html_dir or args.warc):
+        pages = synthetic_pages(args.sites, args.links, args.seed)
+    if not pages:
+        sys.exit("No pages to parse")
+
+    report = {'pages': len(pages), 'parsers': bench_parsers(pages), 'throughput': {}, 'config': vars(args)}
+    fetched = pages * args.repeat
+    for backend, parser_function in _BACKENDS.items():
+        if parser_function is None:
+            continue
+        report['throughput'][f"{backend} in {args.threads} threads"] = bench_throughput(
+            fetched, args.threads, args.fetch_delay, lambda html, backend=backend: parse_links(html, backend))
+        pool = LinkParserPool(args.workers, args.max_pending, backend)
+        pool.parse(pages[0][1])  # start the workers
+        report['throughput'][f"{backend} in {args.workers} processes"] = bench_throughput(
+            fetched, args.threads, args.fetch_delay, pool.parse)
+        pool.close()
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Full-text search benchmark for the article index (src/article_search.py).
+
+Builds an index over a synthetic corpus of articles spread over states, outlets and a year of
+publication dates, with words drawn from a Zipf-distributed vocabulary like real text. Reports
+the build rate of batched backfill and of one-article-per-transaction ingest (what the collector
+does), the index size, and the latency of common, mid-frequency, rare, phrase, prefix and OR queries,
+unfiltered and filtered by state and date range:
+
+    python benchmarks/search-benchmark.py
+    python benchmarks/search-benchmark.py --docs 200000 --words 400 --output search.json
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from synthetic_news_server import WORDS
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+
+from article_search import ArticleSearch  # noqa: E402
+
+STATES = ("AK", "AL", "CA", "GA", "IL", "NY", "OH", "TX", "VA", "WA")
+BATCH_SIZE = 1000
+
+
+def vocabulary(size, rng):
+    """The synthetic news words first (the most frequent), then made-up words."""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = list(dict.fromkeys(WORDS))
+    seen = set(words)
+    while len(words) < size:
+        word = ''.join(rng.choice(letters) for _ in range(rng.randint(4, 10)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def corpus(ndocs, nwords, vocab, rng, start_date):
+    """Yield synthetic (link, title, text, website_hash, state, publication_date, sha256) documents."""
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocab) + 1)))
+    outlets = [f"{i:032x}" for i in range(200)]
+    for i in range(ndocs):
+        words = rng.choices(vocab, cum_weights=cum_weights, k=nwords)
+        date = start_date + datetime.timedelta(days=rng.randrange(365), seconds=rng.randrange(86400))
+        outlet = rng.choice(outlets)
+        yield (f"https://{outlet[:8]}.example/news/{i}", ' '.join(words[:8]).title(), ' '.join(words),
+               outlet, STATES[int(outlet, 16) % len(STATES)], date.isoformat(), None)
+
+
+def build(search, documents, ingest_docs):
+    """Index the documents: the first ingest_docs one per transaction, the rest in batches. Returns rates."""
+    documents = iter(documents)
+    start = time.perf_counter()
+    for link, title, text, website_hash, state, publication_date, sha256 in itertools.islice(documents, ingest_docs):
+        search.add(link, text, title, state, website_hash, publication_date, sha256)
+    ingest_seconds = time.perf_counter() - start
+
+    batched = batched_bytes = 0
+    start = time.perf_counter()
+    while True:
+        batch = list(itertools.islice(documents, BATCH_SIZE))
+        if not batch:
+            break
+        search.add_many(batch)
+        batched += len(batch)
+        batched_bytes += sum(len(document[2]) for document in batch)
+    batch_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    search.optimize()
+    optimize_seconds = time.perf_counter() - start
+    return {
+        'ingest_docs_per_sec': ingest_docs / ingest_seconds if ingest_seconds else 0.0,
+        'batch_docs_per_sec': batched / batch_seconds if batch_seconds else 0.0,
+        'batch_mb_per_sec': batched_bytes / batch_seconds / 1e6 if batch_seconds else 0.0,
+        'optimize_seconds': optimize_seconds,
+    }
+
+
+def queries(vocab):
+    return {
+        'common': vocab[3],
+        'mid': vocab[500],
+        'rare': vocab[min(20000, len(vocab) - 1)],
+        'two_terms': f"{vocab[10]} {vocab[200]}",
+        'phrase': f'"{vocab[0]} {vocab[1]}"',
+        'prefix': f"{vocab[2][:3]}*",
+        'or': f"{vocab[300]} OR {vocab[400]}",
+    }
+
+
+def filters(start_date):
+    """No filter, one state, one month of publication dates, and both."""
+    month = {'start': start_date.replace(month=6).date().isoformat(), 'end': start_date.replace(month=7).date().isoformat()}
+    return {
+        'none': {},
+        'state': {'state': 'VA'},
+        'month': month,
+        'state_month': dict(month, state='VA'),
+    }
+
+
+def measure_queries(search, vocab, start_date, repeat, limit):
+    results = {}
+    for query_name, query in queries(vocab).items():
+        for filter_name, kwargs in filters(start_date).items():
+            latencies = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                hits = search.search(query, limit=limit, **kwargs)
+                latencies.append((time.perf_counter() - start) * 1000)
+            results[f"{query_name}/{filter_name}"] = {
+                'query': query,
+                'filters': kwargs,
+                'hits': len(hits),
+                'p50_ms': statistics.median(latencies),
+                'p95_ms': sorted(latencies)[max(0, int(len(latencies) * 0.95) - 1)],
+            }
+    return results
+
+
+def print_report(report):
+    build_rates = report['build']
+    print(f"\n{report['docs']} articles of {report['config']['words']} words, index {report['index_bytes'] / 1e6:.1f} MB")
+    print(f"  ingest (one per transaction)  {build_rates['ingest_docs_per_sec']:>10.0f} articles/s")
+    print(f"  backfill (batches of {BATCH_SIZE})    {build_rates['batch_docs_per_sec']:>10.0f} articles/s "
+          f"({build_rates['batch_mb_per_sec']:.1f} MB/s of text), optimize {build_rates['optimize_seconds']:.1f}s")
+    print(f"  {'query/filter':<24}{'hits':>6}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, result in report['queries'].items():
+        print(f"  {name:<24}{result['hits']:>6}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=50000, help="articles in the synthetic corpus")
+    parser.add_argument("--words", type=int, default=300, help="words per article")
+    parser.add_argument("--vocabulary", type=int, default=50000, help="distinct words")
+    parser.add_argument("--ingest-docs", type=int, default=2000, help="articles indexed one per transaction")
+    parser.add_argument("--repeat", type=int, default=20, help="runs of each query")
+    parser.add_argument("--limit", type=int, default=20, help="results per query")
+    parser.add_argument("--db", help="index file to build (default: a temporary file)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocab = vocabulary(args.vocabulary, rng)
+    start_date = datetime.datetime(2025, 1, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = args.db or os.path.join(tmp, "search.sqlite")
+        search = ArticleSearch(db)
+        documents = corpus(args.docs, args.words, vocab, rng, start_date)
+        build_rates = build(search, documents, min(args.ingest_docs, args.docs))
+        report = {
+            'config': vars(args),
+            'docs': args.docs,
+            'build': build_rates,
+            'queries': measure_queries(search, vocab, start_date, args.repeat, args.limit),
+        }
+        # Closing checkpoints the write-ahead log into the database file
+        search.close()
+        report['index_bytes'] = os.path.getsize(db)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
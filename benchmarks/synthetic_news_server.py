@@ -0,0 +1,254 @@
+import datetime
+import gzip
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+# Kinds of synthetic sites; each site gets one, round-robin
+SITE_KINDS = ['rss', 'atom', 'sitemap', 'homepage', 'redirect', 'large', 'slow', 'failing']
+
+WORDS = ("council school county budget vote road storm police fire mayor board water tax park "
+         "library hospital election bridge festival football court housing farm river").split()
+
+
+class SiteStats:
+    """Thread-safe request counters and latencies of the synthetic server."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = {}
+            self.bytes_sent = 0
+            self.latencies = []
+
+    def record(self, kind, nbytes, latency):
+        with self.lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+            self.bytes_sent += nbytes
+            self.latencies.append(latency)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'requests': dict(self.requests),
+                'total_requests': sum(self.requests.values()),
+                'bytes_sent': self.bytes_sent,
+                'latencies': list(self.latencies),
+            }
+
+
+class SyntheticSite:
+    """Deterministic content of one synthetic local news site."""
+
+    def __init__(self, index, kind, nlinks=50, nentries=20, seed=0, published=None):
+        self.index = index
+        self.kind = kind
+        self.nlinks = nlinks
+        self.nentries = nentries
+        self.seed = seed
+        self.prefix = f"/s{index}/"
+        # The newest story is from the current hour, so collectors' lookback windows include the feeds
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.published = published or now.replace(minute=0, second=0, microsecond=0)
+
+    def words(self, rng, n):
+        return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+    def article_path(self, k):
+        return f"{self.prefix}news/{self.published:%Y/%m/%d}/story-{k}-{WORDS[k % len(WORDS)]}"
+
+    def article_date(self, k):
+        return self.published - datetime.timedelta(minutes=17 * k)
+
+    def homepage(self):
+        rng = random.Random(self.seed * 1000003 + self.index)
+        links = [f'<a href="{self.prefix}{section}">{section}</a>' for section in ('about', 'sports', 'contact', 'weather')]
+        for k in range(self.nlinks):
+            path = f"{self.prefix}r/{k}" if self.kind == 'redirect' else self.article_path(k)
+            links.append(f'<a href="{path}">{self.words(rng, 6)}</a>')
+        feed_link = ''
+        if self.kind in ('rss', 'atom'):
+            feed_type = 'application/rss+xml' if self.kind == 'rss' else 'application/atom+xml'
+            feed_link = f'<link rel="alternate" type="{feed_type}" href="{self.feed_path()}">'
+        return (f"<html><head><title>Site {self.index}</title>{feed_link}</head><body>"
+                f"<nav>{''.join(links[:4])}</nav><main>{'<br>'.join(links[4:])}</main></body></html>")
+
+    def article(self, k):
+        rng = random.Random((self.seed * 1000003 + self.index) * 7919 + k)
+        paragraphs = ''.join(f"<p>{self.words(rng, 60)}.</p>" for _ in range(8))
+        if self.kind == 'large':
+            comment = f"<p>{self.words(rng, 40)}</p>"
+            paragraphs += f"<div class='comments'>{comment * 2000}</div>"
+        return (f"<html><head><title>Story {k}</title>"
+                f"<meta property=\"og:type\" content=\"article\">"
+                f"<meta property=\"article:published_time\" content=\"{self.article_date(k).isoformat()}\">"
+                f"</head><body><nav><a href=\"{self.prefix}\">Home</a></nav>"
+                f"<article><h1>{self.words(rng, 8)}</h1>{paragraphs}</article></body></html>")
+
+    def feed_path(self):
+        return f"{self.prefix}{'atom.xml' if self.kind == 'atom' else 'rss.xml'}"
+
+    def rss(self, base_url):
+        items = ''.join(
+            f"<item><title>Story {k}</title><link>{base_url}{self.article_path(k)}</link>"
+            f"<guid>{base_url}{self.article_path(k)}</guid>"
+            f"<pubDate>{self.article_date(k).strftime('%a, %d %b %Y %H:%M:%S +0000')}</pubDate></item>"
+            for k in range(self.nentries))
+        return f'<?xml version="1.0"?><rss version="2.0"><channel><title>Site {self.index}</title>{items}</channel></rss>'
+
+    def atom(self, base_url):
+        entries = ''.join(
+            f"<entry><title>Story {k}</title><link href=\"{base_url}{self.article_path(k)}\"/>"
+            f"<id>{base_url}{self.article_path(k)}</id><updated>{self.article_date(k).isoformat()}</updated></entry>"
+            for k in range(self.nentries))
+        return f'<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom"><title>Site {self.index}</title>{entries}</feed>'
+
+    def news_sitemap(self, base_url):
+        urls = ''.join(
+            f"<url><loc>{base_url}{self.article_path(k)}</loc><news:news><news:publication_date>"
+            f"{self.article_date(k).isoformat()}</news:publication_date></news:news></url>"
+            for k in range(self.nentries))
+        return ('<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+                f'xmlns:news="http://www.google.com/schemas/sitemap-news/0.9">{urls}</urlset>')
+
+    def sitemap_index(self, base_url):
+        return ('<?xml version="1.0"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                f'<sitemap><loc>{base_url}{self.prefix}sitemap-pages.xml.gz</loc></sitemap>'
+                f'<sitemap><loc>{base_url}{self.prefix}rss-sitemap.xml</loc></sitemap></sitemapindex>')
+
+    def pages_sitemap(self, base_url):
+        urls = ''.join(f"<url><loc>{base_url}{self.article_path(k)}</loc></url>" for k in range(self.nlinks))
+        return f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+
+    def rss_sitemap(self, base_url):
+        return ('<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                f'<url><loc>{base_url}{self.prefix}rss.xml</loc></url></urlset>')
+
+
+class SyntheticNewsServer:
+    """
+    Local HTTP server that serves many synthetic local news sites under /s<index>/.
+    Slow sites delay every response and failing sites answer 500.
+    """
+
+    def __init__(self, nsites=16, nlinks=50, nentries=20, slow_delay=0.5, seed=0, host='127.0.0.1', port=0):
+        self.sites = [SyntheticSite(i, SITE_KINDS[i % len(SITE_KINDS)], nlinks, nentries, seed) for i in range(nsites)]
+        self.slow_delay = slow_delay
+        self.stats = SiteStats()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://{host}:{self.httpd.server_address[1]}"
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def publications(self):
+        """Seed-file style publication entries for the synthetic sites."""
+        publications = []
+        for site in self.sites:
+            publication = {
+                'name': f"Synthetic {site.kind} {site.index}",
+                'website': f"{self.base_url}{site.prefix}",
+                'media-class': 'newspaper',
+                # Failing sites still claim 200, like outlets that went down after the status check
+                'website_status': 200,
+                'rss': [],
+            }
+            if site.kind in ('rss', 'atom', 'large', 'slow'):
+                publication['rss'].append(f"{self.base_url}{site.feed_path()}")
+            publications.append(publication)
+        return publications
+
+    def route(self, path):
+        """Return (kind, status, content_type, body, headers) for a request path."""
+        parts = path.split('/')
+        try:
+            site = self.sites[int(parts[1][1:])]
+        except (IndexError, ValueError):
+            return 'other', 404, 'text/plain', b'not found', {}
+        if site.kind == 'failing':
+            return 'failing', 500, 'text/plain', b'internal error', {}
+        rest = path[len(site.prefix):]
+        base = self.base_url
+        if rest == '':
+            return 'homepage', 200, 'text/html; charset=utf-8', site.homepage().encode(), {}
+        if rest == 'rss.xml':
+            return 'feed', 200, 'application/rss+xml', site.rss(base).encode(), {}
+        if rest == 'atom.xml':
+            return 'feed', 200, 'application/atom+xml', site.atom(base).encode(), {}
+        if rest == 'robots.txt':
+            lines = ["User-agent: *", "Allow: /"]
+            if site.kind == 'sitemap':
+                lines.append(f"Sitemap: {base}{site.prefix}news-sitemap.xml")
+            lines.append(f"Sitemap: {base}{site.prefix}sitemap.xml")
+            return 'robots', 200, 'text/plain', '\n'.join(lines).encode(), {}
+        if rest == 'news-sitemap.xml' and site.kind == 'sitemap':
+            return 'sitemap', 200, 'application/xml', site.news_sitemap(base).encode(), {}
+        if rest == 'sitemap.xml':
+            return 'sitemap', 200, 'application/xml', site.sitemap_index(base).encode(), {}
+        if rest == 'sitemap-pages.xml.gz':
+            return 'sitemap', 200, 'application/x-gzip', gzip.compress(site.pages_sitemap(base).encode()), {}
+        if rest == 'rss-sitemap.xml':
+            return 'sitemap', 200, 'application/xml', site.rss_sitemap(base).encode(), {}
+        if rest.startswith('r/'):
+            k = int(rest[2:])
+            return 'redirect', 301, 'text/plain', b'', {'Location': f"{base}{site.article_path(k)}"}
+        if rest.startswith('news/'):
+            k = int(rest.split('/')[4].split('-')[1])
+            return 'article', 200, 'text/html; charset=utf-8', site.article(k).encode(), {}
+        if rest in ('about', 'sports', 'contact', 'weather'):
+            return 'section', 200, 'text/html; charset=utf-8', f"<html><body><h1>{rest}</h1></body></html>".encode(), {}
+        return 'other', 404, 'text/plain', b'not found', {}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def respond(self, send_body):
+                start = time.perf_counter()
+                path = urlsplit(self.path).path
+                kind, status, content_type, body, headers = server.route(path)
+                site_index = path.split('/')[1][1:] if path.count('/') > 1 else ''
+                if site_index.isdigit() and int(site_index) < len(server.sites) and server.sites[int(site_index)].kind == 'slow':
+                    time.sleep(server.slow_delay)
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+                kind = kind if send_body else 'head'
+                server.stats.record(kind, len(body) if send_body else 0, time.perf_counter() - start)
+
+            def do_GET(self):
+                self.respond(True)
+
+            def do_HEAD(self):
+                self.respond(False)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,276 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+NEWS_DIR = "news"
+CATALOG_DB = "catalog.sqlite"
+
+# Storage backends of an article, by the field of its record that locates it
+BACKEND_FIELDS = (
+    ('segment', 'html_segment'),        # html-news-collector: WARC record in a segment file
+    ('file', 'html_file_path'),         # older html-news-collector runs: one .html.gz per article
+    ('wayback', 'archived_link'),       # ia-news-collector: Internet Archive capture
+    ('browsertrix', 'archived_path'),   # bt-news-collectors: Browsertrix crawl/WACZ
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    link TEXT NOT NULL,
+    website_hash TEXT NOT NULL,
+    state TEXT NOT NULL,
+    media_type TEXT,
+    publication_date TEXT,
+    saved_time TEXT,
+    collected_date TEXT NOT NULL,
+    backend TEXT NOT NULL,
+    location TEXT,
+    sha256 TEXT,
+    source_file TEXT NOT NULL,
+    UNIQUE (link, website_hash, collected_date, backend, location)
+);
+CREATE INDEX IF NOT EXISTS articles_outlet_date ON articles(website_hash, publication_date);
+CREATE INDEX IF NOT EXISTS articles_state_date ON articles(state, publication_date);
+CREATE INDEX IF NOT EXISTS articles_media_type_date ON articles(media_type, publication_date);
+CREATE INDEX IF NOT EXISTS articles_collected ON articles(collected_date, state);
+CREATE INDEX IF NOT EXISTS articles_link ON articles(link);
+CREATE INDEX IF NOT EXISTS articles_source_file ON articles(source_file);
+CREATE TABLE IF NOT EXISTS publications (
+    website_hash TEXT PRIMARY KEY,
+    website TEXT,
+    name TEXT,
+    state TEXT,
+    media_type TEXT,
+    archived_time TEXT,
+    backend TEXT,
+    location TEXT
+);
+CREATE INDEX IF NOT EXISTS publications_state ON publications(state, media_type);
+CREATE TABLE IF NOT EXISTS scanned_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+"""
+
+_ARTICLE_COLUMNS = ("link", "website_hash", "state", "media_type", "publication_date", "saved_time",
+                    "collected_date", "backend", "location", "sha256", "source_file")
+_PUBLICATION_COLUMNS = ("website_hash", "website", "name", "state", "media_type", "archived_time", "backend", "location")
+
+
+def article_location(record):
+    """Return (backend, location) of an article record, e.g. ('segment', '<segment>:<offset>:<length>')."""
+    for backend, field in BACKEND_FIELDS:
+        if record.get(field):
+            if backend == 'segment':
+                return backend, f"{record['html_segment']}:{record.get('html_offset')}:{record.get('html_length')}"
+            return backend, record[field]
+    return 'unknown', None
+
+
+def article_row(record, state, website_hash, collected_date, source_file, media_type=None):
+    backend, location = article_location(record)
+    return (record['link'], website_hash, state, media_type, record.get('publication_date'),
+            record.get('saved_time') or record.get('archived_time'), collected_date, backend, location,
+            record.get('sha256'), source_file)
+
+
+def publication_row(record, state, website_hash):
+    """Catalog row of a publication record (seed entry with archived_link, or a bt _metadata record)."""
+    metadata = record.get('publication_metadata') or record
+    backend, location = article_location(record)
+    return (website_hash, metadata.get('website') or record.get('website_link'), metadata.get('name'), state,
+            metadata.get('media-class'), record.get('archived_time'), backend, location)
+
+
+def parse_news_path(path):
+    """Return (state, collected_date, website_hash) of a file under news/<state>/<y>/<m>/<d>/<hash>/."""
+    parts = os.path.normpath(path).split(os.sep)
+    state, year, month, day, website_hash = parts[-6:-1]
+    return state, f"{int(year):04d}-{int(month):02d}-{int(day):02d}", website_hash
+
+
+def read_records(path):
+    """Yield the JSON records of a (multi-member) jsonl.gz file, skipping a torn last line."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        try:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        logging.warning(f"Skipping malformed line in {path}")
+        except (EOFError, OSError) as e:
+            # A member cut short by a crash; the complete lines before it are kept
+            logging.warning(f"Truncated gzip file {path}: {e}")
+
+
+def scan_file(path):
+    """Parse one metadata file into (article rows, publication rows). Runs in a worker process."""
+    state, collected_date, website_hash = parse_news_path(path)
+    articles, publications = [], []
+    for record in read_records(path):
+        if not isinstance(record, dict):
+            continue
+        if record.get('link'):
+            articles.append(article_row(record, state, website_hash, collected_date, path))
+        elif record.get('website') or record.get('website_link'):
+            publications.append(publication_row(record, state, website_hash))
+    return path, articles, publications
+
+
+def iter_metadata_files(root=NEWS_DIR):
+    """Yield the article/publication jsonl.gz files of a news/ tree."""
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            if filename.endswith(".jsonl.gz"):
+                yield os.path.join(directory, filename)
+
+
+class ArticleCatalog:
+    """
+    Indexed SQLite catalog of every collected article and publication snapshot.
+    The collectors add rows as they write their jsonl.gz files; rebuild() recreates it from the tree.
+    """
+
+    def __init__(self, filepath=CATALOG_DB):
+        self.filepath = filepath
+        self.lock = threading.Lock()
+        self.db = None
+
+    def _connect(self):
+        if self.db is None:
+            directory = os.path.dirname(self.filepath)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Several collectors may share the catalog; WAL lets them read while one writes
+            self.db = sqlite3.connect(self.filepath, timeout=30, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(_SCHEMA)
+        return self.db
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def _insert(self, db, articles=(), publications=()):
+        db.executemany(f"INSERT OR IGNORE INTO articles ({', '.join(_ARTICLE_COLUMNS)}) "
+                       f"VALUES ({', '.join('?' * len(_ARTICLE_COLUMNS))})", articles)
+        # Keep what is already known about a publication when a record lacks a field
+        db.executemany(f"INSERT INTO publications ({', '.join(_PUBLICATION_COLUMNS)}) "
+                       f"VALUES ({', '.join('?' * len(_PUBLICATION_COLUMNS))}) "
+                       "ON CONFLICT(website_hash) DO UPDATE SET "
+                       + ", ".join(f"{column} = COALESCE(excluded.{column}, {column})" for column in _PUBLICATION_COLUMNS[1:]),
+                       publications)
+
+    def add_articles(self, records, state, website_hash, collected_date, source_file, media_type=None):
+        """Catalog article records just written to source_file. Failures are logged, never raised."""
+        rows = [article_row(record, state, website_hash, collected_date, source_file, media_type)
+                for record in records if record.get('link')]
+        if not rows:
+            return 0
+        try:
+            with self.lock:
+                db = self._connect()
+                with db:
+                    self._insert(db, rows)
+        except sqlite3.Error as e:
+            logging.error(f"Error cataloging {len(rows)} articles of {source_file}: {e}")
+            return 0
+        return len(rows)
+
+    def add_publication(self, state, website_hash, website, media_type=None, name=None, archived_time=None,
+                        backend=None, location=None):
+        """Catalog a publication and, if one was saved, its homepage snapshot."""
+        row = (website_hash, website, name, state, media_type, archived_time, backend, location)
+        try:
+            with self.lock:
+                db = self._connect()
+                with db:
+                    self._insert(db, publications=[row])
+        except sqlite3.Error as e:
+            logging.error(f"Error cataloging publication {website}: {e}")
+
+    def rebuild(self, root=NEWS_DIR, workers=None, full=False):
+        """
+        Scan a news/ tree in parallel worker processes and catalog every file that changed since
+        the last scan (every file with full=True). Returns the number of files scanned.
+        """
+        with self.lock:
+            db = self._connect()
+            if full:
+                with db:
+                    db.execute("DELETE FROM articles")
+                    db.execute("DELETE FROM scanned_files")
+            scanned = {path: (size, mtime) for path, size, mtime in db.execute("SELECT path, size, mtime FROM scanned_files")}
+        changed = {}
+        for path in iter_metadata_files(root):
+            stat = os.stat(path)
+            if scanned.get(path) != (stat.st_size, stat.st_mtime):
+                changed[path] = (stat.st_size, stat.st_mtime)
+        if not changed:
+            return 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(scan_file, sorted(changed), chunksize=64)
+            with self.lock:
+                with db:
+                    for path, articles, publications in results:
+                        # The file is the source of truth: its rows are replaced, not merged
+                        db.execute("DELETE FROM articles WHERE source_file = ?", (path,))
+                        self._insert(db, articles, publications)
+                        db.execute("INSERT OR REPLACE INTO scanned_files (path, size, mtime) VALUES (?, ?, ?)",
+                                   (path, *changed[path]))
+                    # Articles written before the publication was known take its media type
+                    db.execute("UPDATE articles SET media_type = (SELECT p.media_type FROM publications p "
+                               "WHERE p.website_hash = articles.website_hash) WHERE media_type IS NULL")
+        return len(changed)
+
+    def add_seed_publications(self, publications):
+        """Catalog the publications of a seed file (seed_loader.Publication) to fill in names and media types."""
+        rows = [(hashlib.md5(publication.website.encode()).hexdigest(), publication.website, publication.name,
+                 publication.state, publication.media_type, None, None, None)
+                for publication in publications if publication.website]
+        with self.lock:
+            db = self._connect()
+            with db:
+                self._insert(db, publications=rows)
+                db.execute("UPDATE articles SET media_type = (SELECT p.media_type FROM publications p "
+                           "WHERE p.website_hash = articles.website_hash) WHERE media_type IS NULL")
+        return len(rows)
+
+    def articles(self, website_hash=None, state=None, media_type=None, start=None, end=None):
+        """Return articles as dicts, filtered by outlet, state, media type and publication date range [start, end)."""
+        clauses, params = [], []
+        for column, value in (("website_hash", website_hash), ("state", state), ("media_type", media_type)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if start is not None:
+            clauses.append("publication_date >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("publication_date < ?")
+            params.append(end)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.lock:
+            cursor = self._connect().execute(
+                f"SELECT {', '.join(_ARTICLE_COLUMNS)} FROM articles{where} ORDER BY publication_date", params)
+            return [dict(zip(_ARTICLE_COLUMNS, row)) for row in cursor]
+
+    def summary(self):
+        with self.lock:
+            db = self._connect()
+            articles, outlets = db.execute("SELECT COUNT(*), COUNT(DISTINCT website_hash) FROM articles").fetchone()
+            backends = dict(db.execute("SELECT backend, COUNT(*) FROM articles GROUP BY backend"))
+        return f"catalog: {articles} articles of {outlets} outlets {backends}"
+
+
+CATALOG = ArticleCatalog()
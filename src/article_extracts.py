@@ -0,0 +1,252 @@
+import datetime
+import email.utils
+import html as html_lib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urljoin
+
+from NwalaTextUtils.textutils import cleanHtml
+
+from article_search import page_title
+from collector_metrics import METRICS
+from compression import decompress, get_codec
+from news_sitemap import parse_w3c_datetime
+
+# Next to the blob store's index: extracts are keyed by the same page sha256
+EXTRACT_DB = os.path.join("blobs", "extracts.sqlite")
+# Extraction processes; 0 extracts in the calling thread
+EXTRACT_WORKERS = 2
+
+# <meta> names/properties carrying the publication date, most specific first
+DATE_META = ("article:published_time", "og:published_time", "datepublished", "publishdate", "publish-date",
+             "pubdate", "parsely-pub-date", "sailthru.date", "dc.date.issued", "dcterms.created", "dc.date", "date")
+# Dates before this are parse errors or placeholder values
+MIN_YEAR = 1990
+
+_META_RE = re.compile(r"<(meta|link)\b([^>]*)>", re.IGNORECASE)
+_ATTR_RE = re.compile(r"""([\w:.-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+_JSON_LD_RE = re.compile(r"""<script\b[^>]*type\s*=\s*["']?application/ld\+json["']?[^>]*>(.*?)</script\s*>""",
+                         re.IGNORECASE | re.DOTALL)
+_TIME_RE = re.compile(r"""<time\b[^>]*\bdatetime\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extracts (
+    sha256 TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    title TEXT,
+    canonical_url TEXT,
+    publication_date TEXT,
+    date_source TEXT,
+    text_length INTEGER NOT NULL,
+    text BLOB,
+    extracted_time TEXT NOT NULL
+);
+"""
+
+
+def _attributes(tag):
+    return {name.lower(): html_lib.unescape(double or single or bare)
+            for name, double, single, bare in _ATTR_RE.findall(tag)}
+
+
+def parse_date(value):
+    """Parse an ISO 8601 or RFC 2822 date into an aware UTC datetime, or None."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    parsed = parse_w3c_datetime(value)
+    if parsed is None:
+        try:
+            parsed = email.utils.parsedate_to_datetime(value.strip())
+        except (TypeError, ValueError, IndexError):
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+        parsed = parsed.astimezone(datetime.timezone.utc)
+    if parsed.year < MIN_YEAR:
+        return None
+    return parsed
+
+
+def _json_ld_objects(value):
+    """Yield every JSON object of a JSON-LD document, including those nested in @graph and lists."""
+    if isinstance(value, list):
+        for item in value:
+            yield from _json_ld_objects(item)
+    elif isinstance(value, dict):
+        yield value
+        for key in ("@graph", "mainEntity", "mainEntityOfPage"):
+            if isinstance(value.get(key), (list, dict)):
+                yield from _json_ld_objects(value[key])
+
+
+def page_metadata(html, url=None):
+    """
+    Return the title, canonical URL and publication date (with its source: 'json-ld', 'meta' or
+    'time') declared by a page's JSON-LD, <meta>/<link> tags and <time datetime> elements.
+    """
+    metadata = {'title': None, 'canonical_url': None, 'publication_date': None, 'date_source': None}
+    meta = {}
+    for tag, attributes in _META_RE.findall(html):
+        attributes = _attributes(attributes)
+        if tag.lower() == 'link':
+            if 'canonical' in attributes.get('rel', '').lower().split() and attributes.get('href'):
+                metadata['canonical_url'] = metadata['canonical_url'] or attributes['href']
+            continue
+        name = (attributes.get('property') or attributes.get('name') or attributes.get('itemprop') or '').lower()
+        if name and attributes.get('content') and name not in meta:
+            meta[name] = attributes['content']
+    og_url = meta.get('og:url')
+
+    for script in _JSON_LD_RE.findall(html):
+        try:
+            document = json.loads(script.strip())
+        except ValueError:
+            continue
+        for obj in _json_ld_objects(document):
+            published = parse_date(obj.get('datePublished'))
+            if published and not metadata['publication_date']:
+                metadata['publication_date'], metadata['date_source'] = published.isoformat(), 'json-ld'
+            if isinstance(obj.get('headline'), str) and not metadata['title']:
+                metadata['title'] = obj['headline'].strip() or None
+
+    if not metadata['publication_date']:
+        for name in DATE_META:
+            published = parse_date(meta.get(name))
+            if published:
+                metadata['publication_date'], metadata['date_source'] = published.isoformat(), 'meta'
+                break
+    if not metadata['publication_date']:
+        for value in _TIME_RE.findall(html):
+            published = parse_date(value)
+            if published:
+                metadata['publication_date'], metadata['date_source'] = published.isoformat(), 'time'
+                break
+
+    if meta.get('og:title'):
+        metadata['title'] = meta['og:title'].strip() or metadata['title']
+    if not metadata['title']:
+        metadata['title'] = page_title(html)
+    canonical_url = metadata['canonical_url'] or og_url
+    metadata['canonical_url'] = urljoin(url, canonical_url) if canonical_url and url else canonical_url
+    return metadata
+
+
+def extract_article(html, url=None):
+    """Extract an article's cleaned text and its metadata (see page_metadata). Runs in a worker process."""
+    extract = page_metadata(html or '', url)
+    try:
+        extract['text'] = cleanHtml(html) if html else ''
+    except Exception as e:
+        logging.warning(f"Error cleaning {url}: {e}")
+        extract['text'] = ''
+    return extract
+
+
+class ExtractStore:
+    """
+    Sidecar of the blob store: the extracted text and metadata of each stored page, keyed by its
+    sha256, so later analyses read the text instead of re-parsing the HTML. Identical pages are
+    extracted once. The text is compressed with the collector's codec (without a dictionary).
+    """
+
+    def __init__(self, filepath=EXTRACT_DB):
+        self.filepath = filepath
+        self.codec = get_codec()
+        self.lock = threading.Lock()
+        self.db = None
+
+    def _connect(self):
+        if self.db is None:
+            directory = os.path.dirname(self.filepath)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Several collectors may share the store; WAL lets them read while one writes
+            self.db = sqlite3.connect(self.filepath, timeout=30, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(_SCHEMA)
+        return self.db
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def put(self, sha256, url, extract):
+        """Store the extract of a page; a page already extracted keeps its first extract."""
+        text = extract.get('text') or ''
+        with self.lock:
+            db = self._connect()
+            with db:
+                db.execute("INSERT OR IGNORE INTO extracts (sha256, url, title, canonical_url, publication_date, "
+                           "date_source, text_length, text, extracted_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                           (sha256, url, extract.get('title'), extract.get('canonical_url'),
+                            extract.get('publication_date'), extract.get('date_source'), len(text),
+                            self.codec.compress(text.encode('utf-8')), datetime.datetime.now().isoformat()))
+
+    def get(self, sha256):
+        """Return the extract of a page (title, canonical_url, publication_date, date_source, text), or None."""
+        with self.lock:
+            row = self._connect().execute(
+                "SELECT title, canonical_url, publication_date, date_source, text FROM extracts WHERE sha256 = ?",
+                (sha256,)).fetchone()
+        if row is None:
+            return None
+        title, canonical_url, publication_date, date_source, text = row
+        return {'title': title, 'canonical_url': canonical_url, 'publication_date': publication_date,
+                'date_source': date_source, 'text': decompress(text).decode('utf-8') if text else ''}
+
+    def summary(self):
+        with self.lock:
+            db = self._connect()
+            pages, dated, text_bytes = db.execute(
+                "SELECT COUNT(*), COUNT(publication_date), COALESCE(SUM(text_length), 0) FROM extracts").fetchone()
+        return f"extracts: {pages} pages ({dated} with a publication date), {text_bytes} characters of text"
+
+
+class ExtractionPool:
+    """
+    Process pool running extract_article off the fetch loop. submit() returns a Future; callers
+    collect the results once the publication's fetches are done.
+    """
+
+    def __init__(self, workers=EXTRACT_WORKERS):
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.pool = None
+
+    def submit(self, html, url):
+        if self.workers > 0:
+            with self.lock:
+                if self.pool is None:
+                    # spawn: the collector runs metrics and logging threads, which fork does not copy safely
+                    self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                    mp_context=multiprocessing.get_context('spawn'))
+                try:
+                    return self.pool.submit(extract_article, html, url)
+                except BrokenProcessPool as e:
+                    # A crashed worker breaks the pool; the next submit starts a new one
+                    logging.error(f"Extraction pool broke, extracting {url} inline: {e}")
+                    METRICS.inc('article_extraction_pool_restarts_total')
+                    self.pool.shutdown(wait=False)
+                    self.pool = None
+        future = Future()
+        future.set_result(extract_article(html, url))
+        return future
+
+    def close(self):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+
+
+EXTRACTS = ExtractStore()
+EXTRACTION_POOL = ExtractionPool()
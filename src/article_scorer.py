@@ -0,0 +1,125 @@
+import re
+from html.parser import HTMLParser
+
+from NwalaTextUtils.textutils import cleanHtml
+
+from collector_metrics import METRICS
+
+# is_news_article accepts a page whose cleaned text is longer than this
+MIN_TEXT_CHARS = 20
+# Paragraph text outside boilerplate containers beyond which a page is an article without further checks
+SURE_TEXT_CHARS = 200
+# Pages are tokenized in chunks of this many characters; the scorer stops after the chunk that decides
+CHUNK_CHARS = 8192
+
+# Text inside these elements is never article text
+_SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'svg', 'title', 'select', 'button', 'textarea'}
+# Text inside these elements is boilerplate: navigation, headers, sidebars, forms
+_BOILERPLATE_TAGS = {'nav', 'header', 'footer', 'aside', 'form', 'menu'}
+_PARAGRAPH_TAGS = {'p', 'blockquote', 'li', 'pre', 'h1', 'h2', 'h3'}
+_VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+# schema.org types of articles: Article, NewsArticle, ReportageNewsArticle, BlogPosting, ...
+_ARTICLE_TYPES = re.compile(r"Article|BlogPosting", re.IGNORECASE)
+
+
+class _Decided(Exception):
+    pass
+
+
+class ArticleScorer(HTMLParser):
+    """
+    Streaming article-likelihood scorer. It counts the visible text and the paragraph text outside
+    boilerplate containers, notes <article>, og:type=article and schema.org Article markup, and
+    stops tokenizing as soon as the page is clearly an article.
+    """
+
+    def __init__(self, min_chars=MIN_TEXT_CHARS, sure_chars=SURE_TEXT_CHARS):
+        super().__init__(convert_charrefs=True)
+        self.min_chars = min_chars
+        self.sure_chars = sure_chars
+        self.skip_depth = 0
+        self.boilerplate_depth = 0
+        self.paragraph_depth = 0
+        self.visible_chars = 0
+        self.paragraph_chars = 0
+        self.article_signal = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _VOID_TAGS:
+            self.handle_startendtag(tag, attrs)
+            return
+        if tag == 'body':
+            # Whatever the head left unclosed ends here, as it does in browsers
+            self.skip_depth = 0
+        elif tag in _SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in _BOILERPLATE_TAGS:
+            self.boilerplate_depth += 1
+        elif tag in _PARAGRAPH_TAGS:
+            self.paragraph_depth += 1
+        if tag == 'article':
+            self.article_signal = True
+        elif not self.article_signal:
+            itemtype = dict(attrs).get('itemtype') or ''
+            self.article_signal = bool(itemtype and _ARTICLE_TYPES.search(itemtype))
+
+    def handle_startendtag(self, tag, attrs):
+        if tag == 'meta' and not self.article_signal:
+            attrs = dict(attrs)
+            if (attrs.get('property') or attrs.get('name') or '').lower() == 'og:type':
+                self.article_signal = (attrs.get('content') or '').lower() == 'article'
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in _BOILERPLATE_TAGS:
+            self.boilerplate_depth = max(0, self.boilerplate_depth - 1)
+        elif tag in _PARAGRAPH_TAGS:
+            self.paragraph_depth = max(0, self.paragraph_depth - 1)
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        chars = len(data.strip())
+        self.visible_chars += chars
+        if self.paragraph_depth and not self.boilerplate_depth:
+            self.paragraph_chars += chars
+            if self.paragraph_chars >= self.sure_chars or self.article_signal and self.paragraph_chars > self.min_chars:
+                raise _Decided()
+
+    def verdict(self, finished):
+        """(is_article, reason): True/False when the signals decide, None when only full cleaning can."""
+        if self.paragraph_chars >= self.sure_chars:
+            return True, 'paragraph_text'
+        if self.article_signal and self.paragraph_chars > self.min_chars:
+            return True, 'article_signal'
+        if finished and self.visible_chars <= self.min_chars:
+            # Cleaning only removes text, so it cannot find more than there is
+            return False, 'no_text'
+        return None, 'unsure'
+
+
+def score_article(html, min_chars=MIN_TEXT_CHARS, sure_chars=SURE_TEXT_CHARS):
+    """Tokenize a page until it is decided. Returns (True/False/None, reason) as ArticleScorer.verdict."""
+    scorer = ArticleScorer(min_chars, sure_chars)
+    try:
+        for start in range(0, len(html), CHUNK_CHARS):
+            scorer.feed(html[start:start + CHUNK_CHARS])
+        scorer.close()
+    except _Decided:
+        return scorer.verdict(finished=False)
+    return scorer.verdict(finished=True)
+
+
+def is_article_text(html, min_chars=MIN_TEXT_CHARS):
+    """
+    The is_news_article content check: does cleanHtml(html) yield more than min_chars characters?
+    The streaming scorer answers most pages; full boilerplate removal runs only when it is unsure.
+    Returns (is_article, reason).
+    """
+    verdict, reason = score_article(html, min_chars)
+    if verdict is None:
+        with METRICS.timer('clean_html'):
+            verdict, reason = len(cleanHtml(html)) > min_chars, 'clean_html'
+    METRICS.inc('article_checks_total', reason=reason)
+    return verdict, reason
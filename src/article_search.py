@@ -0,0 +1,172 @@
+import html as html_lib
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+from collector_metrics import METRICS
+
+SEARCH_DB = "search.sqlite"
+
+# Long pages are indexed up to this many characters of text; it bounds index growth from huge comment threads
+MAX_TEXT_CHARS = 100_000
+# bm25 weights of the title and text columns
+TITLE_WEIGHT = 4.0
+TEXT_WEIGHT = 1.0
+
+_TITLE_RE = re.compile(r"<title[^>]*>(.*?)</title\s*>", re.IGNORECASE | re.DOTALL)
+
+# documents holds what is filtered and returned; documents_fts is contentless (content=''),
+# so the article text is tokenized into the index but not stored a second time
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    link TEXT NOT NULL UNIQUE,
+    title TEXT,
+    website_hash TEXT,
+    state TEXT,
+    publication_date TEXT,
+    sha256 TEXT
+);
+CREATE INDEX IF NOT EXISTS documents_state_date ON documents(state, publication_date);
+CREATE INDEX IF NOT EXISTS documents_outlet_date ON documents(website_hash, publication_date);
+CREATE INDEX IF NOT EXISTS documents_date ON documents(publication_date);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+    title, text, content='', tokenize='porter unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS scanned_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+"""
+
+_RESULT_COLUMNS = ("link", "title", "website_hash", "state", "publication_date", "sha256", "score")
+
+
+def page_title(html):
+    """Return the <title> of an HTML page, or None."""
+    match = _TITLE_RE.search(html or '')
+    if not match:
+        return None
+    title = " ".join(html_lib.unescape(match.group(1)).split())
+    return title or None
+
+
+class ArticleSearch:
+    """
+    Incremental SQLite FTS5 index of article text and titles, with outlet, state and publication
+    date for filtering. The html collector adds each article as it extracts its text;
+    build-search-index.py backfills it from an existing tree.
+    """
+
+    def __init__(self, filepath=SEARCH_DB):
+        self.filepath = filepath
+        self.lock = threading.Lock()
+        self.db = None
+
+    def _connect(self):
+        if self.db is None:
+            directory = os.path.dirname(self.filepath)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Several collectors may share the index; WAL lets them read while one writes
+            self.db = sqlite3.connect(self.filepath, timeout=30, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(_SCHEMA)
+        return self.db
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def _insert(self, db, documents):
+        """Index (link, title, text, website_hash, state, publication_date, sha256) tuples; links already indexed are skipped."""
+        added = 0
+        for link, title, text, website_hash, state, publication_date, sha256 in documents:
+            cursor = db.execute("INSERT OR IGNORE INTO documents (link, title, website_hash, state, publication_date, sha256) "
+                                "VALUES (?, ?, ?, ?, ?, ?)", (link, title, website_hash, state, publication_date, sha256))
+            if cursor.rowcount:
+                db.execute("INSERT INTO documents_fts (rowid, title, text) VALUES (?, ?, ?)",
+                           (cursor.lastrowid, title or '', (text or '')[:MAX_TEXT_CHARS]))
+                added += 1
+        return added
+
+    def add(self, link, text, title=None, state=None, website_hash=None, publication_date=None, sha256=None):
+        """Index an article as it is collected. Failures are logged, never raised. Returns True if it was new."""
+        try:
+            with METRICS.timer('search_index'):
+                with self.lock:
+                    db = self._connect()
+                    with db:
+                        added = self._insert(db, [(link, title, text, website_hash, state, publication_date, sha256)])
+        except sqlite3.Error as e:
+            logging.error(f"Error indexing article {link}: {e}")
+            return False
+        if added:
+            METRICS.inc('search_documents_indexed_total')
+        return bool(added)
+
+    def add_many(self, documents, path=None, stat=None):
+        """
+        Index a batch of document tuples in one transaction (see _insert). With path and stat,
+        the file they came from is recorded so the next rebuild skips it while it is unchanged.
+        """
+        with self.lock:
+            db = self._connect()
+            with db:
+                added = self._insert(db, documents)
+                if path is not None:
+                    db.execute("INSERT OR REPLACE INTO scanned_files (path, size, mtime) VALUES (?, ?, ?)",
+                               (path, stat.st_size, stat.st_mtime))
+        return added
+
+    def scanned_files(self):
+        """Map each file indexed by a rebuild to its (size, mtime) at the time."""
+        with self.lock:
+            db = self._connect()
+            return {path: (size, mtime) for path, size, mtime in db.execute("SELECT path, size, mtime FROM scanned_files")}
+
+    def search(self, query, state=None, website_hash=None, start=None, end=None, limit=20):
+        """
+        Return the best matches of an FTS5 query (words, "phrases", OR, NOT, prefix*) as dicts,
+        filtered by state, outlet and publication date range [start, end), best first.
+        Raises sqlite3.OperationalError for a malformed query.
+        """
+        clauses, params = ["documents_fts MATCH ?"], [query]
+        for column, value in (("d.state", state), ("d.website_hash", website_hash)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if start is not None:
+            clauses.append("d.publication_date >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("d.publication_date < ?")
+            params.append(end)
+        with self.lock:
+            cursor = self._connect().execute(
+                f"SELECT d.link, d.title, d.website_hash, d.state, d.publication_date, d.sha256, "
+                f"bm25(documents_fts, {TITLE_WEIGHT}, {TEXT_WEIGHT}) AS score "
+                f"FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid "
+                f"WHERE {' AND '.join(clauses)} ORDER BY score LIMIT ?", params + [limit])
+            return [dict(zip(_RESULT_COLUMNS, row)) for row in cursor]
+
+    def optimize(self):
+        """Merge the index's b-trees into one; worth running after a large backfill."""
+        with self.lock:
+            db = self._connect()
+            with db:
+                db.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
+
+    def summary(self):
+        with self.lock:
+            db = self._connect()
+            documents, outlets = db.execute("SELECT COUNT(*), COUNT(DISTINCT website_hash) FROM documents").fetchone()
+        return f"search index: {documents} articles of {outlets} outlets"
+
+
+SEARCH = ArticleSearch()
@@ -0,0 +1,189 @@
+import datetime
+import hashlib
+import os
+import sqlite3
+import threading
+
+from collector_metrics import METRICS
+from page_encoding import decode_page, page_encoding
+from segment_store import SEGMENTS, read_payload, read_record
+from warc_writer import record_http_headers, record_payload
+
+# Article HTML is stored once per distinct body, packed into segment files (segment_store.py).
+# blobs/index.sqlite maps each body's sha256 to its segment and offset.
+BLOB_DIR = "blobs"
+BLOB_INDEX = "index.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL DEFAULT 0,
+    first_seen TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS refs (
+    id INTEGER PRIMARY KEY,
+    sha256 TEXT NOT NULL REFERENCES blobs(sha256),
+    url TEXT NOT NULL,
+    state TEXT,
+    website_hash TEXT,
+    saved_time TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS refs_sha256 ON refs(sha256);
+CREATE INDEX IF NOT EXISTS refs_url ON refs(url);
+"""
+
+
+def content_hash(data):
+    """Return the sha256 hex digest that addresses a body."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore:
+    """
+    Content-addressed store for article HTML.
+    Each body is written once; every save adds a reference row pointing to it, and
+    blobs.refcount counts those references so shared bodies can be reported and released.
+    The blobs table is the offset index: it maps each sha256 to its segment and offset.
+    """
+
+    def __init__(self, root=BLOB_DIR, segments=SEGMENTS):
+        self.root = root
+        self.segments = segments
+        self.lock = threading.Lock()
+        self.db = None
+
+    def _connect(self):
+        if self.db is None:
+            os.makedirs(self.root, exist_ok=True)
+            # Several collectors may share the store; WAL lets them read while one writes
+            self.db = sqlite3.connect(os.path.join(self.root, BLOB_INDEX), timeout=30, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(_SCHEMA)
+        return self.db
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def locate(self, sha256):
+        """Return (segment, offset, stored_size) of a stored body, or None."""
+        with self.lock:
+            return self._connect().execute(
+                "SELECT segment, offset, stored_size FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+
+    def put(self, data, url, state=None, website_hash=None, content_type="text/html", response=None, encoding=None):
+        """
+        Store a body referenced by url: bytes, or a streamed body (page_fetcher.FetchedPage) whose
+        sha256 was computed while downloading. Returns (sha256, (segment, offset, length), is_new);
+        is_new is False when identical content was already stored.
+        With the requests.Response that fetched it, the body is stored as WARC request/response
+        records; a repeated body then only adds a revisit record with the new fetch's headers.
+        The bytes are stored undecoded; encoding, if known, goes into the segment index.
+        """
+        if isinstance(data, bytes):
+            sha256, size = content_hash(data), len(data)
+        else:
+            sha256, size = data.sha256, data.size
+        saved_time = datetime.datetime.now().isoformat()
+        with self.lock:
+            db = self._connect()
+            row = db.execute("SELECT segment, offset, stored_size FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            is_new = row is None
+            index_fields = {'sha256': sha256}
+            if encoding:
+                index_fields['encoding'] = encoding
+            # Records are durable in their segment before the index refers to them
+            if is_new and response is not None:
+                row = self.segments.append_exchange(state or "unknown", response, data, index_fields)
+            elif is_new:
+                body = data if isinstance(data, bytes) else data.read()
+                row = self.segments.append_resource(state or "unknown", url, body, content_type, index_fields)
+            elif response is not None:
+                original = read_record(*row)[0]
+                revisit_of = (original.get("WARC-Target-URI", url), original["WARC-Date"])
+                self.segments.append_exchange(state or "unknown", response, data, index_fields, revisit_of)
+            with db:
+                db.execute(
+                    "INSERT OR IGNORE INTO blobs (sha256, size, stored_size, refcount, first_seen, segment, offset) "
+                    "VALUES (?, ?, ?, 0, ?, ?, ?)",
+                    (sha256, size, row[2], saved_time, row[0], row[1]))
+                db.execute("UPDATE blobs SET refcount = refcount + 1 WHERE sha256 = ?", (sha256,))
+                db.execute("INSERT INTO refs (sha256, url, state, website_hash, saved_time) VALUES (?, ?, ?, ?, ?)",
+                           (sha256, url, state, website_hash, saved_time))
+        if is_new:
+            METRICS.inc('blob_store_bytes_written_total', row[2])
+        else:
+            METRICS.inc('blob_store_bytes_deduplicated_total', size)
+        return sha256, tuple(row), is_new
+
+    def get(self, sha256):
+        """Return the body stored under sha256, reading it through the index."""
+        location = self.locate(sha256)
+        if location is None:
+            raise KeyError(sha256)
+        return read_payload(*location)
+
+    def get_text(self, sha256):
+        """
+        Return the body stored under sha256 decoded to text. The encoding comes from the stored
+        response's Content-Type charset, a BOM or <meta charset>, so only readers that need text decode.
+        """
+        location = self.locate(sha256)
+        if location is None:
+            raise KeyError(sha256)
+        headers, block = read_record(*location)
+        data = record_payload(headers, block)
+        return decode_page(data, page_encoding(data, record_http_headers(headers, block))[0])
+
+    def release(self, sha256, url):
+        """
+        Drop one reference of url to a blob and its index row once nothing references it.
+        Segments are append-only: a released body stays in its segment until the segment is rewritten.
+        """
+        with self.lock:
+            db = self._connect()
+            with db:
+                ref = db.execute("SELECT id FROM refs WHERE sha256 = ? AND url = ? ORDER BY id DESC LIMIT 1",
+                                 (sha256, url)).fetchone()
+                if ref is None:
+                    return False
+                db.execute("DELETE FROM refs WHERE id = ?", ref)
+                db.execute("UPDATE blobs SET refcount = refcount - 1 WHERE sha256 = ?", (sha256,))
+                refcount = db.execute("SELECT refcount FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()[0]
+                if refcount <= 0:
+                    db.execute("DELETE FROM blobs WHERE sha256 = ?", (sha256,))
+        return True
+
+    def report(self):
+        """Summarize how many bytes deduplication saved."""
+        with self.lock:
+            db = self._connect()
+            blobs, refs, size, logical, stored = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(refcount), 0), COALESCE(SUM(size), 0), "
+                "COALESCE(SUM(size * refcount), 0), COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()
+            shared = db.execute("SELECT COUNT(*) FROM blobs WHERE refcount > 1").fetchone()[0]
+        return {
+            'blobs': blobs,
+            'references': refs,
+            'shared_blobs': shared,
+            'logical_bytes': logical,
+            'unique_bytes': size,
+            'stored_bytes': stored,
+            'deduplicated_bytes': logical - size,
+        }
+
+    def summary(self):
+        report = self.report()
+        return (f"blob store: {report['blobs']} blobs for {report['references']} articles, "
+                f"{report['deduplicated_bytes']} of {report['logical_bytes']} bytes deduplicated, "
+                f"{report['stored_bytes']} bytes on disk")
+
+
+BLOB_STORE = BlobStore()
+
@@ -3,14 +3,16 @@ import json
 import os
 import hashlib
 import gzip
-import feedparser
 import datetime
 import requests
 import subprocess
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse, unquote, urlsplit
-from NwalaTextUtils.textutils import derefURI, cleanHtml
+from NwalaTextUtils.textutils import derefURI
 import time
+from seed_loader import iter_publications
+from feed_fetcher import fetch_feeds, FEED_STATS
+from article_scorer import is_article_text
+from html_links import LINK_PARSER
 
 # Configure logging
 logging.basicConfig(
@@ -22,12 +24,6 @@ logging.basicConfig(
     ]
 )
 
-logging.info("Starting the script...")
-
-# Load the JSON file
-with open("output.json", "r") as f:
-    data = json.load(f)
-
 # Define headers for HTTP requests
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/102.0.0.0 Safari/537.36'
@@ -64,12 +60,9 @@ def get_expanded_url(short_url):
 
 def extract_article_urls_from_html(html_content, base_url):
     """Extract all article URLs from the given HTML content."""
-    soup = BeautifulSoup(html_content, 'html.parser')
+    hrefs = LINK_PARSER.parse(html_content).anchors
     resolved_base = get_expanded_url(base_url)
-    return {
-        urljoin(resolved_base, link['href'])
-        for link in soup.find_all("a", href=True)
-    }
+    return {urljoin(resolved_base, href) for href in hrefs}
 
 
 def get_publication_date(entry):
@@ -106,13 +99,9 @@ def is_news_article(link):
 
     try:
         html = derefURI(link)
-        plaintext = cleanHtml(html)
-        count = len(plaintext)
-        if count > 20:
-            is_news_article = True
-        else:
-            print(f"Word count is less for {link}\n {plaintext}\n")
-            is_news_article = False
+        is_news_article, reason = is_article_text(html)
+        if not is_news_article:
+            print(f"Word count is less for {link} ({reason})\n")
     except Exception as e:
         # If an exception occurs, write the error message to the log file
         print(f"Error processing link: {link} because of {e}\n")
@@ -184,9 +173,10 @@ def save_publication(state, year, month, date, website_url, publication):
         logging.info(f"Website: {website_url} has been saved")
         archived_url = get_archived_path(website_url)
         if archived_url:
-            publication['archived_link'] = archived_url
+            # The full seed entry is only needed here, so it is loaded lazily
+            publication_json = dict(publication.metadata(), archived_link=archived_url)
             with gzip.open(wesite_file_path, "at") as f:
-                f.write(json.dumps(publication))
+                f.write(json.dumps(publication_json))
 
 
 # Main Processing
@@ -203,11 +193,11 @@ def process_publication(state, publication, year, month, day):
     article_json_objs = []
     nlinks = 0
 
-    # Process RSS Feeds
+    # Process RSS Feeds (all feeds of the publication are fetched concurrently, with timeouts)
+    feeds = fetch_feeds(rss_feeds)
     for rss_feed_url in rss_feeds:
         logging.info(f"Processing RSS feed: {rss_feed_url}")
-        feed = feedparser.parse(rss_feed_url)
-        for entry in feed.entries:
+        for entry in feeds[rss_feed_url]:
             article_url = entry.link
             if article_url not in cached_urls and is_news_article(article_url):
                 logging.info(f"Found article: {article_url}")
@@ -266,16 +256,22 @@ def get_status_code(url):
         return None  # In case of error, return None
 
 # Run the Script
-while True:
-    for state, publications in data.items():
-        logging.info(f"Processing state: {state}")
-        for news_media in ['newspaper', 'tv', 'radio', 'broadcast']:
-            for publication in publications.get(news_media, []):
-                website_url = publication.get("website")
-                response_status = get_status_code(website_url)
-                logging.info(response_status)
-                if response_status and (200 <= response_status < 300):
-                    timestamp = datetime.datetime.now()
-                    process_publication(state, publication, timestamp.year, timestamp.month, timestamp.day)
-                    save_publication(state, timestamp.year, timestamp.month, timestamp.day, website_url, publication)
-    time.sleep(1)  # Prevent overwhelming the server
+if __name__ == "__main__":
+    logging.info("Starting the script...")
+
+    while True:
+        # Stream compact records from the seed file instead of loading it whole
+        state = None
+        for publication in iter_publications("output.json"):
+            if publication.state != state:
+                state = publication.state
+                logging.info(f"Processing state: {state}")
+            website_url = publication.website
+            response_status = get_status_code(website_url)
+            logging.info(response_status)
+            if response_status and (200 <= response_status < 300):
+                timestamp = datetime.datetime.now()
+                process_publication(state, publication, timestamp.year, timestamp.month, timestamp.day)
+                save_publication(state, timestamp.year, timestamp.month, timestamp.day, website_url, publication)
+        logging.info(FEED_STATS.summary())
+        time.sleep(1)  # Prevent overwhelming the server
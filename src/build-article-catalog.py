@@ -0,0 +1,36 @@
+"""
+Build or refresh catalog.sqlite from an existing news/ tree.
+
+Every <hash>.jsonl.gz, <hash>_articles.jsonl.gz and <hash>_metadata.jsonl.gz file is parsed in a
+pool of worker processes; only files that changed since the last run are rescanned.
+
+    python build-article-catalog.py
+    python build-article-catalog.py --root ../results/ia/Trial_VA/news --db va-catalog.sqlite --full
+    python build-article-catalog.py --seed preprocessed_updated_news_media_rss_and_status_code.json
+"""
+import argparse
+import logging
+import os
+import time
+
+from article_catalog import CATALOG_DB, NEWS_DIR, ArticleCatalog
+from seed_loader import iter_publications
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default=NEWS_DIR, help="news/ directory to scan")
+    parser.add_argument("--db", default=CATALOG_DB, help="catalog database")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="parser processes")
+    parser.add_argument("--full", action="store_true", help="rescan every file instead of only changed ones")
+    parser.add_argument("--seed", help="seed file whose publications fill in outlet names and media types")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    catalog = ArticleCatalog(args.db)
+    start = time.perf_counter()
+    if args.seed:
+        logging.info(f"Cataloged {catalog.add_seed_publications(iter_publications(args.seed))} seed publications")
+    scanned = catalog.rebuild(args.root, args.workers, args.full)
+    logging.info(f"Scanned {scanned} files of {args.root} in {time.perf_counter() - start:.1f}s")
+    logging.info(catalog.summary())
+    catalog.close()
@@ -0,0 +1,88 @@
+"""
+Build or refresh search.sqlite, the full-text article index, from an existing news/ tree.
+
+The html collector indexes articles as it saves them; this backfills articles collected before
+the index existed. Each changed <hash>.jsonl.gz file is handed to a worker process that takes its
+articles' text from the extract sidecar, or else reads their pages (from the blob store's segments,
+or legacy .html.gz/.html.zst files) and extracts it. Run it from the collector's working
+directory, where blobs/ and segments/ are.
+
+    python build-search-index.py
+    python build-search-index.py --root news/VA --workers 8
+"""
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from NwalaTextUtils.textutils import cleanHtml
+
+from article_catalog import NEWS_DIR, iter_metadata_files, parse_news_path, read_records
+from article_extracts import EXTRACTS
+from article_search import SEARCH_DB, ArticleSearch, page_title
+from blob_store import BLOB_STORE
+from compression import read_page
+from page_encoding import decode_page, page_encoding
+
+
+def article_html(record):
+    """Return the stored page of an html collector article record as text, or None."""
+    if record.get('html_segment') and record.get('sha256'):
+        return BLOB_STORE.get_text(record['sha256'])
+    if record.get('html_file_path') and os.path.exists(record['html_file_path']):
+        data = read_page(record['html_file_path'])
+        return decode_page(data, page_encoding(data)[0])
+    return None
+
+
+def index_file(path):
+    """Extract the documents of one metadata file. Runs in a worker process."""
+    state, _, website_hash = parse_news_path(path)
+    documents = []
+    for record in read_records(path):
+        if not isinstance(record, dict) or not record.get('link'):
+            continue
+        try:
+            extract = EXTRACTS.get(record['sha256']) if record.get('sha256') else None
+            if extract is not None:
+                title, text = extract['title'], extract['text']
+            else:
+                html = article_html(record)
+                title, text = page_title(html), cleanHtml(html) if html else None
+        except Exception as e:
+            logging.warning(f"Skipping {record['link']}: {e}")
+            continue
+        if text:
+            documents.append((record['link'], title, text, website_hash, state,
+                              record.get('publication_date'), record.get('sha256')))
+    return path, documents
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default=NEWS_DIR, help="news/ directory to index")
+    parser.add_argument("--db", default=SEARCH_DB, help="search index database")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="text extraction processes")
+    parser.add_argument("--full", action="store_true", help="re-read every file instead of only changed ones")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    search = ArticleSearch(args.db)
+    start = time.perf_counter()
+    scanned = {} if args.full else search.scanned_files()
+    changed = {}
+    for path in iter_metadata_files(args.root):
+        stat = os.stat(path)
+        if scanned.get(path) != (stat.st_size, stat.st_mtime):
+            changed[path] = stat
+
+    added = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for path, documents in pool.map(index_file, sorted(changed), chunksize=16):
+            added += search.add_many(documents, path, changed[path])
+    if added:
+        search.optimize()
+    logging.info(f"Indexed {added} new articles from {len(changed)} files in {time.perf_counter() - start:.1f}s")
+    logging.info(search.summary())
+    search.close()
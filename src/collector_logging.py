@@ -0,0 +1,89 @@
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+
+from collector_metrics import METRICS
+
+LOG_MAX_BYTES = 50 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# Per-link events are counted every time but only every Nth occurrence is written to the log
+SAMPLE_EVERY = {
+    'invalid_url': 100,
+    'not_article_path': 100,
+    'article_rejected': 100,
+    'short_article': 20,
+    'head_failed': 20,
+    'article_found': 10,
+    'article_saved': 10,
+    'metadata_saved': 10,
+}
+
+_sample_counts = {}
+_sample_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including structured event fields."""
+
+    def format(self, record):
+        event = {
+            'time': datetime.datetime.fromtimestamp(record.created).isoformat(),
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'event', None):
+            event['event'] = record.event
+            event.update(record.fields)
+        if record.exc_info:
+            event['exception'] = self.formatException(record.exc_info)
+        return json.dumps(event, default=str)
+
+
+def setup_logging(log_file="news_scraper.log", level=logging.INFO, console=True,
+                  max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT):
+    """
+    Route all logging through a queue so the hot path never blocks on file or console I/O.
+    A background listener writes JSON lines to a size-rotated log file (and plain text to the console).
+    """
+    handlers = [logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)]
+    handlers[0].setFormatter(JsonFormatter())
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        handlers.append(console_handler)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def log_event(event, message=None, level=logging.INFO, **fields):
+    """
+    Count a structured event and log it, sampling chatty per-link events per SAMPLE_EVERY.
+    Counts are exported as collector_log_events_total{event=...}.
+    """
+    METRICS.inc('collector_log_events_total', event=event, host=None)
+    sample_every = SAMPLE_EVERY.get(event, 1)
+    if sample_every > 1:
+        with _sample_lock:
+            count = _sample_counts.get(event, 0)
+            _sample_counts[event] = count + 1
+        if count % sample_every:
+            return
+        fields['sampled_1_in'] = sample_every
+    if message is None:
+        message = ' '.join([event] + [f"{key}={value}" for key, value in fields.items()])
+    logging.log(level, message, extra={'event': event, 'fields': fields})
@@ -0,0 +1,217 @@
+import bisect
+import contextlib
+import contextvars
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram buckets in seconds, from cache hits to slow archiving calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Labels (e.g. state, host) applied to every observation made in the current context
+_context_labels = contextvars.ContextVar("collector_metric_labels", default={})
+
+# Only these counters keep the host label: one series per host each. Histograms and all other metrics
+# are aggregated across hosts, so the number of series does not grow with the seed list.
+HOST_METRICS = frozenset({'collector_host_seconds_total', 'feed_fetch_failures_total', 'feed_fetch_bytes_total'})
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in items) + '}'
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """In-process counters, gauges and histograms keyed by metric name and label set."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def _key(self, name, labels):
+        merged = dict(_context_labels.get())
+        merged.update(labels)
+        if name not in HOST_METRICS:
+            merged.pop('host', None)
+        return name, tuple(sorted((key, str(value)) for key, value in merged.items() if value is not None))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """Set a gauge, e.g. the memory a worker currently holds."""
+        key = self._key(name, labels)
+        with self.lock:
+            self.gauges[key] = value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+        if name == 'collector_stage_seconds' and (labels.get('host') or _context_labels.get().get('host')):
+            # Stage time per host is kept as a single counter, not a histogram per host and stage
+            self.inc('collector_host_seconds_total', value, **dict(labels, stage=None))
+
+    @contextlib.contextmanager
+    def timer(self, stage, **labels):
+        """Time a block of the collector hot path as collector_stage_seconds{stage=...}."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('collector_stage_seconds', time.perf_counter() - start, stage=stage, **labels)
+
+    @contextlib.contextmanager
+    def labels(self, **labels):
+        """Attach labels (e.g. state, host) to every metric recorded inside the block."""
+        merged = dict(_context_labels.get())
+        merged.update(labels)
+        token = _context_labels.set(merged)
+        try:
+            yield
+        finally:
+            _context_labels.reset(token)
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted((key, (h.buckets, list(h.counts), h.sum, h.count)) for key, h in self.histograms.items())
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), value in gauges:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+        for (name, labels), (buckets, counts, total, count) in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', bound))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, top_hosts=5):
+        """Aggregate stage timings by stage, state and slowest host to show where a cycle spends its time."""
+        stages, states, hosts = {}, {}, {}
+        with self.lock:
+            for (name, labels), histogram in self.histograms.items():
+                if name != 'collector_stage_seconds':
+                    continue
+                labels = dict(labels)
+                stage = stages.setdefault(labels.get('stage'), {'count': 0, 'seconds': 0.0})
+                stage['count'] += histogram.count
+                stage['seconds'] += histogram.sum
+                if 'state' in labels:
+                    states[labels['state']] = states.get(labels['state'], 0.0) + histogram.sum
+            counters = {}
+            for (name, labels), value in self.counters.items():
+                counters[name] = counters.get(name, 0) + value
+                host = dict(labels).get('host')
+                if name == 'collector_host_seconds_total' and host is not None:
+                    hosts[host] = hosts.get(host, 0.0) + value
+            gauges = {}
+            for (name, labels), value in self.gauges.items():
+                gauges[name] = max(gauges.get(name, value), value)
+        total = sum(stage['seconds'] for stage in stages.values()) or 1.0
+        return {
+            'stages': {
+                stage: dict(values, share=round(values['seconds'] / total, 3))
+                for stage, values in sorted(stages.items(), key=lambda item: -item[1]['seconds'])
+            },
+            'states': dict(sorted(states.items(), key=lambda item: -item[1])),
+            'slowest_hosts': dict(sorted(hosts.items(), key=lambda item: -item[1])[:top_hosts]),
+            'counters': counters,
+            'gauges': gauges,
+        }
+
+
+METRICS = MetricsRegistry()
+
+
+def start_metrics_server(port=9108, host='127.0.0.1', registry=METRICS):
+    """Serve the registry at http://host:port/metrics from a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), Handler)
+    except OSError as e:
+        logging.error(f"Could not start metrics endpoint on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f"Serving metrics at http://{host}:{port}/metrics")
+    return server
+
+
+def start_summary_dump(interval=300, filepath="metrics_summary.json", registry=METRICS):
+    """Log a per-stage summary every interval seconds and write it to filepath."""
+    stop = threading.Event()
+
+    def dump():
+        while not stop.wait(interval):
+            summary = registry.summary()
+            stages = ', '.join(f"{stage}={values['seconds']:.1f}s ({values['share']:.0%})"
+                               for stage, values in summary['stages'].items())
+            logging.info(f"Stage time: {stages}")
+            try:
+                with open(filepath, 'w') as f:
+                    json.dump(summary, f, indent=2)
+            except OSError as e:
+                logging.error(f"Error writing metrics summary {filepath}: {e}")
+
+    threading.Thread(target=dump, daemon=True).start()
+    return stop
@@ -0,0 +1,182 @@
+"""
+Compact the multi-member jsonl.gz files of a news/ tree.
+
+The collectors append a new gzip member to <hash>.jsonl.gz / <hash>_articles.jsonl.gz on every
+cycle, so old files become chains of many tiny members that compress poorly and read slowly.
+Each such file is rewritten as a single gzip member, optionally with its records deduplicated
+and sorted, then atomically swapped in.
+
+It is safe to run next to the collectors: files in today's directories (the only ones they
+append to) and files modified within --min-age minutes are skipped, and a file that changes
+while it is being compacted is left alone until the next run.
+
+    python compact-jsonl.py --dry-run
+    python compact-jsonl.py --dedupe --sort publication_date
+    python compact-jsonl.py --root ../results/ia/Trial_VA/news --dedupe-key link
+"""
+import argparse
+import datetime
+import gzip
+import json
+import logging
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from article_catalog import NEWS_DIR, iter_metadata_files, parse_news_path
+
+COMPRESS_LEVEL = 9
+MIN_AGE_MINUTES = 60
+
+
+def count_members(data):
+    """Number of gzip members in a file's bytes."""
+    members = 0
+    while data:
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        decompressor.decompress(data)
+        if not decompressor.eof:
+            # A trailing member cut short by a crash counts as one
+            return members + 1
+        members += 1
+        data = decompressor.unused_data
+    return members
+
+
+def read_lines(data):
+    """Return the non-empty lines of a jsonl.gz file, dropping a torn last line."""
+    try:
+        text = gzip.decompress(data)
+    except (EOFError, OSError):
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        text = b''
+        while data:
+            text += decompressor.decompress(data)
+            data = decompressor.unused_data
+            if not decompressor.eof:
+                break
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        text = text[:text.rfind(b"\n") + 1]
+    return [line for line in text.decode('utf-8').splitlines() if line.strip()]
+
+
+def timed_read(data):
+    """Seconds to decompress and parse a file's records, the way readers of the tree do."""
+    start = time.perf_counter()
+    for line in read_lines(data):
+        json.loads(line)
+    return time.perf_counter() - start
+
+
+def compact_records(lines, dedupe=False, dedupe_key=None, sort_key=None):
+    """Deduplicate (identical lines, or the same value of dedupe_key; first wins) and sort lines."""
+    seen = set()
+    kept = []
+    for line in lines:
+        if dedupe_key:
+            try:
+                key = json.loads(line).get(dedupe_key)
+            except (json.JSONDecodeError, AttributeError):
+                key = None
+            key = line if key is None else key
+        else:
+            key = line.strip() if dedupe else None
+        if key is not None:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(line)
+    if sort_key:
+        def sort_value(line):
+            try:
+                return str(json.loads(line).get(sort_key) or '')
+            except (json.JSONDecodeError, AttributeError):
+                return ''
+        kept.sort(key=sort_value)
+    return kept
+
+
+def compact_file(task):
+    """Rewrite one file as a single gzip member. Returns a report dict. Runs in a worker process."""
+    path, options = task
+    before = os.stat(path)
+    with open(path, 'rb') as f:
+        data = f.read()
+    report = {'path': path, 'members': count_members(data), 'bytes_before': len(data),
+              'bytes_after': len(data), 'records_before': 0, 'records_after': 0, 'compacted': False}
+    if report['members'] < options['min_members']:
+        return report
+    lines = read_lines(data)
+    kept = compact_records(lines, options['dedupe'], options['dedupe_key'], options['sort_key'])
+    compacted = gzip.compress("".join(line + "\n" for line in kept).encode('utf-8'),
+                              compresslevel=options['level'], mtime=0)
+    report.update(records_before=len(lines), records_after=len(kept), bytes_after=len(compacted),
+                  read_seconds_before=timed_read(data), read_seconds_after=timed_read(compacted))
+    if options['dry_run']:
+        return report
+
+    tmp_path = f"{path}.compact.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(compacted)
+        f.flush()
+        os.fsync(f.fileno())
+    current = os.stat(path)
+    if (current.st_size, current.st_mtime_ns) != (before.st_size, before.st_mtime_ns):
+        # A collector appended meanwhile; its records are not in the compacted copy
+        os.remove(tmp_path)
+        logging.warning(f"{path} changed while it was compacted; skipping it")
+        return dict(report, bytes_after=len(data))
+    os.replace(tmp_path, path)
+    report['compacted'] = True
+    return report
+
+
+def is_quiet(path, today, min_age):
+    """True for files the collectors no longer append to: not in today's directory and not modified recently."""
+    try:
+        _, collected_date, _ = parse_news_path(path)
+    except ValueError:
+        return False
+    if collected_date >= today.isoformat():
+        return False
+    return time.time() - os.path.getmtime(path) >= min_age * 60
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default=NEWS_DIR, help="news/ directory to compact")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="compactor processes")
+    parser.add_argument("--min-members", type=int, default=2, help="only rewrite files with at least this many gzip members")
+    parser.add_argument("--min-age", type=float, default=MIN_AGE_MINUTES, help="skip files modified in the last N minutes")
+    parser.add_argument("--dedupe", action="store_true", help="drop identical records")
+    parser.add_argument("--dedupe-key", help="drop records whose value of this field was already seen (e.g. link)")
+    parser.add_argument("--sort", dest="sort_key", help="sort records by this field (e.g. publication_date)")
+    parser.add_argument("--level", type=int, default=COMPRESS_LEVEL, help="gzip compression level")
+    parser.add_argument("--dry-run", action="store_true", help="report the savings without rewriting anything")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    options = {'min_members': args.min_members, 'dedupe': args.dedupe, 'dedupe_key': args.dedupe_key,
+               'sort_key': args.sort_key, 'level': args.level, 'dry_run': args.dry_run}
+    today = datetime.date.today()
+    paths = [path for path in iter_metadata_files(args.root) if is_quiet(path, today, args.min_age)]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        reports = [report for report in pool.map(compact_file, [(path, options) for path in paths], chunksize=32)
+                   if 'read_seconds_before' in report]
+
+    totals = {key: sum(report[key] for report in reports)
+              for key in ('members', 'bytes_before', 'bytes_after', 'records_before', 'records_after',
+                          'read_seconds_before', 'read_seconds_after')}
+    rewritten = sum(1 for report in reports if report['compacted'])
+    logging.info(f"{'Would compact' if args.dry_run else 'Compacted'} {len(reports) if args.dry_run else rewritten} "
+                 f"of {len(paths)} quiet files in {time.perf_counter() - start:.1f}s")
+    if reports:
+        logging.info(f"  gzip members  {totals['members']} -> {len(reports)}")
+        logging.info(f"  bytes         {totals['bytes_before']} -> {totals['bytes_after']} "
+                     f"({1 - totals['bytes_after'] / max(totals['bytes_before'], 1):.0%} smaller)")
+        logging.info(f"  records       {totals['records_before']} -> {totals['records_after']}")
+        logging.info(f"  read time     {totals['read_seconds_before'] * 1000:.1f}ms -> "
+                     f"{totals['read_seconds_after'] * 1000:.1f}ms")
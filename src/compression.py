@@ -0,0 +1,205 @@
+import datetime
+import glob
+import gzip
+import logging
+import os
+import threading
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional: without it pages are stored with gzip
+    zstandard = None
+
+# COLLECTOR_CODEC=gzip|zstd picks the codec for new homepage snapshots and extracts; zstd is the default
+# when installed. WARC segments are always gzip (segment_store.py).
+CODEC_ENV = "COLLECTOR_CODEC"
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 9
+
+# Per-site zstd dictionaries of the .html.zst homepage snapshots: dictionaries/<website_hash>-<dict_id>.zdict,
+# trained by train-page-dictionaries.py outside the collectors. Article pages live in the gzip WARC segments
+# and are not compressed with them.
+DICTIONARY_DIR = "dictionaries"
+DICT_SIZE = 32 * 1024
+# A site gets a dictionary once this many of its snapshots are stored, trained on its latest ones
+DICT_MIN_SAMPLES = 16
+DICT_MAX_SAMPLES = 64
+# Templates change; dictionaries older than this are retrained from recent pages
+DICT_MAX_AGE = datetime.timedelta(days=30)
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class DictionaryStore:
+    """Trains, saves and caches one zstd dictionary per site."""
+
+    def __init__(self, directory=DICTIONARY_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.by_site = {}
+        self.by_id = {}
+        self.attempted = {}
+
+    def _load(self, filepath):
+        with open(filepath, 'rb') as f:
+            dictionary = zstandard.ZstdCompressionDict(f.read())
+        dictionary.precompute_compress(level=ZSTD_LEVEL)
+        self.by_id[dictionary.dict_id()] = dictionary
+        return dictionary
+
+    def get(self, site):
+        """Return (dictionary, trained time) of a site, or (None, None)."""
+        if site is None:
+            return None, None
+        with self.lock:
+            if site not in self.by_site:
+                filepaths = glob.glob(os.path.join(self.directory, f"{site}-*.zdict"))
+                if filepaths:
+                    filepath = max(filepaths, key=os.path.getmtime)
+                    trained = datetime.datetime.fromtimestamp(os.path.getmtime(filepath))
+                    self.by_site[site] = (self._load(filepath), trained)
+                else:
+                    self.by_site[site] = (None, None)
+            return self.by_site[site]
+
+    def get_by_id(self, dict_id):
+        with self.lock:
+            if dict_id not in self.by_id:
+                filepaths = glob.glob(os.path.join(self.directory, f"*-{dict_id}.zdict"))
+                if not filepaths:
+                    raise KeyError(f"zstd dictionary {dict_id} not found in {self.directory}")
+                self._load(filepaths[0])
+            return self.by_id[dict_id]
+
+    def needs_training(self, site, now=None):
+        """True if a site has no dictionary, or an old one, and was not tried recently."""
+        now = now or datetime.datetime.now()
+        attempted = self.attempted.get(site)
+        if attempted and now - attempted < datetime.timedelta(hours=1):
+            return False
+        _, trained = self.get(site)
+        return trained is None or now - trained > DICT_MAX_AGE
+
+    def train(self, site, samples):
+        """Train and save a site's dictionary from sample pages. Returns it, or None if training failed."""
+        self.attempted[site] = datetime.datetime.now()
+        try:
+            dictionary = zstandard.train_dictionary(DICT_SIZE, samples, level=ZSTD_LEVEL)
+        except zstandard.ZstdError as e:
+            logging.warning(f"Could not train a zstd dictionary for {site} from {len(samples)} pages: {e}")
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        filepath = os.path.join(self.directory, f"{site}-{dictionary.dict_id()}.zdict")
+        tmp_filepath = f"{filepath}.tmp"
+        with open(tmp_filepath, 'wb') as f:
+            f.write(dictionary.as_bytes())
+        os.replace(tmp_filepath, filepath)
+        with self.lock:
+            loaded = self._load(filepath)
+            self.by_site[site] = (loaded, datetime.datetime.now())
+        logging.info(f"Trained zstd dictionary {dictionary.dict_id()} for {site} from {len(samples)} pages")
+        return loaded
+
+
+class GzipCodec:
+    name = "gzip"
+    extension = ".gz"
+    uses_dictionaries = False
+
+    def compress(self, data, site=None):
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+    def compress_chunks(self, chunks, fileobj, site=None, size=None):
+        """Write chunks to fileobj as one gzip member. Returns the compressed length."""
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        written = 0
+        for chunk in chunks:
+            written += fileobj.write(compressor.compress(chunk))
+        return written + fileobj.write(compressor.flush())
+
+
+class ZstdCodec:
+    """zstd with per-site dictionaries; the dictionary id is recorded in every frame header."""
+    name = "zstd"
+    extension = ".zst"
+    uses_dictionaries = True
+
+    def __init__(self, dictionaries):
+        self.dictionaries = dictionaries
+
+    def _compressor(self, site):
+        dictionary, _ = self.dictionaries.get(site)
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary)
+
+    def compress(self, data, site=None):
+        return self._compressor(site).compress(data)
+
+    def compress_chunks(self, chunks, fileobj, site=None, size=None):
+        """Write chunks to fileobj as one zstd frame (with its size, if known). Returns the compressed length."""
+        compressor = self._compressor(site).compressobj(size=-1 if size is None else size)
+        written = 0
+        for chunk in chunks:
+            written += fileobj.write(compressor.compress(chunk))
+        return written + fileobj.write(compressor.flush())
+
+
+DICTIONARIES = DictionaryStore()
+
+
+def get_codec(name=None):
+    """Return the codec for new pages: name, $COLLECTOR_CODEC, or zstd when it is installed."""
+    name = name or os.environ.get(CODEC_ENV) or ("zstd" if zstandard else "gzip")
+    if name == "zstd":
+        if zstandard is None:
+            logging.warning("zstandard is not installed; storing pages with gzip")
+            return GzipCodec()
+        return ZstdCodec(DICTIONARIES)
+    if name != "gzip":
+        raise ValueError(f"Unknown codec: {name}")
+    return GzipCodec()
+
+
+def decompress(data, dictionaries=DICTIONARIES):
+    """Decompress a gzip member or zstd frame, looking up the frame's dictionary if it has one."""
+    if data[:2] == GZIP_MAGIC:
+        return gzip.decompress(data)
+    if data[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed pages")
+        dict_id = zstandard.get_frame_parameters(data).dict_id
+        dictionary = dictionaries.get_by_id(dict_id) if dict_id else None
+        # Streamed frames may not record their decompressed size, which decompress() requires
+        return zstandard.ZstdDecompressor(dict_data=dictionary).decompressobj().decompress(data)
+    raise ValueError("Unknown compression format")
+
+
+def write_page(filepath_base, data, codec, site=None):
+    """
+    Write a page (bytes, or an iterable of byte chunks streamed into the compressor) to
+    <filepath_base>.html<codec extension> atomically. Returns the path.
+    """
+    filepath = f"{filepath_base}.html{codec.extension}"
+    tmp_filepath = f"{filepath}.tmp"
+    with open(tmp_filepath, 'wb') as f:
+        if isinstance(data, bytes):
+            f.write(codec.compress(data, site))
+        else:
+            codec.compress_chunks(data, f, site)
+    os.replace(tmp_filepath, filepath)
+    return filepath
+
+
+def find_page(filepath_base):
+    """Return the stored page file for a base path (.html.zst or legacy .html.gz), or None."""
+    for extension in (ZstdCodec.extension, GzipCodec.extension):
+        if os.path.exists(f"{filepath_base}.html{extension}"):
+            return f"{filepath_base}.html{extension}"
+    return None
+
+
+def read_page(filepath):
+    """Read a stored page, whichever codec wrote it (including legacy gzip-text .html.gz files)."""
+    with open(filepath, 'rb') as f:
+        return decompress(f.read())
@@ -0,0 +1,178 @@
+"""
+Export article metadata from the news/ tree to a partitioned Parquet dataset for analytics.
+
+Each collected day of a state becomes one file, parquet/articles/state=<state>/year=<y>/month=<m>/<day>.parquet,
+written by a pool of worker processes. Runs are incremental: days that already have a file are
+skipped, and so is today, which is still being collected. Low-cardinality columns (state, outlet,
+media type, backend, ...) are dictionary-encoded.
+
+    python export-article-parquet.py
+    python export-article-parquet.py --root ../results/ia/Trial_AK/news --output ak-parquet
+    python export-article-parquet.py --since 2025-03-01 --rewrite
+
+Query it with pandas, pyarrow or DuckDB, e.g.:
+
+    pd.read_parquet("parquet/articles", filters=[("state", "==", "VA"), ("year", "==", 2025)])
+"""
+import argparse
+import datetime
+import logging
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only this exporter needs it
+    pa = pq = None
+
+from article_catalog import CATALOG_DB, NEWS_DIR, article_location, read_records
+
+PARQUET_DIR = os.path.join("parquet", "articles")
+
+if pa is not None:
+    _dictionary = pa.dictionary(pa.int32(), pa.string())
+    SCHEMA = pa.schema([
+        ("link", pa.string()),
+        ("website_hash", _dictionary),
+        ("media_type", _dictionary),
+        ("publication_date", pa.timestamp("us", tz="UTC")),
+        ("saved_time", pa.timestamp("us", tz="UTC")),
+        ("collected_date", pa.date32()),
+        ("backend", _dictionary),
+        ("location", pa.string()),
+        ("sha256", pa.string()),
+        ("cluster_id", pa.int64()),
+        ("near_duplicate_of", pa.string()),
+        ("encoding", _dictionary),
+    ])
+
+
+def parse_time(value):
+    """Parse an ISO timestamp; naive times (local collector time) are stored as if UTC."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.astimezone(datetime.timezone.utc)
+
+
+def iter_days(root):
+    """Yield (state, datetime.date, directory) of each news/<state>/<y>/<m>/<d> directory."""
+    for state in sorted(os.listdir(root)):
+        for year in _numeric_dirs(os.path.join(root, state)):
+            for month in _numeric_dirs(os.path.join(root, state, year)):
+                for day in _numeric_dirs(os.path.join(root, state, year, month)):
+                    try:
+                        date = datetime.date(int(year), int(month), int(day))
+                    except ValueError:
+                        continue
+                    yield state, date, os.path.join(root, state, year, month, day)
+
+
+def _numeric_dirs(path):
+    if not os.path.isdir(path):
+        return []
+    return sorted((name for name in os.listdir(path) if name.isdigit() and os.path.isdir(os.path.join(path, name))), key=int)
+
+
+def partition_path(output, state, date):
+    return os.path.join(output, f"state={state}", f"year={date.year}", f"month={date.month}", f"{date.isoformat()}.parquet")
+
+
+def export_day(task):
+    """Read every metadata file of one state and day and write them as one Parquet file. Runs in a worker."""
+    state, date, directory, filepath, media_types = task
+    columns = {name: [] for name in SCHEMA.names}
+    publication_media_types = {}
+    for website_hash in sorted(os.listdir(directory)):
+        outlet_directory = os.path.join(directory, website_hash)
+        if not os.path.isdir(outlet_directory):
+            continue
+        for filename in sorted(os.listdir(outlet_directory)):
+            if not filename.endswith(".jsonl.gz"):
+                continue
+            for record in read_records(os.path.join(outlet_directory, filename)):
+                if not isinstance(record, dict):
+                    continue
+                if not record.get('link'):
+                    # Publication records (ia/bt collectors) carry the outlet's media class
+                    metadata = record.get('publication_metadata') or record
+                    if metadata.get('media-class'):
+                        publication_media_types[website_hash] = metadata['media-class']
+                    continue
+                backend, location = article_location(record)
+                columns["link"].append(record['link'])
+                columns["website_hash"].append(website_hash)
+                columns["media_type"].append(None)
+                columns["publication_date"].append(parse_time(record.get('publication_date')))
+                columns["saved_time"].append(parse_time(record.get('saved_time') or record.get('archived_time')))
+                columns["collected_date"].append(date)
+                columns["backend"].append(backend)
+                columns["location"].append(location)
+                columns["sha256"].append(record.get('sha256'))
+                columns["cluster_id"].append(record.get('cluster_id'))
+                columns["near_duplicate_of"].append(record.get('near_duplicate_of'))
+                columns["encoding"].append(record.get('encoding'))
+    columns["media_type"] = [publication_media_types.get(website_hash) or media_types.get(website_hash)
+                             for website_hash in columns["website_hash"]]
+    table = pa.table(columns, schema=SCHEMA)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    tmp_filepath = f"{filepath}.tmp"
+    pq.write_table(table, tmp_filepath, compression="zstd", use_dictionary=True)
+    os.replace(tmp_filepath, filepath)
+    return state, date, table.num_rows
+
+
+def load_media_types(catalog_path):
+    """Map website_hash to media type from the article catalog's publications, if there is one."""
+    if not catalog_path or not os.path.exists(catalog_path):
+        return {}
+    db = sqlite3.connect(catalog_path)
+    try:
+        return dict(db.execute("SELECT website_hash, media_type FROM publications WHERE media_type IS NOT NULL"))
+    except sqlite3.Error:
+        return {}
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default=NEWS_DIR, help="news/ directory to export")
+    parser.add_argument("--output", default=PARQUET_DIR, help="Parquet dataset directory")
+    parser.add_argument("--catalog", default=CATALOG_DB, help="article catalog with the outlets' media types")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="exporter processes")
+    parser.add_argument("--since", type=datetime.date.fromisoformat, help="only export days from this date on")
+    parser.add_argument("--rewrite", action="store_true", help="re-export days that were already exported")
+    parser.add_argument("--include-today", action="store_true", help="also export today, which is still being collected")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if pa is None:
+        sys.exit("pyarrow is required for the Parquet export: pip install pyarrow")
+
+    start = time.perf_counter()
+    media_types = load_media_types(args.catalog)
+    today = datetime.date.today()
+    tasks = []
+    for state, date, directory in iter_days(args.root):
+        if args.since and date < args.since or date >= today and not args.include_today:
+            continue
+        filepath = partition_path(args.output, state, date)
+        if args.rewrite or not os.path.exists(filepath):
+            tasks.append((state, date, directory, filepath, media_types))
+
+    rows = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for state, date, count in pool.map(export_day, tasks):
+            rows += count
+    logging.info(f"Exported {rows} articles of {len(tasks)} new days to {args.output} "
+                 f"in {time.perf_counter() - start:.1f}s")
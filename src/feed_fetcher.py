@@ -0,0 +1,259 @@
+import collections
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import feedparser
+import requests
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+
+from collector_metrics import METRICS
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/102.0.0.0 Safari/537.36'
+}
+
+FEED_CONNECT_TIMEOUT = 5
+FEED_READ_TIMEOUT = 10
+# Wall-clock limit for downloading a whole feed, including slow-drip servers
+FEED_DEADLINE = 30
+MAX_FEED_BYTES = 10 * 1024 * 1024
+FEED_FETCH_WORKERS = 16
+FEED_PARSE_WORKERS = 2
+# Publications ahead of the one being processed whose feeds are already downloading
+FEED_PREFETCH_PUBLICATIONS = 16
+
+# Entry fields the collectors use; only these cross the process boundary
+ENTRY_FIELDS = ("id", "guid", "link", "title", "published_parsed", "updated_parsed")
+
+
+class FeedFetchError(Exception):
+    pass
+
+
+class FeedFetchStats:
+    """Thread-safe counters and latencies of feed fetches."""
+
+    def __init__(self, max_samples=10000):
+        self.lock = threading.Lock()
+        self.max_samples = max_samples
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.fetched = 0
+            self.failures = {}
+            self.bytes = 0
+            self.latencies = []
+
+    def record(self, latency, nbytes=0, error=None):
+        with self.lock:
+            if error:
+                self.failures[error] = self.failures.get(error, 0) + 1
+            else:
+                self.fetched += 1
+                self.bytes += nbytes
+            self.latencies.append(latency)
+            del self.latencies[:-self.max_samples]
+
+    def summary(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            failed = sum(self.failures.values())
+
+            def percentile(p):
+                return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else 0.0
+
+            return (f"feeds fetched={self.fetched} failed={failed} {self.failures} bytes={self.bytes} "
+                    f"latency p50={percentile(0.5):.3f}s p99={percentile(0.99):.3f}s")
+
+
+FEED_STATS = FeedFetchStats()
+
+_session = None
+_fetch_pool = None
+_parse_pool = None
+_pool_lock = threading.Lock()
+# {feed_url: future of _fetch_feed} submitted by prefetch_feeds() ahead of fetch_feeds()
+_prefetched = {}
+
+
+def create_session(pool_size=FEED_FETCH_WORKERS):
+    """Create a requests session whose connection pool is shared by all fetch workers."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(HEADERS)
+    return session
+
+
+def _get_pools():
+    global _session, _fetch_pool, _parse_pool
+    with _pool_lock:
+        if _session is None:
+            _session = create_session()
+            _fetch_pool = ThreadPoolExecutor(max_workers=FEED_FETCH_WORKERS)
+            # spawn: the collector runs metrics and logging threads, which fork does not copy safely
+            _parse_pool = ProcessPoolExecutor(max_workers=FEED_PARSE_WORKERS,
+                                              mp_context=multiprocessing.get_context('spawn'))
+    return _session, _fetch_pool, _parse_pool
+
+
+def shutdown():
+    """Release the shared session and worker pools."""
+    global _session, _fetch_pool, _parse_pool
+    with _pool_lock:
+        if _session is not None:
+            _fetch_pool.shutdown()
+            _parse_pool.shutdown()
+            _session.close()
+            _session = _fetch_pool = _parse_pool = None
+            _prefetched.clear()
+
+
+def _abort(response, expired):
+    """Shut down the connection of a download past its deadline, which ends the read blocked on it."""
+    expired.set()
+    try:
+        # urllib3 >= 2.3 can shut the socket down under a blocked read; before that, closing the
+        # response only stops the download at its next read timeout
+        if hasattr(response.raw, 'shutdown'):
+            response.raw.shutdown()
+        else:
+            response.close()
+    except (ValueError, RuntimeError, OSError):
+        pass
+
+
+def fetch_feed_bytes(feed_url, session=None, deadline=FEED_DEADLINE, max_bytes=MAX_FEED_BYTES):
+    """Download a feed with connect/read timeouts and an overall deadline. Returns (content, headers)."""
+    session = session or requests
+    start = time.monotonic()
+    with session.get(feed_url, timeout=(FEED_CONNECT_TIMEOUT, FEED_READ_TIMEOUT), stream=True) as response:
+        response.raise_for_status()
+        # A read blocks until its whole chunk arrives, so a slow-drip server is cut off by a watchdog
+        # rather than by checking the clock between chunks
+        expired = threading.Event()
+        watchdog = threading.Timer(max(0.0, deadline - (time.monotonic() - start)), _abort, (response, expired))
+        watchdog.daemon = True
+        watchdog.start()
+        chunks = []
+        total = 0
+        try:
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                total += len(chunk)
+                if total > max_bytes:
+                    raise FeedFetchError(f"feed larger than {max_bytes} bytes")
+                chunks.append(chunk)
+        except requests.RequestException:
+            if not expired.is_set():
+                raise
+        finally:
+            watchdog.cancel()
+        if expired.is_set():
+            raise FeedFetchError(f"feed download exceeded {deadline}s")
+        headers = {
+            'content-location': response.url,
+            'content-type': response.headers.get('content-type', ''),
+        }
+    return b''.join(chunks), headers
+
+
+def parse_feed_entries(content, headers):
+    """Parse feed bytes with feedparser and return its entries as plain dicts."""
+    feed = feedparser.parse(content, response_headers=headers)
+    return [{field: entry[field] for field in ENTRY_FIELDS if field in entry} for entry in feed.entries]
+
+
+def _record_fetch(feed_url, latency, nbytes=0, error=None):
+    FEED_STATS.record(latency, nbytes, error)
+    host = urlsplit(feed_url).netloc
+    METRICS.observe('feed_fetch_seconds', latency)
+    if error:
+        METRICS.inc('feed_fetch_failures_total', host=host, reason=error)
+    else:
+        METRICS.inc('feed_fetch_bytes_total', nbytes, host=host)
+
+
+def _fetch_feed(session, feed_url):
+    start = time.monotonic()
+    try:
+        content, headers = fetch_feed_bytes(feed_url, session)
+    except requests.Timeout as e:
+        _record_fetch(feed_url, time.monotonic() - start, error='timeout')
+        logging.error(f"Timed out fetching feed {feed_url}: {e}")
+        return None
+    except (requests.RequestException, FeedFetchError) as e:
+        _record_fetch(feed_url, time.monotonic() - start, error=type(e).__name__)
+        logging.error(f"Error fetching feed {feed_url}: {e}")
+        return None
+    _record_fetch(feed_url, time.monotonic() - start, len(content))
+    return content, headers
+
+
+def _submit_fetches(feed_urls):
+    """Return {feed_url: future}, taking downloads prefetch_feeds() already started."""
+    session, fetch_pool, _ = _get_pools()
+    fetches = {}
+    with _pool_lock:
+        for feed_url in dict.fromkeys(feed_urls):
+            fetches[feed_url] = _prefetched.pop(feed_url, None) or fetch_pool.submit(_fetch_feed, session, feed_url)
+    return fetches
+
+
+def prefetch_feeds(publications, lookahead=FEED_PREFETCH_PUBLICATIONS):
+    """
+    Yield seed publications one by one while the feeds of the next lookahead publications download
+    in the shared fetch pool, so a publication's fetch_feeds() mostly finds its feeds fetched.
+    Downloads a publication did not use are dropped once the caller is done with it.
+    """
+    window = collections.deque()
+
+    def release(publication):
+        yield publication
+        with _pool_lock:
+            for feed_url in publication.rss:
+                future = _prefetched.pop(feed_url, None)
+                if future is not None:
+                    future.cancel()
+
+    for publication in publications:
+        fetches = _submit_fetches(publication.rss)
+        with _pool_lock:
+            _prefetched.update(fetches)
+        window.append(publication)
+        if len(window) > lookahead:
+            yield from release(window.popleft())
+    while window:
+        yield from release(window.popleft())
+
+
+def fetch_feeds(feed_urls):
+    """
+    Fetch feeds concurrently in the shared pool (or take the downloads prefetch_feeds() started)
+    and parse them in a worker process pool.
+    Returns {feed_url: [entry, ...]}; feeds that failed map to an empty list.
+    """
+    _, _, parse_pool = _get_pools()
+    fetches = _submit_fetches(feed_urls)
+
+    parses = {}
+    for feed_url, future in fetches.items():
+        fetched = future.result()
+        if fetched:
+            parses[feed_url] = parse_pool.submit(parse_feed_entries, *fetched)
+
+    feeds = {}
+    for feed_url in fetches:
+        entries = []
+        if feed_url in parses:
+            try:
+                entries = [feedparser.FeedParserDict(entry) for entry in parses[feed_url].result()]
+            except Exception as e:
+                logging.error(f"Error parsing feed {feed_url}: {e}")
+        feeds[feed_url] = entries
+    return feeds
@@ -0,0 +1,78 @@
+import datetime
+import gzip
+import json
+import logging
+import os
+
+from collector_metrics import METRICS
+
+# One append-only file per outlet: homepage_churn/<state>/<website_hash>.jsonl.gz
+HOMEPAGE_CHURN_DIR = "homepage_churn"
+# Links of a homepage kept in its watermark; links beyond this count as new every time
+MAX_HOMEPAGE_LINKS = 2000
+
+
+def churn_path(state, website_hash):
+    """Return the path of the homepage churn file of a website."""
+    return os.path.join(HOMEPAGE_CHURN_DIR, state, f"{website_hash}.jsonl.gz")
+
+
+def diff_homepage_links(state, website_hash, website_url, watermarks, links, known=()):
+    """
+    Compare a homepage's links (in document order) with the link set stored in its watermark at
+    the last visit, and append the additions and removals to the website's churn file. Returns the
+    links that need the article filter: those added since the last visit and those left
+    unevaluated then, minus known ones (e.g. today's cache). The 'homepage' entry of watermarks is
+    updated in place with the new link set and the returned links as pending; the caller marks
+    each one once it is rejected or its article is saved, and persists the watermarks.
+    """
+    homepage = watermarks.get("homepage", {})
+    previous = homepage.get("links")
+    if previous is None:
+        added, removed = list(links), []
+        new_links = added
+    else:
+        previous_set, current_set = set(previous), set(links)
+        pending = set(homepage.get("pending", []))
+        added = [link for link in links if link not in previous_set]
+        removed = [link for link in previous if link not in current_set]
+        new_links = [link for link in links if link not in previous_set or link in pending]
+    new_links = [link for link in new_links if link not in known]
+    watermarks["homepage"] = {
+        "links": list(links)[:MAX_HOMEPAGE_LINKS],
+        "pending": new_links,
+        "updated_time": datetime.datetime.now().isoformat(),
+    }
+    METRICS.inc('homepage_links_total', len(links) - len(added), change='unchanged')
+    METRICS.inc('homepage_links_total', len(added), change='added')
+    METRICS.inc('homepage_links_total', len(removed), change='removed')
+    _record_churn(state, website_hash, website_url, links, added, removed, previous is None)
+    logging.info(f"Homepage of {website_url}: {len(added)} links added and {len(removed)} removed since the last visit, "
+                 f"{len(new_links)} to check")
+    return new_links
+
+
+def mark_homepage_link(watermarks, link):
+    """Record a new homepage link as decided; it is not offered again while it stays on the homepage."""
+    pending = watermarks.get("homepage", {}).get("pending", [])
+    if link in pending:
+        pending.remove(link)
+
+
+def _record_churn(state, website_hash, website_url, links, added, removed, first_visit):
+    """Append the additions and removals of one homepage visit to the website's churn file."""
+    filepath = churn_path(state, website_hash)
+    record = {
+        'website': website_url,
+        'time': datetime.datetime.now().isoformat(),
+        'links': len(links),
+        'first_visit': first_visit,
+        'added': added,
+        'removed': removed,
+    }
+    try:
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with gzip.open(filepath, 'ab') as f:
+            f.write((json.dumps(record) + '\n').encode('utf-8'))
+    except Exception as e:
+        logging.error(f"Error saving homepage churn {filepath}: {e}")
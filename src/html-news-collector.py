@@ -3,30 +3,41 @@ import json
 import os
 import hashlib
 import gzip
-import feedparser
 import datetime
 import requests
 import subprocess
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse, unquote, urlsplit
-from NwalaTextUtils.textutils import derefURI, cleanHtml
+from NwalaTextUtils.textutils import derefURI
 import time
+from concurrent.futures import Future
+from seed_loader import iter_publications
+from feed_fetcher import fetch_feeds, prefetch_feeds, FEED_STATS
+from news_sitemap import get_new_sitemap_articles, mark_sitemap_article
+from watermark_store import load_watermarks, save_watermarks, new_feed_entries, mark_feed_entry
+from collector_metrics import METRICS, start_metrics_server, start_summary_dump
+from collector_logging import setup_logging, log_event
+from http_cassette import install_cassette_from_env
+from blob_store import BLOB_STORE
+from near_duplicates import NEAR_DUPLICATES
+from compression import find_page, get_codec, write_page
+from page_encoding import decode_page, page_encoding
+from page_fetcher import fetch_page
+from article_catalog import CATALOG
+from article_search import SEARCH
+from article_extracts import EXTRACTS, EXTRACTION_POOL
+from article_scorer import is_article_text
+from html_links import LINK_PARSER
+from url_classifier import URL_CLASSIFIER
+from homepage_diff import diff_homepage_links, mark_homepage_link
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,  # Set the logging level
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("news_scraper.log"),  # Log to a file
-        logging.StreamHandler()  # Also log to the console
-    ]
-)
+# Politeness delay between article fetches from the same publication
+ARTICLE_DELAY = 1
+# Codec of homepage snapshots; article pages use the segment store's codec
+PAGE_CODEC = get_codec()
 
-logging.info("Starting the script...")
-
-# Load the JSON file
-with open("preprocessed_updated_news_media_rss_and_status_code.json", "r") as f:
-    data = json.load(f)
+# Local Prometheus-style endpoint and periodic per-stage summary
+METRICS_PORT = 9108
+METRICS_SUMMARY_INTERVAL = 300
 
 # Define headers for HTTP requests
 HEADERS = {
@@ -39,7 +50,7 @@ def is_valid_url(url):
         result = urlsplit(url)
         return all([result.scheme, result.netloc])
     except ValueError:
-        logging.error(f"Invalid URL: {url}")
+        log_event('invalid_url', level=logging.WARNING, url=url)
         return False
 
 def extract_domain(url):
@@ -51,25 +62,26 @@ def extract_domain(url):
 def get_expanded_url(short_url):
     """Resolve short URLs to their final destination."""
     try:
-        response = requests.head(short_url, allow_redirects=True, timeout=5)
+        with METRICS.timer('head'):
+            response = requests.head(short_url, allow_redirects=True, timeout=5)
         return response.url
     except requests.RequestException as e:
-        logging.error(f"Error resolving URL: {short_url}: {e}")
+        log_event('head_failed', level=logging.WARNING, url=short_url, error=str(e))
         return short_url
 
 def extract_article_urls_from_html(html_content, base_url):
-    """Extract all article URLs from the given HTML content."""
-    soup = BeautifulSoup(html_content, 'html.parser')
+    """Extract all article URLs from the given HTML content, deduplicated in document order."""
+    with METRICS.timer('parse_html'):
+        # Parsed in a worker process, so the homepage parse does not hold the GIL other threads need
+        hrefs = LINK_PARSER.parse(html_content).anchors
     resolved_base = get_expanded_url(base_url)
-    return {
-        urljoin(resolved_base, link['href'])
-        for link in soup.find_all("a", href=True)
-    }
+    # Document order (rather than set order) keeps runs repeatable, e.g. when replaying a cassette
+    return list(dict.fromkeys(urljoin(resolved_base, href) for href in hrefs))
 
 def get_publication_date(entry):
-    """Extract publication date from RSS entry."""
+    """Extract publication date from RSS entry, or None if it has none."""
     published_time = entry.get("published_parsed")
-    return datetime.datetime(*published_time[:6]) if published_time else datetime.datetime.now()
+    return datetime.datetime(*published_time[:6]) if published_time else None
 
 def has_special_characters(path_segment):
     """Check for special characters in path segments."""
@@ -77,15 +89,17 @@ def has_special_characters(path_segment):
 
 def is_news_article(link):
     is_news_article = False
-    link = get_expanded_url(link)
+    # The checks run on the expanded URL; events name the original link, as the other verdicts do
+    expanded_url = get_expanded_url(link)
 
-    if not is_valid_url(link):
-       print(f"Invalid URL: {link}")
+    if not is_valid_url(expanded_url):
+       log_event('invalid_url', url=link, expanded_url=expanded_url, verdict_source='network')
        return is_news_article
     
-    parsed_url = urlparse(link)
+    parsed_url = urlparse(expanded_url)
     path_segments = [segment for segment in parsed_url.path.split('/') if segment]
     if not path_segments:
+        log_event('not_article_path', url=link, expanded_url=expanded_url, verdict_source='network')
         return is_news_article
     else:
         last_segment = path_segments[-1]
@@ -96,39 +110,48 @@ def is_news_article(link):
             elif depth <= 2 and any(has_special_characters(segment) or segment.isdigit() for segment in path_segments[:2]):
                 is_news_article = True
             else:
+                log_event('not_article_path', url=link, expanded_url=expanded_url, verdict_source='network')
                 return is_news_article
         else:
+            log_event('not_article_path', url=link, expanded_url=expanded_url, verdict_source='network')
             return is_news_article
     try:
-        html = derefURI(link)
-        plaintext = cleanHtml(html)
-        count = len(plaintext)
-        if count > 20:
-            is_news_article = True
-        else:
-            print (f"Word count is less for {link}\n {plaintext}\n")
-            is_news_article = False
+        with METRICS.timer('deref'):
+            html = derefURI(expanded_url)
+        if not html:
+            # derefURI returns '' when the fetch fails: no verdict (None), so callers can retry the link
+            log_event('article_check_failed', level=logging.WARNING, url=link, expanded_url=expanded_url, error='no response')
+            return None
+        # The streaming scorer decides most pages; it runs cleanHtml only when unsure
+        with METRICS.timer('article_score'):
+            is_news_article, reason = is_article_text(html)
+        if not is_news_article:
+            log_event('short_article', url=link, expanded_url=expanded_url, reason=reason, verdict_source='network')
     except Exception as e:
-        print(f"Error processing link: {link} ecause of {e}\n")
-        is_news_article = False
+        log_event('article_check_failed', level=logging.WARNING, url=link, expanded_url=expanded_url, error=str(e))
+        is_news_article = None
 
     return is_news_article
 
-def save_article_html(directory, article_url, html_content):
+def save_article_html(article_url, page, state=None, website_hash=None, encoding=None):
     """
-    Save the HTML content of an article to a file.
+    Save the fetched article as WARC request/response records in the state's segment file of the day.
+    The raw bytes of the streamed page are compressed into the segment as sent; encoding is recorded
+    in the segment index.
+    Identical pages (e.g. syndicated stories) are stored once; repeats only add a revisit record.
+    Returns (sha256, (segment, offset, length)).
     """
     try:
-        article_hash = hashlib.md5(article_url.encode()).hexdigest()
-        filepath = os.path.join(directory, f"{article_hash}.html.gz")
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        with gzip.open(filepath, 'wt', encoding='utf-8') as html_file:
-            html_file.write(html_content)
-        logging.info(f"Article HTML saved to {filepath}")
-        return filepath
+        with METRICS.timer('gzip_write'):
+            sha256, location, is_new = BLOB_STORE.put(page, article_url, state, website_hash,
+                                                      response=page.response, encoding=encoding)
+        if is_new:
+            METRICS.inc('collector_bytes_written_total', location[2])
+        log_event('article_saved', url=article_url, path=f"{location[0]}:{location[1]}", duplicate=not is_new)
+        return sha256, location
     except Exception as e:
         logging.error(f"Error saving article HTML for {article_url}: {e}")
-        return None
+        return None, None
     
 def get_archived_url(link):
     """Archive a URL using Internet Archive and return the archived URL."""
@@ -172,23 +195,25 @@ def save_to_file(filepath, data, mode='at'):
                     raise ValueError("Data must be a list of JSON objects or a single JSON object.")
         else:
             raise ValueError("Unsupported mode for saving files.")
-        logging.info(f"Data saved to {filepath}")
+        log_event('metadata_saved', path=filepath)
     except Exception as e:
         logging.error(f"Error saving data to {filepath}: {e}")
 
 def read_cached_urls(filepath):
-    """Read cached URLs from a gzip file."""
+    """Read cached URLs from a gzip file, written by save_to_file as one JSON string per line."""
     if os.path.exists(filepath):
         try:
             with gzip.open(filepath, "rt", encoding="utf-8") as f:
-                return {line.strip() for line in f}
+                lines = [line.strip() for line in f]
+            return {json.loads(line) if line.startswith('"') else line for line in lines if line}
         except Exception as e:
             logging.error(f"Error reading cache file {filepath}: {e}")
     return set()
 
 def save_publication(state, year, month, date, website_url, publication):
     """
-    Save the HTML content of a publication's website to a gzipped file.
+    Save the HTML content of a publication's website to a compressed file
+    (<hash>.html.zst with the site's zstd dictionary, or <hash>.html.gz).
     """
     try:
         # Generate a unique hash for the website URL
@@ -196,24 +221,25 @@ def save_publication(state, year, month, date, website_url, publication):
         directory_path = os.path.join("news", state, str(year), str(month), str(date), website_hash)
         os.makedirs(directory_path, exist_ok=True)
 
-        # Define the filepath for the gzipped HTML content
-        website_file_path = os.path.join(directory_path, f"{website_hash}.html.gz")
+        # Base path of the compressed HTML content; the extension depends on the codec
+        website_file_base = os.path.join(directory_path, website_hash)
 
         # Check if the file already exists
-        if not os.path.exists(website_file_path):
+        existing_file_path = find_page(website_file_base)
+        if not existing_file_path:
             # Fetch the website's HTML content
-            response = requests.get(website_url, headers=HEADERS, timeout=10)
-            response.raise_for_status()
+            with METRICS.timer('fetch_homepage'):
+                page = fetch_page(website_url, headers=HEADERS)
 
-            # Save the HTML content to a gzipped JSON file
-            with gzip.open(website_file_path, 'wt', encoding='utf-8') as html_file:
-                html_file.write(response.text)
-
-            # Update the publication with the file path
-            publication['archived_link'] = website_file_path
-            logging.info(f"Website content saved to {website_file_path}")
+            # Stream the raw bytes as sent into the compressor; the encoding is only worked out for the log
+            with page, METRICS.timer('gzip_write'):
+                website_file_path = write_page(website_file_base, page.iter_chunks(), PAGE_CODEC, website_hash)
+            encoding, encoding_source = page_encoding(page.prefix, page.headers)
+            logging.info(f"Website content saved to {website_file_path} ({encoding} from {encoding_source})")
+            CATALOG.add_publication(state, website_hash, website_url, publication.media_type, publication.get('name'),
+                                    datetime.datetime.now().isoformat(), 'file', website_file_path)
         else:
-            logging.info(f"Website content already exists at {website_file_path}")
+            logging.info(f"Website content already exists at {existing_file_path}")
 
     except requests.RequestException as e:
         logging.error(f"Error fetching website {website_url}: {e}")
@@ -221,6 +247,84 @@ def save_publication(state, year, month, date, website_url, publication):
         logging.error(f"Error saving publication for {website_url}: {e}")
 
         
+def find_near_duplicate(state, website_hash, article_url, plaintext):
+    """Fingerprint the article text and return its near-duplicate cluster (cluster_id, near_duplicate_of, similarity)."""
+    if not plaintext:
+        return None
+    try:
+        near_duplicate = NEAR_DUPLICATES.add(article_url, plaintext, state, website_hash)
+        if near_duplicate and near_duplicate['near_duplicate_of']:
+            log_event('near_duplicate', url=article_url, of=near_duplicate['near_duplicate_of'],
+                      similarity=near_duplicate['similarity'])
+        return near_duplicate
+    except Exception as e:
+        logging.error(f"Error fingerprinting article {article_url}: {e}")
+        return None
+
+def fetch_and_save_article(state, website_hash, article_url, publication_date, source, verdict_source, extractions):
+    """
+    Fetch an article, save its HTML and return its metadata record. verdict_source ('network',
+    'classifier' or 'sitemap') records what judged the link an article. Its text and metadata are
+    extracted in the background; (record, future) is appended to extractions for finish_article.
+    Without a publication_date (from the feed or sitemap), the collection time stands in until the
+    page's own date is extracted.
+    """
+    try:
+        with METRICS.timer('fetch_article'):
+            page = fetch_page(article_url, headers=HEADERS)
+        with page:
+            encoding, encoding_source = page_encoding(page.prefix, page.headers)
+            sha256, location = save_article_html(article_url, page, state, website_hash, encoding)
+            html = decode_page(page.read(), encoding) if location else None
+        if location:
+            METRICS.inc('collector_articles_saved_total')
+            article_json = {
+                'link': article_url,
+                'publication_date': (publication_date or datetime.datetime.now()).isoformat(),
+                'publication_date_source': source if publication_date else 'collected',
+                'saved_time': datetime.datetime.now().isoformat(),
+                'html_segment': location[0],
+                'html_offset': location[1],
+                'html_length': location[2],
+                'sha256': sha256,
+                'encoding': encoding,
+                'encoding_source': encoding_source,
+                'verdict_source': verdict_source
+            }
+            # A page stored before (e.g. a syndicated story) was already extracted
+            extract = EXTRACTS.get(sha256)
+            if extract is None:
+                extraction = EXTRACTION_POOL.submit(html, article_url)
+            else:
+                extraction = Future()
+                extraction.set_result(extract)
+            extractions.append((article_json, extraction))
+            return article_json
+    except requests.RequestException as e:
+        logging.error(f"Error fetching article {article_url}: {e}")
+    return None
+
+def finish_article(state, website_hash, article_json, extraction):
+    """
+    Complete an article record with its extraction: store it in the extract sidecar, replace a
+    stand-in publication date with the page's own, and fingerprint and index the text.
+    """
+    try:
+        with METRICS.timer('extract_wait'):
+            extract = extraction.result()
+        EXTRACTS.put(article_json['sha256'], article_json['link'], extract)
+    except Exception as e:
+        logging.error(f"Error extracting article {article_json['link']}: {e}")
+        return
+    if article_json['publication_date_source'] == 'collected' and extract['publication_date']:
+        article_json['publication_date'] = extract['publication_date']
+        article_json['publication_date_source'] = extract['date_source']
+    article_json.update(find_near_duplicate(state, website_hash, article_json['link'], extract['text']) or {})
+    if extract['text']:
+        SEARCH.add(article_json['link'], extract['text'], extract['title'], state, website_hash,
+                   article_json['publication_date'], article_json['sha256'])
+
+        
 # Main Processing
 def process_publication(state, publication, year, month, day, timestamp):
     """Process a single publication and save its articles."""
@@ -231,83 +335,154 @@ def process_publication(state, publication, year, month, day, timestamp):
     directory = os.path.join("news", state, str(year), str(month), str(day), website_hash)
     cache_filepath = os.path.join(directory, f"{website_hash}-cache.txt.gz")
     cached_urls = read_cached_urls(cache_filepath)
+    watermarks = load_watermarks(state, website_hash)
 
     article_json_objs = []
+    # (record, extraction future) of every saved article; extraction runs while later articles are fetched
+    extractions = []
     nlinks = 0
 
-    # Process RSS Feeds
+    # Process RSS Feeds (fetched concurrently with timeouts, mostly while earlier publications were processed)
+    with METRICS.timer('feed_fetch'):
+        feeds = fetch_feeds(rss_feeds)
     for rss_feed_url in rss_feeds:
         logging.info(f"Processing RSS feed: {rss_feed_url}")
-        feed = feedparser.parse(rss_feed_url)
-        for entry in feed.entries:
+        # Only entries newer than the feed's watermark need the (network-bound) article check
+        for entry in new_feed_entries(watermarks, rss_feed_url, feeds[rss_feed_url]):
             article_url = entry.link
-            if article_url not in cached_urls and is_news_article(article_url):
-                logging.info(f"Found article: {article_url}")
-                try:
-                    response = requests.get(article_url, headers=HEADERS, timeout=10)
-                    response.raise_for_status()
-                    html_filepath = save_article_html(os.path.join(directory, f"{website_hash}-{timestamp}"), article_url, response.text)
-                    if html_filepath:
-                        article_json_objs.append({
-                            'link': article_url,
-                            'publication_date': get_publication_date(entry).isoformat(),
-                            'saved_time': datetime.datetime.now().isoformat(),
-                            'html_file_path': html_filepath
-                        })
-                        cached_urls.add(article_url)
-                        nlinks += 1
-                        if nlinks >= 5:
-                            break
-                except requests.RequestException as e:
-                    logging.error(f"Error fetching article {article_url}: {e}")
-                time.sleep(1)
+            if article_url in cached_urls:
+                mark_feed_entry(watermarks, rss_feed_url, entry)
+                continue
+            # An entry is marked once it is decided; after a failed check (None) or fetch it is retried next pass
+            is_article = is_news_article(article_url)
+            if is_article is False:
+                mark_feed_entry(watermarks, rss_feed_url, entry)
+            if is_article:
+                log_event('article_found', url=article_url, source='rss', verdict_source='network')
+                article_json = fetch_and_save_article(state, website_hash, article_url, get_publication_date(entry),
+                                                      'feed', 'network', extractions)
+                if article_json:
+                    mark_feed_entry(watermarks, rss_feed_url, entry)
+                    article_json_objs.append(article_json)
+                    cached_urls.add(article_url)
+                    nlinks += 1
+                    if nlinks >= 5:
+                        break
+                with METRICS.timer('sleep'):
+                    time.sleep(ARTICLE_DELAY)
         if nlinks >= 5:
             break
 
-    # Scrape Website if RSS Links Are Insufficient
+    # Use the news sitemap if RSS Links Are Insufficient
+    sitemap_articles = None
+    sitemap_nlinks = 0
     if nlinks < 5:
+        try:
+            with METRICS.timer('news_sitemap'):
+                sitemap_articles = get_new_sitemap_articles(website_url, watermarks)
+        except Exception as e:
+            logging.error(f"Error reading news sitemap of {website_url}: {e}")
+        # Sitemap entries are articles by definition, so is_news_article is not needed.
+        # Entries come oldest first; only saved ones are marked, the rest are offered again next pass
+        for article_url, publication_date in sitemap_articles or []:
+            if article_url in cached_urls:
+                mark_sitemap_article(watermarks, article_url)
+                continue
+            log_event('article_found', url=article_url, source='sitemap', verdict_source='sitemap')
+            article_json = fetch_and_save_article(state, website_hash, article_url, publication_date,
+                                                  'sitemap', 'sitemap', extractions)
+            if article_json:
+                mark_sitemap_article(watermarks, article_url)
+                article_json_objs.append(article_json)
+                cached_urls.add(article_url)
+                nlinks += 1
+                sitemap_nlinks += 1
+                if nlinks >= 5:
+                    break
+            with METRICS.timer('sleep'):
+                time.sleep(ARTICLE_DELAY)
+
+    # Scrape Website if neither the RSS feeds nor the news sitemap gave enough articles
+    if nlinks < 5 and not sitemap_nlinks:
         try:
             logging.info(f"Scraping website: {website_url}")
-            response = requests.get(website_url, headers=HEADERS, timeout=10)
-            response.raise_for_status()
-            for article_url in extract_article_urls_from_html(response.text, website_url):
-                if article_url not in cached_urls and is_news_article(article_url):
-                    logging.info(f"Found article: {article_url}")
-                    try:
-                        article_response = requests.get(article_url, headers=HEADERS, timeout=10)
-                        article_response.raise_for_status()
-                        html_filepath = save_article_html(os.path.join(directory, f"{website_hash}-{timestamp}"), article_url, article_response.text)
-                        if html_filepath:
-                            article_json_objs.append({
-                                'link': article_url,
-                                'publication_date': datetime.datetime.now().isoformat(),
-                                'saved_time': datetime.datetime.now().isoformat(),
-                                'html_file_path': html_filepath
-                            })
-                            cached_urls.add(article_url)
-                            nlinks += 1
-                            if nlinks >= 5:
-                                break
-                    except requests.RequestException as e:
-                        logging.error(f"Error fetching article {article_url}: {e}")
-                    time.sleep(1)
+            with METRICS.timer('fetch_homepage'):
+                page = fetch_page(website_url, headers=HEADERS)
+            with page:
+                homepage_html = decode_page(page.read(), page_encoding(page.prefix, page.headers)[0])
+            # Only links that appeared since the last visit (or were not reached then) go to the article filter
+            article_urls = diff_homepage_links(state, website_hash, website_url, watermarks,
+                                               extract_article_urls_from_html(homepage_html, website_url), cached_urls)
+            # The URL model decides the links it is confident about; only the rest need the network check
+            for article_url, verdict in zip(article_urls, URL_CLASSIFIER.classify(article_urls)):
+                verdict_source = 'classifier'
+                if verdict is None:
+                    verdict, verdict_source = is_news_article(article_url), 'network'
+                elif verdict is False:
+                    log_event('article_rejected', url=article_url, source='homepage', verdict_source=verdict_source)
+                # A link stays pending for the next visit until it is rejected or its article is saved
+                if verdict is False:
+                    mark_homepage_link(watermarks, article_url)
+                if verdict:
+                    log_event('article_found', url=article_url, source='homepage', verdict_source=verdict_source)
+                    article_json = fetch_and_save_article(state, website_hash, article_url, None,
+                                                          'homepage', verdict_source, extractions)
+                    if article_json:
+                        mark_homepage_link(watermarks, article_url)
+                        article_json_objs.append(article_json)
+                        cached_urls.add(article_url)
+                        nlinks += 1
+                        if nlinks >= 5:
+                            break
+                    with METRICS.timer('sleep'):
+                        time.sleep(ARTICLE_DELAY)
         except requests.RequestException as e:
             logging.error(f"Error scraping {website_url}: {e}")
 
+    for article_json, extraction in extractions:
+        finish_article(state, website_hash, article_json, extraction)
+
     # Save Results
-    save_to_file(os.path.join(directory, f"{website_hash}.jsonl.gz"), article_json_objs, 'at')
-    save_to_file(cache_filepath, list(cached_urls), 'wt')
+    articles_filepath = os.path.join(directory, f"{website_hash}.jsonl.gz")
+    with METRICS.timer('metadata_write'):
+        save_to_file(articles_filepath, article_json_objs, 'at')
+        save_to_file(cache_filepath, list(cached_urls), 'wt')
+        save_watermarks(state, website_hash, watermarks)
+        CATALOG.add_articles(article_json_objs, state, website_hash, f"{year:04d}-{month:02d}-{day:02d}",
+                             articles_filepath, publication.media_type)
 
 # Run the Script
-while True:
-    for state, publications in data.items():
-        logging.info(f"Processing state: {state}")
-        for news_media in ['newspaper', 'tv', 'radio', 'broadcast']:
-            for publication in publications.get(news_media, []):
-                response_status = publication.get('website_status')
-                if response_status and (200 <= response_status < 300):
-                    timestamp = datetime.datetime.now()
-                    website_url = publication.get("website")
-                    process_publication(state, publication, timestamp.year, timestamp.month, timestamp.day, timestamp)
-                    save_publication(state, timestamp.year, timestamp.month, timestamp.day, website_url, publication)
-    time.sleep(1)  # Prevent overwhelming the server
+if __name__ == "__main__":
+    # Queue-backed logging: JSON lines to a rotating news_scraper.log, plain text to the console
+    setup_logging("news_scraper.log")
+    logging.info("Starting the script...")
+    start_metrics_server(METRICS_PORT)
+    start_summary_dump(METRICS_SUMMARY_INTERVAL)
+    # COLLECTOR_CASSETTE=record|replay captures or replays every HTTP exchange for profiling
+    install_cassette_from_env()
+
+    while True:
+        # Stream compact records from the seed file instead of loading it whole
+        state = None
+        publications = (publication for publication in
+                        iter_publications("preprocessed_updated_news_media_rss_and_status_code.json")
+                        if publication.website_status and 200 <= publication.website_status < 300)
+        # The feeds of the next publications download in the background while this one is processed
+        for publication in prefetch_feeds(publications):
+            if publication.state != state:
+                state = publication.state
+                logging.info(f"Processing state: {state}")
+            timestamp = datetime.datetime.now()
+            website_url = publication.website
+            start = time.perf_counter()
+            # Every stage timed while processing this publication is labelled with its state and host
+            with METRICS.labels(state=state, host=extract_domain(website_url)):
+                process_publication(state, publication, timestamp.year, timestamp.month, timestamp.day, timestamp)
+                save_publication(state, timestamp.year, timestamp.month, timestamp.day, website_url, publication)
+                METRICS.observe('collector_publication_seconds', time.perf_counter() - start)
+        logging.info(FEED_STATS.summary())
+        logging.info(BLOB_STORE.summary())
+        logging.info(NEAR_DUPLICATES.summary())
+        logging.info(SEARCH.summary())
+        logging.info(EXTRACTS.summary())
+        time.sleep(1)  # Prevent overwhelming the server
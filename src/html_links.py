@@ -0,0 +1,178 @@
+import collections
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # optional: the fastest link parser
+    LexborHTMLParser = None
+try:
+    import lxml.html
+except ImportError:  # optional: a faster link parser than html.parser
+    lxml = None
+
+from collector_metrics import METRICS
+from page_encoding import decode_page, page_encoding
+
+# COLLECTOR_HTML_PARSER=html.parser|lxml|selectolax picks the link parser; html.parser is the default
+PARSER_ENV = "COLLECTOR_HTML_PARSER"
+# Parsing processes; 0 parses in the calling thread
+PARSE_WORKERS = 2
+# Pages submitted but not yet parsed; further submitters wait, so fetchers slow down to the parsers' pace
+MAX_PENDING_PAGES = 8
+# Seconds to wait for a parse before giving up on the worker
+PARSE_TIMEOUT = 60
+
+# The <a href> values of a page in document order, and (type, href) of its <link> elements
+PageLinks = collections.namedtuple('PageLinks', ['anchors', 'feed_links'])
+
+
+def _links_html_parser(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    return PageLinks([link['href'] for link in soup.find_all("a", href=True)],
+                     [(link.get('type'), link.get('href')) for link in soup.find_all("link")])
+
+
+def _links_lxml(html):
+    try:
+        document = lxml.html.document_fromstring(html)
+    except lxml.etree.ParserError:  # an empty document
+        return PageLinks([], [])
+    return PageLinks([link.get('href') for link in document.iter('a') if link.get('href') is not None],
+                     [(link.get('type'), link.get('href')) for link in document.iter('link')])
+
+
+def _links_selectolax(html):
+    tree = LexborHTMLParser(html)
+    # A bare <a href> has the value None here and '' in the other parsers
+    return PageLinks([node.attributes.get('href') or '' for node in tree.css('a[href]')],
+                     [(node.attributes.get('type'), node.attributes.get('href')) for node in tree.css('link')])
+
+
+_BACKENDS = {
+    'html.parser': _links_html_parser,
+    'lxml': _links_lxml if lxml is not None else None,
+    'selectolax': _links_selectolax if LexborHTMLParser is not None else None,
+}
+
+
+def get_backend(name=None):
+    """Return the link parser name to use: name, $COLLECTOR_HTML_PARSER, or html.parser."""
+    name = name or os.environ.get(PARSER_ENV) or 'html.parser'
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown HTML parser: {name}")
+    if _BACKENDS[name] is None:
+        logging.warning(f"{name} is not installed; parsing links with html.parser")
+        return 'html.parser'
+    return name
+
+
+def parse_links(html, backend='html.parser'):
+    """
+    Return the PageLinks of a page (str, or bytes as fetched). Runs in a worker process.
+    Parsers other than html.parser get bytes decoded as the collectors decode pages.
+    """
+    if backend != 'html.parser' and isinstance(html, bytes):
+        html = decode_page(html, page_encoding(html)[0])
+    return _BACKENDS[backend](html)
+
+
+def find_feed_link(feed_links, feed_types):
+    """
+    The href of the first <link> of the first feed type a page declares, as
+    soup.find("link", type=feed_type) finds it; None if there is none.
+    """
+    for feed_type in feed_types:
+        for link_type, href in feed_links:
+            if link_type == feed_type:
+                if href:
+                    return href
+                break
+    return None
+
+
+class LinkParserPool:
+    """
+    Process pool parsing pages into PageLinks off the fetching threads, so parsing does not hold
+    the GIL they need. At most max_pending pages are queued; submit() blocks beyond that.
+    A page whose worker dies or does not answer within timeout seconds is parsed inline, and
+    the pool is replaced.
+    """
+
+    def __init__(self, workers=PARSE_WORKERS, max_pending=MAX_PENDING_PAGES, backend=None, timeout=PARSE_TIMEOUT):
+        self.workers = workers
+        self.backend = get_backend(backend)
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.lock = threading.Lock()
+        self.pool = None
+
+    def _submit(self, html):
+        """Return (future, the pool it runs in, or None when it was parsed inline)."""
+        with METRICS.timer('parse_queue_wait'):
+            self.slots.acquire()
+        if self.workers > 0:
+            with self.lock:
+                if self.pool is None:
+                    # spawn: the collector runs metrics and logging threads, which fork does not copy safely
+                    self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                    mp_context=multiprocessing.get_context('spawn'))
+                try:
+                    future = self.pool.submit(parse_links, html, self.backend)
+                    future.add_done_callback(lambda _: self.slots.release())
+                    return future, self.pool
+                except BrokenProcessPool as e:
+                    logging.error(f"Link parser pool broke, parsing inline: {e}")
+                    self._reset(self.pool)
+        future = Future()
+        try:
+            future.set_result(parse_links(html, self.backend))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            self.slots.release()
+        return future, None
+
+    def _reset(self, pool):
+        """Stop a failed pool (its workers included, should one hang); the next submit starts a new one."""
+        # Every caller waiting on a failed pool gets here; the first one retires it
+        if getattr(pool, 'retired', False):
+            return
+        pool.retired = True
+        METRICS.inc('link_parser_pool_restarts_total')
+        if self.pool is pool:
+            self.pool = None
+        # ProcessPoolExecutor cannot stop a busy worker; terminating it fails the pool's other futures,
+        # whose callers then parse inline too
+        for process in list((pool._processes or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, html):
+        return self._submit(html)[0]
+
+    def parse(self, html):
+        """Parse a page in the pool and wait for its PageLinks; inline if the pool fails."""
+        future, pool = self._submit(html)
+        try:
+            return future.result(timeout=self.timeout if pool is not None else None)
+        except (BrokenProcessPool, TimeoutError) as e:
+            logging.error(f"Link parser pool failed ({type(e).__name__}), parsing inline")
+            with self.lock:
+                self._reset(pool)
+            return parse_links(html, self.backend)
+
+    def close(self):
+        with self.lock:
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+
+
+LINK_PARSER = LinkParserPool()
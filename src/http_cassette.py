@@ -0,0 +1,186 @@
+import atexit
+import base64
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Set COLLECTOR_CASSETTE=record|replay to capture or serve every HTTP exchange of a collector run
+CASSETTE_MODE_ENV = "COLLECTOR_CASSETTE"
+CASSETTE_PATH_ENV = "COLLECTOR_CASSETTE_PATH"
+# "original" replays with the recorded latency, "zero" answers immediately
+CASSETTE_LATENCY_ENV = "COLLECTOR_CASSETTE_LATENCY"
+DEFAULT_CASSETTE_PATH = "cassette.jsonl.gz"
+
+# The recorded body is already decoded, so these headers no longer describe it
+_DROPPED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+_original_send = HTTPAdapter.send
+_active_cassette = None
+
+
+class CassetteMiss(requests.ConnectionError):
+    """A replayed request that was not recorded in the cassette."""
+
+
+class Cassette:
+    """
+    Records HTTP exchanges to a gzipped JSON-lines archive, or replays them from it.
+    Exchanges are keyed by method and URL; repeated requests replay in recorded order.
+    """
+
+    def __init__(self, path=DEFAULT_CASSETTE_PATH, mode="replay", latency="original"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if latency not in ("original", "zero"):
+            raise ValueError(f"Unknown cassette latency: {latency}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.exchanges = {}
+        self.file = None
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        if mode == "replay":
+            self._load()
+        else:
+            # Appending adds a gzip member, so a recording can span several runs
+            self.file = gzip.open(path, "at", encoding="utf-8")
+
+    def _load(self):
+        loaded = 0
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        exchange = json.loads(line)
+                        self.exchanges.setdefault((exchange['method'], exchange['url']), []).append(exchange)
+                        loaded += 1
+        except (EOFError, gzip.BadGzipFile, zlib.error, ValueError) as e:
+            # A recording that was killed leaves a truncated final member; keep what was read before it
+            logging.warning(f"Cassette {self.path} is truncated after {loaded} exchanges: {e}")
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+    def summary(self):
+        return f"cassette {self.mode} {self.path}: recorded={self.recorded} replayed={self.replayed} misses={self.misses}"
+
+    def record(self, request, response=None, error=None, elapsed=0.0):
+        exchange = {'method': request.method, 'url': request.url, 'elapsed': round(elapsed, 6)}
+        if error is not None:
+            exchange['error'] = type(error).__name__
+            exchange['message'] = str(error)
+        else:
+            exchange.update({
+                'status': response.status_code,
+                'reason': response.reason,
+                'final_url': response.url,
+                'headers': {name: value for name, value in response.headers.items()
+                            if name.lower() not in _DROPPED_HEADERS},
+                'body': base64.b64encode(response.content).decode('ascii'),
+            })
+        line = json.dumps(exchange) + "\n"
+        with self.lock:
+            if self.file:
+                self.file.write(line)
+                # Flushed per exchange so a killed recording keeps everything it captured
+                self.file.flush()
+                self.recorded += 1
+
+    def next_exchange(self, request):
+        with self.lock:
+            exchanges = self.exchanges.get((request.method, request.url))
+            if not exchanges:
+                self.misses += 1
+                return None
+            self.replayed += 1
+            # The last exchange of a key keeps answering once the recorded ones are used up
+            return exchanges.pop(0) if len(exchanges) > 1 else exchanges[0]
+
+    def replay(self, adapter, request):
+        exchange = self.next_exchange(request)
+        if exchange is None:
+            raise CassetteMiss(f"{request.method} {request.url} is not in cassette {self.path}", request=request)
+        if self.latency == "original":
+            time.sleep(exchange['elapsed'])
+        if 'error' in exchange:
+            error_class = getattr(requests.exceptions, exchange['error'], requests.ConnectionError)
+            raise error_class(exchange['message'], request=request)
+
+        response = requests.Response()
+        response.status_code = exchange['status']
+        response.reason = exchange['reason']
+        response.url = exchange['final_url']
+        response.headers = CaseInsensitiveDict(exchange['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.request = request
+        response.connection = adapter
+        response._content = base64.b64decode(exchange['body'])
+        response._content_consumed = True
+        return response
+
+
+def _cassette_send(adapter, request, *args, **kwargs):
+    cassette = _active_cassette
+    if cassette is None:
+        return _original_send(adapter, request, *args, **kwargs)
+    if cassette.mode == "replay":
+        return cassette.replay(adapter, request)
+
+    start = time.perf_counter()
+    try:
+        response = _original_send(adapter, request, *args, **kwargs)
+        # Read streamed bodies now so they are timed and recorded; callers iterate the cached content
+        response.content
+    except requests.RequestException as e:
+        cassette.record(request, error=e, elapsed=time.perf_counter() - start)
+        raise
+    cassette.record(request, response, elapsed=time.perf_counter() - start)
+    return response
+
+
+def install_cassette(path=DEFAULT_CASSETTE_PATH, mode="replay", latency="original"):
+    """Route every requests HTTP exchange in this process through a cassette."""
+    global _active_cassette
+    uninstall_cassette()
+    _active_cassette = Cassette(path, mode, latency)
+    HTTPAdapter.send = _cassette_send
+    logging.info(f"HTTP cassette {mode} mode: {path} (latency={latency})")
+    return _active_cassette
+
+
+def uninstall_cassette():
+    """Restore live HTTP and close the active cassette."""
+    global _active_cassette
+    if _active_cassette is not None:
+        _active_cassette.close()
+        logging.info(_active_cassette.summary())
+        _active_cassette = None
+    HTTPAdapter.send = _original_send
+
+
+# Closes a recording's gzip member when the collector exits without uninstalling the cassette
+atexit.register(uninstall_cassette)
+
+
+def install_cassette_from_env():
+    """Install a cassette if COLLECTOR_CASSETTE is set; returns it or None."""
+    mode = os.environ.get(CASSETTE_MODE_ENV, "").strip().lower()
+    if not mode:
+        return None
+    return install_cassette(os.environ.get(CASSETTE_PATH_ENV, DEFAULT_CASSETTE_PATH), mode,
+                            os.environ.get(CASSETTE_LATENCY_ENV, "original").strip().lower())
@@ -3,30 +3,27 @@ import json
 import os
 import hashlib
 import gzip
-import feedparser
 import datetime
 import requests
 import subprocess
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse, unquote, urlsplit
-from NwalaTextUtils.textutils import derefURI, cleanHtml
+from NwalaTextUtils.textutils import derefURI
 import time
+from seed_loader import iter_publications
+from feed_fetcher import fetch_feeds, prefetch_feeds, FEED_STATS
+from watermark_store import load_watermarks, save_watermarks, new_feed_entries, mark_feed_entry
+from collector_metrics import METRICS, start_metrics_server, start_summary_dump
+from collector_logging import setup_logging, log_event
+from http_cassette import install_cassette_from_env
+from article_catalog import CATALOG
+from article_scorer import is_article_text
+from html_links import LINK_PARSER
+from url_classifier import URL_CLASSIFIER
+from homepage_diff import diff_homepage_links, mark_homepage_link
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,  # Set the logging level
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("news_scraper.log"),  # Log to a file
-        logging.StreamHandler()  # Also log to the console
-    ]
-)
-
-logging.info("Starting the script...")
-
-# Load the JSON file
-with open("preprocessed_updated_news_media_rss_and_status_code.json", "r") as f:
-    data = json.load(f)
+# Local Prometheus-style endpoint and periodic per-stage summary
+METRICS_PORT = 9109
+METRICS_SUMMARY_INTERVAL = 300
 
 # Define headers for HTTP requests
 HEADERS = {
@@ -40,7 +37,7 @@ def is_valid_url(url):
         result = urlsplit(url)
         return all([result.scheme, result.netloc])
     except ValueError:
-        logging.error(f"Invalid URL: {url}")
+        log_event('invalid_url', level=logging.WARNING, url=url)
         return False
 
 def extract_domain(url):
@@ -52,20 +49,21 @@ def extract_domain(url):
 def get_expanded_url(short_url):
     """Resolve short URLs to their final destination."""
     try:
-        response = requests.head(short_url, allow_redirects=True, timeout=5)
+        with METRICS.timer('head'):
+            response = requests.head(short_url, allow_redirects=True, timeout=5)
         return response.url
     except requests.RequestException as e:
-        logging.error(f"Error resolving URL: {short_url}: {e}")
+        log_event('head_failed', level=logging.WARNING, url=short_url, error=str(e))
         return short_url
 
 def extract_article_urls_from_html(html_content, base_url):
-    """Extract all article URLs from the given HTML content."""
-    soup = BeautifulSoup(html_content, 'html.parser')
+    """Extract all article URLs from the given HTML content, deduplicated in document order."""
+    with METRICS.timer('parse_html'):
+        # Parsed in a worker process, so the homepage parse does not hold the GIL other threads need
+        hrefs = LINK_PARSER.parse(html_content).anchors
     resolved_base = get_expanded_url(base_url)
-    return {
-        urljoin(resolved_base, link['href'])
-        for link in soup.find_all("a", href=True)
-    }
+    # Document order (rather than set order) keeps runs repeatable, e.g. when replaying a cassette
+    return list(dict.fromkeys(urljoin(resolved_base, href) for href in hrefs))
 
 def get_publication_date(entry):
     """Extract publication date from RSS entry."""
@@ -78,15 +76,17 @@ def has_special_characters(path_segment):
 
 def is_news_article(link):
     is_news_article = False
-    link = get_expanded_url(link)
+    # The checks run on the expanded URL; events name the original link, as the other verdicts do
+    expanded_url = get_expanded_url(link)
 
-    if not is_valid_url(link):
-       print(f"Invalid URL: {link}")
+    if not is_valid_url(expanded_url):
+       log_event('invalid_url', url=link, expanded_url=expanded_url, verdict_source='network')
        return is_news_article
     
-    parsed_url = urlparse(link)
+    parsed_url = urlparse(expanded_url)
     path_segments = [segment for segment in parsed_url.path.split('/') if segment]
     if not path_segments:
+        log_event('not_article_path', url=link, expanded_url=expanded_url, verdict_source='network')
         return is_news_article
     else:
         depth = len(path_segments)
@@ -95,28 +95,33 @@ def is_news_article(link):
         elif depth <= 2 and any(has_special_characters(segment) for segment in path_segments[:2]):
             is_news_article = True
         else:
+            log_event('not_article_path', url=link, expanded_url=expanded_url, verdict_source='network')
             return is_news_article
     
     try:
-        html = derefURI(link)
-        plaintext = cleanHtml(html)
-        count = len(plaintext)
-        if count > 20:
-            is_news_article = True
-        else:
-            print(f"Word count is less for {link}\n {plaintext}\n")
-            is_news_article = False
+        with METRICS.timer('deref'):
+            html = derefURI(expanded_url)
+        if not html:
+            # derefURI returns '' when the fetch fails: no verdict (None), so callers can retry the link
+            log_event('article_check_failed', level=logging.WARNING, url=link, expanded_url=expanded_url, error='no response')
+            return None
+        # The streaming scorer decides most pages; it runs cleanHtml only when unsure
+        with METRICS.timer('article_score'):
+            is_news_article, reason = is_article_text(html)
+        if not is_news_article:
+            log_event('short_article', url=link, expanded_url=expanded_url, reason=reason, verdict_source='network')
     except Exception as e:
         # If an exception occurs, write the error message to the log file
-        print(f"Error processing link: {link} because of {e}\n")
-        is_news_article = False
+        log_event('article_check_failed', level=logging.WARNING, url=link, expanded_url=expanded_url, error=str(e))
+        is_news_article = None
 
     return is_news_article
 
 def get_archived_url(link):
     """Archive a URL using Internet Archive and return the archived URL."""
     try:
-        result = subprocess.run(['archivenow', '--ia', link], capture_output=True, text=True, check=True)
+        with METRICS.timer('archive'):
+            result = subprocess.run(['archivenow', '--ia', link], capture_output=True, text=True, check=True)
         output = result.stdout.strip()
         if "Error" in output:
             logging.error(f"Archive error for {link}: {output}")
@@ -133,7 +138,8 @@ def save_to_file(filepath, data, mode='at'):
     """Save JSON objects line by line to a file with optional gzip compression."""
     try:
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        with gzip.open(filepath, mode, compresslevel=5) as f:
+        # Lines are encoded here, so the file is opened in binary for both 'at' and 'wt'
+        with gzip.open(filepath, mode.replace('t', 'b'), compresslevel=5) as f:
             if isinstance(data, list):
                 # Write each item in the list as a separate JSON line
                 for item in data:
@@ -143,16 +149,17 @@ def save_to_file(filepath, data, mode='at'):
                 f.write((json.dumps(data) + '\n').encode('utf-8'))
             else:
                 raise ValueError("Data must be a list of JSON objects or a single JSON object.")
-        logging.info(f"Data saved to {filepath}")
+        log_event('metadata_saved', path=filepath)
     except Exception as e:
         logging.error(f"Error saving data to {filepath}: {e}")
 
 def read_cached_urls(filepath):
-    """Read cached URLs from a gzip file."""
+    """Read cached URLs from a gzip file, written by save_to_file as one JSON string per line."""
     if os.path.exists(filepath):
         try:
             with gzip.open(filepath, "rt", encoding="utf-8") as f:
-                return {line.strip() for line in f}
+                lines = [line.strip() for line in f]
+            return {json.loads(line) if line.startswith('"') else line for line in lines if line}
         except Exception as e:
             logging.error(f"Error reading cache file {filepath}: {e}")
     return set()
@@ -167,9 +174,12 @@ def save_publication(state, year, month, date, website_url, publication):
         logging.info(f"Website: {website_url} has been saved")
         archived_url = get_archived_url(website_url)
         if archived_url:
-            publication['archived_link'] = archived_url
+            # The full seed entry is only needed here, so it is loaded lazily
+            publication_json = dict(publication.metadata(), archived_link=archived_url)
             with gzip.open(wesite_file_path, "at") as f:  
-                f.write(json.dumps(publication))
+                f.write(json.dumps(publication_json))
+            CATALOG.add_publication(state, website_hash, website_url, publication.media_type, publication_json.get('name'),
+                                    datetime.datetime.now().isoformat(), 'wayback', archived_url)
         
 # Main Processing
 def process_publication(state, publication, year, month, day):
@@ -181,31 +191,44 @@ def process_publication(state, publication, year, month, day):
     directory = os.path.join("news", state, str(year), str(month), str(day), website_hash)
     cache_filepath = os.path.join(directory, f"{website_hash}-cache.txt.gz")
     cached_urls = read_cached_urls(cache_filepath)
+    watermarks = load_watermarks(state, website_hash)
 
     article_json_objs = []
     nlinks = 0
 
-    # Process RSS Feeds
+    # Process RSS Feeds (fetched concurrently with timeouts, mostly while earlier publications were processed)
+    with METRICS.timer('feed_fetch'):
+        feeds = fetch_feeds(rss_feeds)
     for rss_feed_url in rss_feeds:
         logging.info(f"Processing RSS feed: {rss_feed_url}")
-        feed = feedparser.parse(rss_feed_url)
-        for entry in feed.entries:
+        # Only entries newer than the feed's watermark need the (network-bound) article check
+        for entry in new_feed_entries(watermarks, rss_feed_url, feeds[rss_feed_url]):
             article_url = entry.link
-            if article_url not in cached_urls and is_news_article(article_url):
-                logging.info(f"Found article: {article_url}")
+            if article_url in cached_urls:
+                mark_feed_entry(watermarks, rss_feed_url, entry)
+                continue
+            # An entry is marked once it is decided; after a failed check (None) or fetch it is retried next pass
+            is_article = is_news_article(article_url)
+            if is_article is False:
+                mark_feed_entry(watermarks, rss_feed_url, entry)
+            if is_article:
+                log_event('article_found', url=article_url, source='rss', verdict_source='network')
                 archived_url = get_archived_url(article_url)
                 if archived_url:
+                    mark_feed_entry(watermarks, rss_feed_url, entry)
                     article_json_objs.append({
                         'link': article_url,
                         'publication_date': get_publication_date(entry).isoformat(),
                         'archived_time': datetime.datetime.now().isoformat(),
-                        'archived_link': archived_url
+                        'archived_link': archived_url,
+                        'verdict_source': 'network'
                     })
                     cached_urls.add(article_url)
                     nlinks += 1
                     if nlinks >= 5:
                         break
-                time.sleep(5)
+                with METRICS.timer('sleep'):
+                    time.sleep(5)
         if nlinks >= 5:
             break
 
@@ -213,41 +236,79 @@ def process_publication(state, publication, year, month, day):
     if nlinks < 5:
         try:
             logging.info(f"Scraping website: {website_url}")
-            response = requests.get(website_url, headers=HEADERS, timeout=10)
+            with METRICS.timer('fetch_homepage'):
+                response = requests.get(website_url, headers=HEADERS, timeout=10)
             response.raise_for_status()
-            for article_url in extract_article_urls_from_html(response.text, website_url):
-                if article_url not in cached_urls and is_news_article(article_url):
-                    logging.info(f"Found article: {article_url}")
+            # Only links that appeared since the last visit (or were not reached then) go to the article filter
+            article_urls = diff_homepage_links(state, website_hash, website_url, watermarks,
+                                               extract_article_urls_from_html(response.text, website_url), cached_urls)
+            # The URL model decides the links it is confident about; only the rest need the network check
+            for article_url, verdict in zip(article_urls, URL_CLASSIFIER.classify(article_urls)):
+                verdict_source = 'classifier'
+                if verdict is None:
+                    verdict, verdict_source = is_news_article(article_url), 'network'
+                elif verdict is False:
+                    log_event('article_rejected', url=article_url, source='homepage', verdict_source=verdict_source)
+                # A link stays pending for the next visit until it is rejected or its article is saved
+                if verdict is False:
+                    mark_homepage_link(watermarks, article_url)
+                if verdict:
+                    log_event('article_found', url=article_url, source='homepage', verdict_source=verdict_source)
                     archived_url = get_archived_url(article_url)
                     if archived_url:
+                        mark_homepage_link(watermarks, article_url)
                         article_json_objs.append({
                             'link': article_url,
                             'publication_date': datetime.datetime.now().isoformat(),
                             'archived_time': datetime.datetime.now().isoformat(),
-                            'archived_link': archived_url
+                            'archived_link': archived_url,
+                            'verdict_source': verdict_source
                         })
                         cached_urls.add(article_url)
                         nlinks += 1
                         if nlinks >= 5:
                             break
-                    time.sleep(5)
+                    with METRICS.timer('sleep'):
+                        time.sleep(5)
         except requests.RequestException as e:
             logging.error(f"Error scraping {website_url}: {e}")
 
     # Save Results
-    save_to_file(os.path.join(directory, f"{website_hash}.jsonl.gz"), article_json_objs, 'at')
-    save_to_file(cache_filepath, '\n'.join(cached_urls), 'wt')
+    articles_filepath = os.path.join(directory, f"{website_hash}.jsonl.gz")
+    save_to_file(articles_filepath, article_json_objs, 'at')
+    save_to_file(cache_filepath, list(cached_urls), 'wt')
+    save_watermarks(state, website_hash, watermarks)
+    CATALOG.add_articles(article_json_objs, state, website_hash, f"{year:04d}-{month:02d}-{day:02d}",
+                         articles_filepath, publication.media_type)
 
 # Run the Script
-while True:
-    for state, publications in data.items():
-        logging.info(f"Processing state: {state}")
-        for news_media in ['newspaper', 'tv', 'radio', 'broadcast']:
-            for publication in publications.get(news_media, []):
-                response_status = publication.get('website_status')
-                if response_status and (200 <= response_status < 300):
-                    timestamp = datetime.datetime.now()
-                    website_url = publication.get("website")
-                    process_publication(state, publication, timestamp.year, timestamp.month, timestamp.day)
-                    save_publication(state, timestamp.year, timestamp.month, timestamp.day, website_url, publication)
-    time.sleep(1)  # Prevent overwhelming the server
+if __name__ == "__main__":
+    # Queue-backed logging: JSON lines to a rotating news_scraper.log, plain text to the console
+    setup_logging("news_scraper.log")
+    logging.info("Starting the script...")
+    start_metrics_server(METRICS_PORT)
+    start_summary_dump(METRICS_SUMMARY_INTERVAL)
+    # COLLECTOR_CASSETTE=record|replay captures or replays every HTTP exchange for profiling
+    install_cassette_from_env()
+
+    while True:
+        # Stream compact records from the seed file instead of loading it whole
+        state = None
+        publications = (publication for publication in
+                        iter_publications("preprocessed_updated_news_media_rss_and_status_code.json")
+                        if publication.website_status and 200 <= publication.website_status < 300)
+        # The feeds of the next publications download in the background while this one is processed
+        for publication in prefetch_feeds(publications):
+            if publication.state != state:
+                state = publication.state
+                logging.info(f"Processing state: {state}")
+            timestamp = datetime.datetime.now()
+            website_url = publication.website
+            start = time.perf_counter()
+            # Every stage timed while processing this publication is labelled with its state and host
+            with METRICS.labels(state=state, host=extract_domain(website_url)):
+                process_publication(state, publication, timestamp.year, timestamp.month, timestamp.day)
+                save_publication(state, timestamp.year, timestamp.month, timestamp.day, website_url, publication)
+                METRICS.observe('collector_publication_seconds', time.perf_counter() - start)
+        logging.info(FEED_STATS.summary())
+        time.sleep(1)  # Prevent overwhelming the server
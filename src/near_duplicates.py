@@ -0,0 +1,215 @@
+import array
+import datetime
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # optional: without numpy signatures are computed in pure Python, ~30x slower
+    np = None
+
+from collector_metrics import METRICS
+
+NEAR_DUPLICATE_DB = "near_duplicates.sqlite"
+
+SHINGLE_SIZE = 3
+# Pages with fewer words than this are mostly boilerplate and would cluster together
+MIN_WORDS = 50
+# Only the start of long pages is fingerprinted; it bounds the cost of pages with huge comment threads
+MAX_WORDS = 1000
+# MinHash signature of NUM_PERM values, indexed as BANDS LSH buckets of ROWS values each.
+# Pages with a shingle Jaccard similarity above ~(1/BANDS)**(1/ROWS) = 0.5 usually share a bucket.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# Candidates sharing a bucket are near-duplicates if this share of their signatures agrees
+SIMILARITY_THRESHOLD = 0.7
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20241218)
+# Fixed seed: signatures must stay comparable across runs and processes
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+if np is not None:
+    _P = np.uint64(_MERSENNE_PRIME)
+    _LOW32 = np.uint64(0xffffffff)
+    _A_HIGH = np.array([a >> 32 for a, _ in _PERMUTATIONS], dtype=np.uint64)[:, None]
+    _A_LOW = np.array([a & 0xffffffff for a, _ in _PERMUTATIONS], dtype=np.uint64)[:, None]
+    _B = np.array([b for _, b in _PERMUTATIONS], dtype=np.uint64)[:, None]
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    cluster_id INTEGER NOT NULL,
+    state TEXT,
+    website_hash TEXT,
+    saved_time TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    fingerprint_id INTEGER NOT NULL REFERENCES fingerprints(id)
+);
+CREATE INDEX IF NOT EXISTS bands_lookup ON bands(band, bucket);
+"""
+
+
+def shingles(text, shingle_size=SHINGLE_SIZE, min_words=MIN_WORDS, max_words=MAX_WORDS):
+    """Return the hashed word shingles of a text, or None if the text is too short."""
+    words = _WORD_RE.findall(text.lower())[:max_words]
+    if len(words) < min_words:
+        return None
+    return {
+        int.from_bytes(hashlib.blake2b(' '.join(words[i:i + shingle_size]).encode('utf-8'), digest_size=8).digest(), 'big')
+        for i in range(len(words) - shingle_size + 1)
+    }
+
+
+def _mod_mersenne(x):
+    """Reduce uint64 values modulo 2**61 - 1."""
+    x = (x & _P) + (x >> np.uint64(61))
+    return np.where(x >= _P, x - _P, x)
+
+
+def _minhash_numpy(hashes):
+    """
+    min((a * h + b) mod 2**61 - 1) of every permutation over all shingles at once. The 122-bit
+    products are split into 32-bit halves (2**61 = 1 mod p), so uint64 gives the exact values.
+    """
+    h = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+    h = _mod_mersenne(h)
+    h_high, h_low = h >> np.uint64(32), h & _LOW32
+    middle = _A_HIGH * h_low + _A_LOW * h_high
+    low = _A_LOW * h_low
+    x = ((_A_HIGH * h_high) << np.uint64(3)) + (middle >> np.uint64(29)) + \
+        ((middle & np.uint64((1 << 29) - 1)) << np.uint64(32)) + (low & _P) + (low >> np.uint64(61)) + _B
+    return _mod_mersenne(x).min(axis=1) & _LOW32
+
+
+def minhash(text):
+    """Return the MinHash signature (NUM_PERM 32-bit values) of a text, or None if it is too short."""
+    hashes = shingles(text)
+    if not hashes:
+        return None
+    if np is not None:
+        return array.array('I', _minhash_numpy(hashes).tolist())
+    return array.array('I', [min((a * h + b) % _MERSENNE_PRIME for h in hashes) & 0xffffffff
+                             for a, b in _PERMUTATIONS])
+
+
+def similarity(signature, other):
+    """Estimate the Jaccard similarity of two texts from their signatures."""
+    return sum(1 for x, y in zip(signature, other) if x == y) / len(signature)
+
+
+def band_buckets(signature):
+    """Return the (band, bucket) LSH keys of a signature."""
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS].tobytes()
+        # 63 bits so the bucket fits a signed SQLite integer
+        buckets.append((band, int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), 'big') >> 1))
+    return buckets
+
+
+class NearDuplicateIndex:
+    """
+    Persistent MinHash index with LSH banding. Each added article gets a cluster id:
+    the cluster of its most similar indexed near-duplicate, or a new cluster of its own.
+    """
+
+    def __init__(self, filepath=NEAR_DUPLICATE_DB, threshold=SIMILARITY_THRESHOLD):
+        self.filepath = filepath
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.db = None
+
+    def _connect(self):
+        if self.db is None:
+            directory = os.path.dirname(self.filepath)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Several collectors may share the index; WAL lets them read while one writes
+            self.db = sqlite3.connect(self.filepath, timeout=30, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(_SCHEMA)
+        return self.db
+
+    def close(self):
+        with self.lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+
+    def _closest(self, db, signature, buckets):
+        """Return (similarity, url, cluster_id) of the most similar candidate above the threshold."""
+        seen = set()
+        closest = None
+        for band, bucket in buckets:
+            rows = db.execute(
+                "SELECT f.id, f.url, f.signature, f.cluster_id FROM bands b JOIN fingerprints f ON f.id = b.fingerprint_id "
+                "WHERE b.band = ? AND b.bucket = ?", (band, bucket))
+            for fingerprint_id, url, other, cluster_id in rows:
+                if fingerprint_id in seen:
+                    continue
+                seen.add(fingerprint_id)
+                score = similarity(signature, array.array('I', other))
+                if score >= self.threshold and (closest is None or score > closest[0]):
+                    closest = (score, url, cluster_id)
+        return closest
+
+    def add(self, url, text, state=None, website_hash=None):
+        """
+        Fingerprint an article's text and index it.
+        Returns {'cluster_id', 'near_duplicate_of', 'similarity'}, or None for short texts.
+        """
+        with METRICS.timer('fingerprint'):
+            signature = minhash(text)
+        if signature is None:
+            return None
+        buckets = band_buckets(signature)
+        with self.lock:
+            db = self._connect()
+            closest = self._closest(db, signature, buckets)
+            with db:
+                cursor = db.execute(
+                    "INSERT INTO fingerprints (url, signature, cluster_id, state, website_hash, saved_time) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, signature.tobytes(), closest[2] if closest else 0, state, website_hash,
+                     datetime.datetime.now().isoformat()))
+                fingerprint_id = cursor.lastrowid
+                cluster_id = closest[2] if closest else fingerprint_id
+                if not closest:
+                    db.execute("UPDATE fingerprints SET cluster_id = ? WHERE id = ?", (cluster_id, fingerprint_id))
+                db.executemany("INSERT INTO bands (band, bucket, fingerprint_id) VALUES (?, ?, ?)",
+                               [(band, bucket, fingerprint_id) for band, bucket in buckets])
+        if closest:
+            METRICS.inc('near_duplicates_total')
+        return {
+            'cluster_id': cluster_id,
+            'near_duplicate_of': closest[1] if closest else None,
+            'similarity': round(closest[0], 3) if closest else None,
+        }
+
+    def report(self):
+        """Count fingerprints, clusters and articles that joined an existing cluster."""
+        with self.lock:
+            db = self._connect()
+            fingerprints, clusters = db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT cluster_id) FROM fingerprints").fetchone()
+        return {'fingerprints': fingerprints, 'clusters': clusters, 'near_duplicates': fingerprints - clusters}
+
+    def summary(self):
+        report = self.report()
+        return (f"near-duplicates: {report['near_duplicates']} of {report['fingerprints']} articles "
+                f"in {report['clusters']} clusters")
+
+
+NEAR_DUPLICATES = NearDuplicateIndex()
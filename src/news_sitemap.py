@@ -0,0 +1,103 @@
+import datetime
+import logging
+from urllib.parse import urljoin
+
+import requests
+
+from sitemap_reader import iter_sitemap
+
+# Common locations of Google News sitemaps when robots.txt does not list them
+NEWS_SITEMAP_PATHS = ["news-sitemap.xml", "sitemap-news.xml", "sitemap_news.xml", "news_sitemap.xml", "sitemap/news.xml"]
+# How often to look for news sitemaps again on a site
+SITEMAP_RECHECK_INTERVAL = datetime.timedelta(days=7)
+# Entries accepted on the first run, before a site has a watermark
+INITIAL_LOOKBACK = datetime.timedelta(days=2)
+
+
+def parse_w3c_datetime(value):
+    """Parse a W3C datetime (as used in sitemaps) into an aware UTC datetime."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.astimezone(datetime.timezone.utc)
+
+
+def find_news_sitemaps(website_url, session=None, timeout=5):
+    """Find the news sitemaps of a website from robots.txt and common locations."""
+    session = session or requests
+    sitemap_urls = []
+    try:
+        response = session.get(urljoin(website_url, "robots.txt"), timeout=timeout)
+        response.raise_for_status()
+        for line in response.text.splitlines():
+            if line.lower().startswith("sitemap:"):
+                sitemap_url = line.split(":", 1)[1].strip()
+                if "news" in sitemap_url.lower():
+                    sitemap_urls.append(sitemap_url)
+    except requests.RequestException:
+        pass
+
+    if not sitemap_urls:
+        for path in NEWS_SITEMAP_PATHS:
+            sitemap_url = urljoin(website_url, path)
+            try:
+                response = session.head(sitemap_url, allow_redirects=True, timeout=timeout)
+                if response.status_code == 200:
+                    sitemap_urls.append(response.url)
+                    break
+            except requests.RequestException:
+                continue
+    return sitemap_urls
+
+
+def get_new_sitemap_articles(website_url, watermarks, session=None, timeout=10):
+    """
+    Return [(article_url, publication_date)] from the news sitemaps of a website that are newer
+    than the stored lastmod watermark and not yet marked with mark_sitemap_article, oldest first.
+    Returns None if the site has no news sitemap.
+    The watermark only moves up to the oldest entry still unmarked, so entries the collector did
+    not reach (or failed to fetch) in one pass are offered again in the next.
+    The 'news_sitemap' entry of watermarks is updated in place; the caller persists it.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    site_state = watermarks.setdefault("news_sitemap", {})
+
+    checked = parse_w3c_datetime(site_state.get("checked"))
+    if checked is None or now - checked > SITEMAP_RECHECK_INTERVAL:
+        site_state["urls"] = find_news_sitemaps(website_url, session)
+        site_state["checked"] = now.isoformat()
+    if not site_state["urls"]:
+        return None
+
+    high_water_mark = parse_w3c_datetime(site_state.get("lastmod")) or now - INITIAL_LOOKBACK
+    seen = set(site_state.get("seen", []))
+    entries = []
+    for entry in iter_sitemap(site_state["urls"], session=session, timeout=timeout):
+        published = parse_w3c_datetime(entry.publication_date or entry.lastmod)
+        if published is None or published <= high_water_mark:
+            continue
+        entries.append((entry.loc, published))
+    entries.sort(key=lambda article: article[1])
+
+    # Every entry before the oldest unmarked one is done: move the watermark up to it
+    articles = [(url, published) for url, published in entries if url not in seen]
+    done = [published for url, published in entries if url in seen
+            and (not articles or published < articles[0][1])]
+    if done:
+        high_water_mark = max(done)
+        site_state["lastmod"] = high_water_mark.isoformat()
+    site_state["seen"] = [url for url, published in entries if url in seen and published > high_water_mark]
+    logging.info(f"News sitemap of {website_url} has {len(articles)} new entries after {high_water_mark.isoformat()}")
+    return articles
+
+
+def mark_sitemap_article(watermarks, article_url):
+    """Record a sitemap entry as collected; it is not offered again."""
+    seen = watermarks.setdefault("news_sitemap", {}).setdefault("seen", [])
+    if article_url not in seen:
+        seen.append(article_url)
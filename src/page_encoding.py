@@ -0,0 +1,66 @@
+import codecs
+import re
+
+# Pages are stored as the raw bytes the server sent. Their encoding is worked out cheaply
+# (BOM, Content-Type charset, then a <meta> prescan of the first bytes, as browsers do)
+# instead of requests' whole-body charset detection, and text is only decoded on demand.
+DEFAULT_ENCODING = "utf-8"
+# Browsers only prescan the first 1024 bytes for <meta charset>; some pages put it a bit later
+META_PRESCAN_BYTES = 4096
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+# Labels that browsers (and so page authors) treat as windows-1252
+_BROWSER_ALIASES = {"iso8859-1": "cp1252", "ascii": "cp1252"}
+_HEADER_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([^"\';\s]+)', re.I)
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+?charset\s*=\s*["\']?\s*([a-zA-Z0-9_:.+-]+)', re.I)
+
+
+def normalize_encoding(name):
+    """Return the canonical codec name of an encoding label, or None if Python does not know it."""
+    if not name:
+        return None
+    if isinstance(name, bytes):
+        name = name.decode('ascii', 'ignore')
+    try:
+        name = codecs.lookup(name.strip()).name
+    except LookupError:
+        return None
+    return _BROWSER_ALIASES.get(name, name)
+
+
+def declared_encoding(headers):
+    """Charset declared in a Content-Type header, or None (no ISO-8859-1 default for text/*)."""
+    match = _HEADER_CHARSET_RE.search(headers.get('content-type', '') if headers else '')
+    return normalize_encoding(match.group(1)) if match else None
+
+
+def meta_encoding(data):
+    """Charset of a <meta charset> or <meta http-equiv> near the start of a page, or None."""
+    match = _META_CHARSET_RE.search(data[:META_PRESCAN_BYTES])
+    return normalize_encoding(match.group(1)) if match else None
+
+
+def page_encoding(data, headers=None):
+    """
+    Return (encoding, source) of a page body: source is 'bom', 'header', 'meta' or 'default'.
+    A BOM wins over the header, and the header over <meta>, as in the HTML spec.
+    """
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            return encoding, 'bom'
+    encoding = declared_encoding(headers)
+    if encoding:
+        return encoding, 'header'
+    encoding = meta_encoding(data)
+    if encoding:
+        return encoding, 'meta'
+    return DEFAULT_ENCODING, 'default'
+
+
+def decode_page(data, encoding=None):
+    """Decode stored page bytes, replacing the odd invalid byte rather than failing."""
+    return data.decode(encoding or DEFAULT_ENCODING, errors='replace')
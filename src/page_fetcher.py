@@ -0,0 +1,147 @@
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+
+import requests
+
+try:
+    import resource
+except ImportError:  # not available on Windows; peak RSS is then not reported
+    resource = None
+
+from collector_metrics import METRICS
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/102.0.0.0 Safari/537.36'
+}
+
+PAGE_TIMEOUT = 10
+# Pages larger than this are dropped; a runaway or endless response cannot exhaust memory or disk
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# Bodies are buffered in memory up to this size and spill to a temporary file beyond it
+SPOOL_BYTES = 1024 * 1024
+# First bytes kept in memory for <meta charset> sniffing
+PREFIX_BYTES = 4096
+# Content types worth downloading; a missing Content-Type is given the benefit of the doubt
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain', '')
+
+# ru_maxrss is in kilobytes on Linux and bytes on macOS
+_RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+_worker = threading.local()
+
+
+class PageFetchError(requests.RequestException):
+    pass
+
+
+class PageTooLarge(PageFetchError):
+    pass
+
+
+class NotHtml(PageFetchError):
+    pass
+
+
+def _record_memory(buffered):
+    """Track the largest body a worker thread held in memory and the process peak RSS."""
+    worker = f"{os.getpid()}-{threading.current_thread().name}"
+    if buffered > getattr(_worker, 'peak', 0):
+        _worker.peak = buffered
+        METRICS.set('collector_worker_peak_buffer_bytes', buffered, worker=worker, host=None)
+    if resource is not None:
+        METRICS.set('collector_max_rss_bytes', resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT,
+                    pid=os.getpid(), host=None, state=None)
+
+
+class FetchedPage:
+    """
+    Body of a streamed download, held in a spooled temporary file with its size and sha256.
+    The requests.Response keeps the status and headers for the WARC records; its body is consumed.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.url = response.url
+        self.headers = response.headers
+        self.body = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.prefix = b''
+
+    @property
+    def sha256(self):
+        return self.hash.hexdigest()
+
+    @property
+    def digest(self):
+        return self.hash.digest()
+
+    def write(self, chunk):
+        self.body.write(chunk)
+        self.hash.update(chunk)
+        if len(self.prefix) < PREFIX_BYTES:
+            self.prefix += chunk[:PREFIX_BYTES - len(self.prefix)]
+        self.size += len(chunk)
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        """Yield the body in chunks; can be called again to re-read it."""
+        self.body.seek(0)
+        while True:
+            chunk = self.body.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def read(self):
+        """Return the whole body, for consumers that need the page as one string."""
+        self.body.seek(0)
+        return self.body.read()
+
+    def close(self):
+        self.body.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def content_type(headers):
+    return headers.get('content-type', '').split(';')[0].strip().lower()
+
+
+def fetch_page(url, session=None, headers=HEADERS, timeout=PAGE_TIMEOUT, max_bytes=MAX_PAGE_BYTES,
+               content_types=HTML_CONTENT_TYPES):
+    """
+    Download a page in chunks into a FetchedPage. Non-HTML responses are abandoned after their
+    headers, and downloads are cut off as soon as they pass max_bytes (PageTooLarge).
+    """
+    session = session or requests
+    with session.get(url, headers=headers, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        if content_types is not None and content_type(response.headers) not in content_types:
+            METRICS.inc('page_fetch_aborted_total', reason='content_type')
+            raise NotHtml(f"{url} is {content_type(response.headers)}, not HTML", response=response)
+        declared_length = response.headers.get('content-length', '')
+        if declared_length.isdigit() and int(declared_length) > max_bytes:
+            METRICS.inc('page_fetch_aborted_total', reason='too_large')
+            raise PageTooLarge(f"{url} is {declared_length} bytes, more than {max_bytes}", response=response)
+        page = FetchedPage(response)
+        try:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                page.write(chunk)
+                if page.size > max_bytes:
+                    METRICS.inc('page_fetch_aborted_total', reason='too_large')
+                    raise PageTooLarge(f"{url} is larger than {max_bytes} bytes", response=response)
+        except BaseException:
+            page.close()
+            raise
+    METRICS.inc('page_fetch_bytes_total', page.size)
+    if page.size > SPOOL_BYTES:
+        METRICS.inc('page_fetch_spilled_total')
+    _record_memory(min(page.size, SPOOL_BYTES))
+    return page
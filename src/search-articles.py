@@ -0,0 +1,46 @@
+"""
+Search the collected articles' text and titles in search.sqlite.
+
+The query uses SQLite FTS5 syntax: words (all must match), "exact phrases", OR, NOT and
+prefix* terms. Results are ranked by bm25, with title matches weighted above text matches.
+
+    python search-articles.py "school board"
+    python search-articles.py "flood* NOT football" --state VA --since 2025-03-01 --until 2025-04-01
+    python search-articles.py election --outlet <hashed-webpage-url> --json
+"""
+import argparse
+import json
+import sqlite3
+import sys
+import time
+
+from article_search import SEARCH_DB, ArticleSearch
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("query", help="FTS5 query")
+    parser.add_argument("--db", default=SEARCH_DB, help="search index database")
+    parser.add_argument("--state", help="only articles of this state")
+    parser.add_argument("--outlet", help="only articles of this website_hash")
+    parser.add_argument("--since", help="only articles published on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--until", help="only articles published before this date (YYYY-MM-DD)")
+    parser.add_argument("--limit", type=int, default=20, help="number of results")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON lines")
+    args = parser.parse_args()
+
+    search = ArticleSearch(args.db)
+    start = time.perf_counter()
+    try:
+        results = search.search(args.query, args.state, args.outlet, args.since, args.until, args.limit)
+    except sqlite3.OperationalError as e:
+        sys.exit(f"Invalid query {args.query!r}: {e}")
+    seconds = time.perf_counter() - start
+    for result in results:
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(f"{(result['publication_date'] or '')[:10]:<11}{result['state'] or '':<4}"
+                  f"{result['title'] or '(no title)'}\n{'':<15}{result['link']}")
+    if not args.json:
+        print(f"{len(results)} results in {seconds * 1000:.1f}ms", file=sys.stderr)
+    search.close()
@@ -0,0 +1,156 @@
+import codecs
+import gzip
+import json
+
+MEDIA_TYPES = ['newspaper', 'tv', 'radio', 'broadcast']
+
+_decoder = json.JSONDecoder()
+
+
+def _open_seed_file(filepath):
+    """Open a (possibly gzipped) seed file in binary mode."""
+    if filepath.endswith(".gz"):
+        return gzip.open(filepath, "rb")
+    return open(filepath, "rb")
+
+
+class Publication:
+    """
+    Compact record of a seed publication holding only the fields the collectors need.
+    The full seed entry (social media links, location, ...) is re-read from the seed file on demand.
+    """
+    __slots__ = ('state', 'media_type', 'website', 'rss', 'website_status', 'name', '_filepath', '_offset')
+
+    FIELDS = ('website', 'rss', 'website_status', 'name')
+
+    def __init__(self, state, media_type, website, rss, website_status, name=None, filepath=None, offset=None):
+        self.state = state
+        self.media_type = media_type
+        self.website = website
+        self.rss = rss
+        self.website_status = website_status
+        self.name = name
+        self._filepath = filepath
+        self._offset = offset
+
+    @classmethod
+    def from_dict(cls, state, media_type, publication, filepath=None, offset=None):
+        return cls(state, media_type, publication.get('website'), tuple(publication.get('rss') or ()),
+                   publication.get('website_status'), publication.get('name'), filepath, offset)
+
+    def get(self, key, default=None):
+        """dict-style access; fields other than the compact ones are loaded lazily."""
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            return default if value is None else value
+        return self.metadata().get(key, default)
+
+    def metadata(self):
+        """Load the full seed entry of this publication."""
+        if self._filepath is None:
+            return {field: getattr(self, field) for field in self.FIELDS}
+        with _open_seed_file(self._filepath) as f:
+            f.seek(self._offset)
+            stream = _JsonStream(f, self._offset)
+            return stream.value()
+
+    def __repr__(self):
+        return f"Publication({self.state!r}, {self.media_type!r}, {self.website!r})"
+
+
+class _JsonStream:
+    """Minimal pull tokenizer over a UTF-8 JSON file that tracks byte offsets."""
+
+    def __init__(self, f, offset=0, chunk_size=64 * 1024):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        # Byte offset in the file of self.buffer[0]
+        self.offset = offset
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            self.buffer += self.decoder.decode(b'', final=True)
+            return False
+        self.buffer += self.decoder.decode(chunk)
+        return True
+
+    def _consume(self, n):
+        self.offset += len(self.buffer[:n].encode('utf-8'))
+        self.buffer = self.buffer[n:]
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it ('' at end of file)."""
+        while True:
+            stripped = self.buffer.lstrip()
+            if len(stripped) != len(self.buffer):
+                self._consume(len(self.buffer) - len(stripped))
+            if self.buffer:
+                return self.buffer[0]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars):
+        """Consume one of the given structural characters and return it."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"Malformed seed file at byte {self.offset}: expected one of {chars!r}, got {char!r}")
+        self._consume(1)
+        return char
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof or not isinstance(value, (int, float)):
+                    self._consume(end)
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def members(self, open_char, close_char):
+        """Iterate over the members of an object or array, leaving each value for the caller to read."""
+        self.expect(open_char)
+        if self.peek() == close_char:
+            self._consume(1)
+            return
+        while True:
+            if open_char == '{':
+                key = self.value()
+                self.expect(':')
+                yield key
+            else:
+                yield None
+            if self.expect(',' + close_char) == close_char:
+                return
+
+
+def iter_publications(filepath, media_types=MEDIA_TYPES):
+    """
+    Stream the seed file ({state: {media_type: [publication, ...]}}) and yield compact
+    Publication records without loading the whole file into memory.
+    """
+    with _open_seed_file(filepath) as f:
+        stream = _JsonStream(f)
+        for state in stream.members('{', '}'):
+            for media_type in stream.members('{', '}'):
+                if stream.peek() != '[':
+                    stream.value()
+                    continue
+                for _ in stream.members('[', ']'):
+                    stream.peek()
+                    offset = stream.offset
+                    publication = stream.value()
+                    if media_type in media_types and isinstance(publication, dict):
+                        yield Publication.from_dict(state, media_type, publication, filepath, offset)
@@ -0,0 +1,232 @@
+import atexit
+import datetime
+import json
+import logging
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: segments are then not protected against a second writer
+    fcntl = None
+
+from compression import GzipCodec, decompress
+from warc_writer import cdxj_line, exchange_records, parse_warc_record, record_payload, warc_record, warcinfo_record
+
+# Article fetches are packed into append-only WARC segment files, one series per state and day:
+# segments/<state>/<YYYY-MM-DD>-<n>.warc.gz, with a sidecar <segment>.idx offset index of every
+# record and a <segment>.cdxj index of the responses for replay tools. Segments written with zstd
+# before stay readable.
+SEGMENT_DIR = "segments"
+# A new segment of the same day is started once the current one reaches this size
+MAX_SEGMENT_BYTES = 1024 * 1024 * 1024
+
+
+def read_record(segment_path, offset, length):
+    """Read the WARC record stored as one gzip member (or zstd frame, in older segments) at offset in a segment."""
+    with open(segment_path, 'rb') as f:
+        f.seek(offset)
+        member = f.read(length)
+    if len(member) != length:
+        raise IOError(f"Truncated record at {segment_path}:{offset}")
+    return parse_warc_record(decompress(member))
+
+
+def read_payload(segment_path, offset, length):
+    """Read the stored page (HTTP body or resource block) of a record."""
+    return record_payload(*read_record(segment_path, offset, length))
+
+
+def read_index(segment_path):
+    """Return the complete entries of a segment's offset index."""
+    entries = []
+    index_path = f"{segment_path}.idx"
+    if os.path.exists(index_path):
+        with open(index_path, 'rb') as f:
+            for line in f:
+                # A line without a newline was cut off by a crash
+                if line.endswith(b"\n"):
+                    entries.append(json.loads(line))
+    return entries
+
+
+def recover_segment(segment_path):
+    """
+    Make a segment consistent with its index after a crash: drop a half-written index
+    line and truncate record bytes that were written but never indexed. Only call it holding
+    the segment's lock (see _OpenSegment): it would cut the in-flight records of a live writer.
+    """
+    entries = read_index(segment_path)
+    end = max((entry['offset'] + entry['length'] for entry in entries), default=0)
+    index_path = f"{segment_path}.idx"
+    if os.path.exists(index_path):
+        with open(index_path, 'rb+') as f:
+            content = f.read()
+            complete = content[:content.rfind(b"\n") + 1]
+            if len(complete) != len(content):
+                f.truncate(len(complete))
+    if os.path.exists(segment_path) and os.path.getsize(segment_path) > end:
+        logging.warning(f"Truncating {os.path.getsize(segment_path) - end} unindexed bytes from {segment_path}")
+        with open(segment_path, 'rb+') as f:
+            f.truncate(end)
+        # CDXJ lines of the dropped records must go too
+        cdxj_path = f"{segment_path}.cdxj"
+        if os.path.exists(cdxj_path):
+            with open(cdxj_path, 'r', encoding='utf-8') as f:
+                lines = [line for line in f if line.endswith("\n") and int(json.loads(line.split(" ", 2)[2])['offset']) < end]
+            _write_lines(cdxj_path, lines)
+    return end
+
+
+def _write_lines(filepath, lines):
+    tmp_filepath = f"{filepath}.tmp"
+    with open(tmp_filepath, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+    os.replace(tmp_filepath, filepath)
+
+
+def sort_cdxj(segment_path):
+    """Sort a segment's CDXJ index, which is appended in fetch order while the segment is written."""
+    cdxj_path = f"{segment_path}.cdxj"
+    if os.path.exists(cdxj_path):
+        with open(cdxj_path, 'r', encoding='utf-8') as f:
+            lines = [line for line in f if line.endswith("\n")]
+        _write_lines(cdxj_path, sorted(lines))
+
+
+class _OpenSegment:
+    """
+    A segment held open for appending. Several collectors may write to the same segments/ tree, so
+    the writer holds an exclusive lock on the segment file while it is open: recovery only truncates
+    a segment no live writer is appending to. Raises BlockingIOError if another writer holds it.
+    """
+
+    def __init__(self, day, path):
+        self.day = day
+        self.path = path
+        self.data_file = open(path, 'ab')
+        if fcntl is not None:
+            try:
+                fcntl.flock(self.data_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self.data_file.close()
+                raise
+        self.size = recover_segment(path)
+        self.index_file = open(f"{path}.idx", 'ab')
+        self.cdxj_file = open(f"{path}.cdxj", 'a', encoding='utf-8')
+
+    def close(self):
+        self.index_file.close()
+        self.cdxj_file.close()
+        sort_cdxj(self.path)
+        # Closing the segment file releases its lock, once the indexes are complete
+        self.data_file.close()
+
+
+class SegmentWriter:
+    """
+    Appends WARC records to per-state, per-day segment files that roll over at max_bytes.
+    Each record is its own gzip member, so it can be read with a single seek and the segment
+    stays a standard .warc.gz for WARC tools. Records are fsynced before their index line, and
+    the index line before the caller references them, so after a crash recover_segment() can
+    cut the segment back to the last indexed record.
+    """
+
+    def __init__(self, root=SEGMENT_DIR, max_bytes=MAX_SEGMENT_BYTES, fsync=True, codec=None):
+        self.root = root
+        self.codec = codec or GzipCodec()
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.open_segments = {}
+
+    def _segment_path(self, state, day, number):
+        return os.path.join(self.root, state, f"{day}-{number:05d}.warc{self.codec.extension}")
+
+    def _open(self, state, day):
+        """Return the segment of the state and day to append to, starting a new one if needed."""
+        segment = self.open_segments.get(state)
+        if segment and segment.day == day and segment.size < self.max_bytes:
+            return segment
+        if segment:
+            self._close(state)
+        number = 0
+        while os.path.exists(self._segment_path(state, day, number + 1)):
+            number += 1
+        while True:
+            path = self._segment_path(state, day, number)
+            if not (os.path.exists(path) and os.path.getsize(path) >= self.max_bytes):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                try:
+                    segment = self.open_segments[state] = _OpenSegment(day, path)
+                    break
+                except BlockingIOError:
+                    # Another collector is appending to this segment; start the next one
+                    pass
+            number += 1
+        if segment.size == 0:
+            self._write(segment, [warcinfo_record(os.path.basename(path))], {'warcinfo': True})
+        return segment
+
+    def _close(self, state):
+        segment = self.open_segments.pop(state, None)
+        if segment:
+            segment.close()
+
+    def close(self):
+        """Close all open segments and sort their CDXJ indexes."""
+        with self.lock:
+            for state in list(self.open_segments):
+                self._close(state)
+
+    def _write(self, segment, records, index_fields, url=None, cdx_headers=None):
+        """
+        Write records as consecutive compressed members and index the last one.
+        StreamedRecords are compressed chunk by chunk straight into the segment.
+        """
+        offset = segment.size
+        for record in records:
+            if isinstance(record, bytes):
+                length = segment.data_file.write(self.codec.compress(record))
+            else:
+                length = self.codec.compress_chunks(record, segment.data_file, size=record.size)
+            offset = segment.size
+            segment.size += length
+        segment.data_file.flush()
+        if self.fsync:
+            os.fsync(segment.data_file.fileno())
+        entry = dict(index_fields or {}, url=url, offset=offset, length=length)
+        segment.index_file.write((json.dumps(entry) + "\n").encode('utf-8'))
+        segment.index_file.flush()
+        if self.fsync:
+            os.fsync(segment.index_file.fileno())
+        if cdx_headers:
+            segment.cdxj_file.write(cdxj_line(cdx_headers, os.path.basename(segment.path), offset, length))
+            segment.cdxj_file.flush()
+        return segment.path, offset, length
+
+    def append(self, state, url, records, index_fields=None, cdx_headers=None):
+        """
+        Append serialized WARC records (e.g. a request and its response) to the state's segment.
+        Returns (segment path, offset, length) of the last record.
+        """
+        day = datetime.date.today().isoformat()
+        with self.lock:
+            return self._write(self._open(state, day), records, index_fields, url, cdx_headers)
+
+    def append_resource(self, state, url, data, content_type="text/html", index_fields=None):
+        """Store a page body as a WARC resource record."""
+        return self.append(state, url, [warc_record("resource", url, data, content_type)], index_fields)
+
+    def append_exchange(self, state, response, payload, index_fields=None, revisit_of=None):
+        """
+        Store the request and response of a fetch with its status, headers and fetch time.
+        The payload is bytes or a streamed body such as a page_fetcher.FetchedPage.
+        With revisit_of=(url, warc_date) only a revisit record pointing at the stored payload is written.
+        """
+        request_record, response_record, cdx_headers = exchange_records(response, payload, revisit_of=revisit_of)
+        return self.append(state, response.url, [request_record, response_record], index_fields, cdx_headers)
+
+
+SEGMENTS = SegmentWriter()
+atexit.register(SEGMENTS.close)
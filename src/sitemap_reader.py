@@ -0,0 +1,187 @@
+import logging
+import queue
+import threading
+import zlib
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Limits from the sitemaps.org protocol: 50MB uncompressed per sitemap file.
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024
+MAX_DEPTH = 3
+MAX_SITEMAPS = 500
+
+# publication_date is only present in Google News sitemaps (<news:news><news:publication_date>)
+SitemapEntry = namedtuple("SitemapEntry", ["loc", "lastmod", "publication_date"], defaults=(None,))
+
+_DONE = object()
+_SCHEDULED = object()
+
+
+def _local_name(tag):
+    """Strip the XML namespace from an element tag."""
+    return tag.rsplit('}', 1)[-1]
+
+
+class _ResponseReader:
+    """File-like reader over a streamed response that gunzips on the fly and enforces a size cap."""
+
+    def __init__(self, response, max_bytes, chunk_size=64 * 1024):
+        self.chunks = response.iter_content(chunk_size=chunk_size)
+        self.max_bytes = max_bytes
+        self.buffer = b''
+        self.total = 0
+        self.decompressor = None
+        self.first_chunk = True
+        self.truncated = False
+
+    def _next_chunk(self):
+        for chunk in self.chunks:
+            if self.first_chunk:
+                self.first_chunk = False
+                # Gzipped sitemaps (.xml.gz) are usually served without Content-Encoding
+                if chunk[:2] == b'\x1f\x8b':
+                    self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            if self.decompressor:
+                chunk = self.decompressor.decompress(chunk)
+            if chunk:
+                return chunk
+        return b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            if self.total >= self.max_bytes:
+                self.truncated = True
+                break
+            chunk = self._next_chunk()
+            if not chunk:
+                break
+            chunk = chunk[:self.max_bytes - self.total]
+            self.total += len(chunk)
+            self.buffer += chunk
+        if size < 0:
+            data, self.buffer = self.buffer, b''
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+def parse_sitemap(fileobj):
+    """
+    Incrementally parse a sitemap or sitemap index.
+    Yields ('url', SitemapEntry) for page entries and ('sitemap', SitemapEntry) for nested sitemaps.
+    """
+    context = ET.iterparse(fileobj, events=('start', 'end'))
+    root = None
+    for event, elem in context:
+        if event == 'start':
+            if root is None:
+                root = elem
+            continue
+        name = _local_name(elem.tag)
+        if name not in ('url', 'sitemap'):
+            continue
+        loc = lastmod = publication_date = None
+        for child in elem:
+            child_name = _local_name(child.tag)
+            if child_name == 'loc' and child.text:
+                loc = child.text.strip()
+            elif child_name == 'lastmod' and child.text:
+                lastmod = child.text.strip()
+            elif child_name == 'news':
+                for news_child in child:
+                    if _local_name(news_child.tag) == 'publication_date' and news_child.text:
+                        publication_date = news_child.text.strip()
+        # Drop processed elements so memory stays flat on large sitemaps
+        elem.clear()
+        root.clear()
+        if loc:
+            yield name, SitemapEntry(loc, lastmod, publication_date)
+
+
+def read_sitemap(sitemap_url, session=None, timeout=10, max_bytes=MAX_SITEMAP_BYTES, headers=None):
+    """Fetch a single (optionally gzipped) sitemap and yield its parsed items as a stream."""
+    session = session or requests
+    with session.get(sitemap_url, headers=headers, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        reader = _ResponseReader(response, max_bytes)
+        try:
+            yield from parse_sitemap(reader)
+        except ET.ParseError as e:
+            if reader.truncated:
+                logging.warning(f"Sitemap {sitemap_url} exceeded {max_bytes} bytes, truncated")
+            else:
+                logging.error(f"Error parsing sitemap {sitemap_url}: {e}")
+
+
+def iter_sitemap(sitemap_urls, session=None, timeout=10, max_depth=MAX_DEPTH, max_sitemaps=MAX_SITEMAPS,
+                 max_bytes=MAX_SITEMAP_BYTES, max_workers=4, headers=None):
+    """
+    Yield SitemapEntry(loc, lastmod, publication_date) for every page listed in the given sitemap(s).
+    Nested sitemap indexes are fetched concurrently, up to max_depth levels and max_sitemaps files.
+    """
+    if isinstance(sitemap_urls, str):
+        sitemap_urls = [sitemap_urls]
+    session = session or requests.Session()
+    entries = queue.Queue(maxsize=1000)
+    stop = threading.Event()
+    lock = threading.Lock()
+    seen = set()
+
+    def put(item):
+        # Blocking put gives backpressure; give up once the consumer has gone away
+        while not stop.is_set():
+            try:
+                entries.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def schedule(url, depth):
+        with lock:
+            if url in seen or len(seen) >= max_sitemaps:
+                return False
+            seen.add(url)
+        # Announce the child before it starts so its _DONE can never be counted first
+        if depth and not put(_SCHEDULED):
+            return False
+        executor.submit(walk, url, depth)
+        return True
+
+    def walk(url, depth):
+        try:
+            for kind, entry in read_sitemap(url, session, timeout, max_bytes, headers):
+                if stop.is_set():
+                    break
+                if kind == 'url':
+                    if not put(entry):
+                        break
+                elif depth < max_depth:
+                    schedule(entry.loc, depth + 1)
+        except requests.RequestException as e:
+            logging.error(f"Error fetching sitemap {url}: {e}")
+        except Exception as e:
+            logging.error(f"Error reading sitemap {url}: {e}")
+        finally:
+            put(_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    outstanding = 0
+    try:
+        for url in sitemap_urls:
+            if schedule(url, 0):
+                outstanding += 1
+        while outstanding:
+            item = entries.get()
+            if item is _DONE:
+                outstanding -= 1
+            elif item is _SCHEDULED:
+                outstanding += 1
+            else:
+                yield item
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
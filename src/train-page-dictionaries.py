@@ -0,0 +1,64 @@
+"""
+Train the per-site zstd dictionaries of the homepage snapshots (<hash>.html.zst) in a news/ tree.
+
+A site's homepages share most of their template, so a dictionary trained on its latest snapshots
+compresses each new one far better than zstd alone. A site gets a dictionary once it has 16
+snapshots and is retrained when its dictionary is 30 days old (see compression.py). Training is
+kept out of the collectors; run this from their working directory, e.g. daily from cron. A
+collector picks up new dictionaries when it starts.
+
+    python train-page-dictionaries.py
+    python train-page-dictionaries.py --root news/VA --force
+"""
+import argparse
+import collections
+import logging
+import os
+import time
+
+from article_catalog import NEWS_DIR, parse_news_path
+from compression import DICT_MAX_SAMPLES, DICT_MIN_SAMPLES, DICTIONARIES, read_page, zstandard
+
+
+def homepage_snapshots(root):
+    """Return {website_hash: [(collected_date, path), ...]} of the stored homepage snapshots."""
+    snapshots = collections.defaultdict(list)
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            if not filename.endswith((".html.zst", ".html.gz")):
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                _, collected_date, website_hash = parse_news_path(path)
+            except ValueError:
+                continue
+            if filename.split(".", 1)[0] == website_hash:
+                snapshots[website_hash].append((collected_date, path))
+    return snapshots
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default=NEWS_DIR, help="news/ directory with the homepage snapshots")
+    parser.add_argument("--force", action="store_true", help="retrain dictionaries that are not due yet")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if zstandard is None:
+        raise SystemExit("zstandard is required to train dictionaries: pip install zstandard")
+    start = time.perf_counter()
+    trained = skipped = 0
+    for website_hash, paths in sorted(homepage_snapshots(args.root).items()):
+        if len(paths) < DICT_MIN_SAMPLES or not (args.force or DICTIONARIES.needs_training(website_hash)):
+            skipped += 1
+            continue
+        samples = []
+        for _, path in sorted(paths, reverse=True)[:DICT_MAX_SAMPLES]:
+            try:
+                samples.append(read_page(path))
+            except (OSError, ValueError, EOFError) as e:
+                logging.warning(f"Skipping snapshot {path}: {e}")
+        if DICTIONARIES.train(website_hash, samples) is not None:
+            trained += 1
+    logging.info(f"Trained {trained} dictionaries, {skipped} sites not due or with fewer than "
+                 f"{DICT_MIN_SAMPLES} snapshots, in {time.perf_counter() - start:.1f}s")
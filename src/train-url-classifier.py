@@ -0,0 +1,157 @@
+"""
+Train url_classifier.npz, the URL model that lets the collectors skip is_news_article's network
+check for homepage links it is confident about, from the verdicts the collectors' network check
+already produced:
+
+  articles   links of the news/ tree's metadata records, and article_found events ("Found article:
+             ..." in older plain-text logs)
+  others     not_article_path, short_article and invalid_url events ("Path depth: ... is less for"
+             and "Word count is less for" in older logs)
+
+Records and events carry a verdict_source. Links the classifier itself decided, or that a news
+sitemap declared, are left out, so the model never learns from its own verdicts. Older records and
+events without one were written before the classifier and count as network checks.
+
+Per-link events are sampled in the log (see collector_logging.SAMPLE_EVERY), so each logged verdict
+stands for sampled_1_in verdicts. One link in five is held out to measure the model and to pick the
+accept/reject thresholds that reach --precision; the saved model is then refit on every link.
+Run it from the collector's working directory:
+
+    python train-url-classifier.py
+    python train-url-classifier.py --root news/VA --logs news_scraper.log* ../results/html/news_scraper.log
+"""
+import argparse
+import glob
+import json
+import logging
+import re
+import time
+import zlib
+
+import numpy as np
+
+from article_catalog import NEWS_DIR, iter_metadata_files, read_records
+from url_classifier import HASH_BITS, MODEL_PATH, feature_matrix, predict_probabilities, save_model, train
+
+POSITIVE_EVENTS = {'article_found'}
+NEGATIVE_EVENTS = {'not_article_path', 'short_article', 'invalid_url'}
+# Verdicts the model learns from: those of is_news_article's network check
+TRAINING_VERDICTS = {'network'}
+# Verdict lines of the plain-text logs written before structured logging
+_LEGACY_RE = re.compile(r" - INFO - (Found article|Path depth: \d+ is less for|Word count is less for):? (\S+)")
+
+
+def tree_links(root):
+    """Yield the links of saved articles whose metadata record says the network check accepted them."""
+    for path in iter_metadata_files(root):
+        for record in read_records(path):
+            if (isinstance(record, dict) and isinstance(record.get('link'), str)
+                    and record.get('verdict_source', 'network') in TRAINING_VERDICTS):
+                yield record['link']
+
+
+def log_verdicts(paths):
+    """Yield (url, label, weight) for every network-checked verdict in collector logs, JSON or plain text."""
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if line.startswith('{'):
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    name = event.get('event')
+                    if name in POSITIVE_EVENTS or name in NEGATIVE_EVENTS:
+                        if (isinstance(event.get('url'), str)
+                                and event.get('verdict_source', 'network') in TRAINING_VERDICTS):
+                            yield event['url'], int(name in POSITIVE_EVENTS), event.get('sampled_1_in', 1)
+                else:
+                    match = _LEGACY_RE.search(line)
+                    if match:
+                        yield match.group(2), int(match.group(1) == 'Found article'), 1
+
+
+def collect_examples(root, log_paths):
+    """
+    Labelled links as {url: (label, weight)}. A saved article is an article whatever else was logged
+    about it; repeated verdicts keep the largest weight.
+    """
+    examples = {}
+    for url, label, weight in log_verdicts(log_paths):
+        previous = examples.get(url)
+        if previous is None or (label, weight) > previous:
+            examples[url] = (label, weight)
+    for url in tree_links(root):
+        examples[url] = (1, max(1, examples.get(url, (0, 1))[1]))
+    return examples
+
+
+def pick_threshold(probabilities, labels, weights, precision, accept):
+    """
+    The loosest threshold whose decided links (p >= t when accepting, p <= t when rejecting) are
+    right with at least the given weighted precision; one that decides nothing if none is.
+    """
+    order = np.argsort(-probabilities if accept else probabilities, kind='stable')
+    correct = (labels[order] == int(accept)) * weights[order]
+    reached = np.cumsum(correct) >= precision * np.cumsum(weights[order])
+    if not reached.any():
+        return 1.01 if accept else -0.01
+    threshold = float(probabilities[order][np.flatnonzero(reached)[-1]])
+    return max(threshold, 0.5) if accept else min(threshold, 0.5)
+
+
+def evaluate(probabilities, labels, weights, accept, reject):
+    decided = (probabilities >= accept) | (probabilities <= reject)
+    correct = (probabilities >= accept) == (labels == 1)
+    total = weights.sum()
+    return {
+        'links': len(labels),
+        'coverage': float(weights[decided].sum() / total) if total else 0.0,
+        'accuracy': float(weights[decided & correct].sum() / weights[decided].sum()) if decided.any() else 0.0,
+        'articles_accepted': float(weights[(labels == 1) & (probabilities >= accept)].sum() /
+                                   max(weights[labels == 1].sum(), 1e-9)),
+        'others_rejected': float(weights[(labels == 0) & (probabilities <= reject)].sum() /
+                                 max(weights[labels == 0].sum(), 1e-9)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--root", default=NEWS_DIR, help="news/ directory with the metadata records")
+    parser.add_argument("--logs", nargs="*", default=None, help="collector logs (default: news_scraper.log*)")
+    parser.add_argument("--output", default=MODEL_PATH, help="model file to write")
+    parser.add_argument("--precision", type=float, default=0.98,
+                        help="weighted precision the accept and reject thresholds must reach on held-out links")
+    parser.add_argument("--bits", type=int, default=HASH_BITS, help="hash features into 2**bits weights")
+    parser.add_argument("--epochs", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    log_paths = args.logs if args.logs is not None else sorted(glob.glob("news_scraper.log*"))
+    examples = collect_examples(args.root, log_paths)
+    urls = list(examples)
+    labels = np.array([examples[url][0] for url in urls])
+    weights = np.array([examples[url][1] for url in urls], dtype=np.float64)
+    npositive = int(labels.sum())
+    logging.info(f"{len(urls)} labelled links ({npositive} articles, {len(urls) - npositive} others) "
+                 f"from {args.root} and {len(log_paths)} logs")
+    if not npositive or npositive == len(urls):
+        raise SystemExit("Training needs both articles and other links")
+
+    # A stable split, so reruns on the same verdicts hold out the same links
+    held_out = np.array([zlib.crc32(url.encode('utf-8')) % 5 == 0 for url in urls])
+    start = time.perf_counter()
+    model = train([url for url, held in zip(urls, held_out) if not held], labels[~held_out], weights[~held_out],
+                  args.bits, args.epochs)
+    probabilities = predict_probabilities(model, *feature_matrix([url for url, held in zip(urls, held_out) if held],
+                                                                 args.bits))
+    accept = pick_threshold(probabilities, labels[held_out], weights[held_out], args.precision, accept=True)
+    reject = pick_threshold(probabilities, labels[held_out], weights[held_out], args.precision, accept=False)
+    report = evaluate(probabilities, labels[held_out], weights[held_out], accept, reject)
+    logging.info(f"Held out {report['links']} links: thresholds accept >= {accept:.3f}, reject <= {reject:.3f}; "
+                 f"{report['coverage']:.1%} decided without a network check, {report['accuracy']:.1%} of them right "
+                 f"({report['articles_accepted']:.1%} of articles accepted, {report['others_rejected']:.1%} of others rejected)")
+
+    save_model(args.output, train(urls, labels, weights, args.bits, args.epochs), accept, reject,
+               links=len(urls), trained_time=time.time())
+    logging.info(f"Wrote {args.output} in {time.perf_counter() - start:.1f}s")
@@ -1,10 +1,11 @@
 import gzip
 import json
 import requests
-from bs4 import BeautifulSoup
 from tqdm import tqdm
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urljoin
+from sitemap_reader import iter_sitemap
+from html_links import LINK_PARSER, find_feed_link
 
 def get_robots_txt_url(url):
     """Get the robots.txt URL based on the website URL."""
@@ -41,45 +42,31 @@ def get_sitemap_url(url):
     return None
 
 def get_rss_from_sitemap(sitemap_url):
-    """Extract RSS feed links from the sitemap."""
-    try:
-        response = requests.get(sitemap_url, timeout=5)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, "xml")  # Parse as XML for sitemaps
-        rss_links = []
-        
-        # Look for any link that could point to an RSS feed in the sitemap
-        for loc in soup.find_all("loc"):
-            href = loc.text
-            if "rss" in href or "feed" in href:
-                rss_links.append(href)
-                
-        return rss_links if rss_links else None
-    except requests.RequestException:
-        return None
+    """Extract RSS feed links from the sitemap, following nested sitemap indexes."""
+    rss_links = []
+    # Stream <loc> entries instead of building the whole XML tree in memory
+    for entry in iter_sitemap(sitemap_url, timeout=5):
+        href = entry.loc
+        if "rss" in href or "feed" in href:
+            rss_links.append(href)
+
+    return rss_links if rss_links else None
     
 def get_rss_feed_url(url):
     """Fetch the RSS feed URL from the given website URL."""
     try:
         response = requests.get(url, timeout=5)
         response.raise_for_status()  # Check for HTTP errors
-        soup = BeautifulSoup(response.content, "html.parser")
+        # Parsed in a worker process; the fetching threads wait there when the parsers fall behind
+        feed_links = LINK_PARSER.parse(response.content).feed_links
         # Try to find the direct RSS link
-        rss_link = soup.find("link", type="application/rss+xml")
-        if rss_link and rss_link.get("href"):
-            return rss_link["href"]  # Return the direct RSS feed URL
+        rss_link = find_feed_link(feed_links, ["application/rss+xml"])
+        if rss_link:
+            return rss_link  # Return the direct RSS feed URL
     except requests.RequestException:
         pass  # Handle exceptions and continue
     return None
 
-# Load the gzipped JSON file
-file_path = "updated_usa_2016_2024_v4.json.gz"
-with gzip.open(file_path, 'rt', encoding='utf-8') as f:
-    json_data = json.load(f)
-
-# Prepare a list of tasks for parallel processing
-tasks = []
-
 # Create a function to process each media object and retrieve the RSS feed URL
 def process_media_object(media_object):
     website = media_object.get("website")
@@ -110,20 +97,25 @@ def process_media_object(media_object):
                 media_object["rss"].extend(rss_feed_url)
     return media_object
 
-# Use ThreadPoolExecutor to process media objects in parallel
-with ThreadPoolExecutor(max_workers=10) as executor:
-    futures = []
-    for state, media_types in json_data.items():
-        for media_type, media_objects in media_types.items():
-            for media_object in media_objects:
-                # Submit each media object for processing
-                futures.append(executor.submit(process_media_object, media_object))
-                
-    # Collect results with tqdm progress tracking
-    for future in tqdm(as_completed(futures), total=len(futures), desc="Processing media objects"):
-        future.result()  # Ensure all futures complete
+if __name__ == "__main__":
+    # Load the gzipped JSON file
+    file_path = "updated_usa_2016_2024_v4.json.gz"
+    with gzip.open(file_path, 'rt', encoding='utf-8') as f:
+        json_data = json.load(f)
+
+    # Use ThreadPoolExecutor to process media objects in parallel
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        futures = []
+        for state, media_types in json_data.items():
+            for media_type, media_objects in media_types.items():
+                for media_object in media_objects:
+                    # Submit each media object for processing
+                    futures.append(executor.submit(process_media_object, media_object))
 
-# Save the updated JSON data
-with open('updated_usa_2016_2024_with_sitemap.json', 'w', encoding='utf-8') as outfile:
-    json.dump(json_data, outfile, ensure_ascii=False, indent=4)
+        # Collect results with tqdm progress tracking
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Processing media objects"):
+            future.result()  # Ensure all futures complete
 
+    # Save the updated JSON data
+    with open('updated_usa_2016_2024_with_sitemap.json', 'w', encoding='utf-8') as outfile:
+        json.dump(json_data, outfile, ensure_ascii=False, indent=4)
@@ -0,0 +1,197 @@
+import logging
+import os
+import re
+import threading
+import zlib
+from urllib.parse import urlsplit
+
+try:
+    import numpy as np
+except ImportError:  # optional: without numpy every URL goes to the network check
+    np = None
+
+from collector_metrics import METRICS
+
+# Written by train-url-classifier.py; the collectors run without it, checking every link
+MODEL_PATH = "url_classifier.npz"
+# Features are hashed into 2**HASH_BITS weights
+HASH_BITS = 18
+# Default confidence thresholds; training stores ones calibrated on held-out verdicts in the model
+ACCEPT_PROBABILITY = 0.95
+REJECT_PROBABILITY = 0.05
+
+_TOKEN_RE = re.compile(r"[a-z]+|\d+")
+_MONTHS = {'jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'}
+_DATE_RES = (
+    ('ymd', re.compile(r"(?:19|20)\d\d[/-](?:0?[1-9]|1[0-2])[/-](?:0?[1-9]|[12]\d|3[01])(?:/|-|$)")),
+    ('ymon', re.compile(r"(?:19|20)\d\d/(?:%s)[a-z]*/" % '|'.join(_MONTHS))),
+    ('ym', re.compile(r"(?:19|20)\d\d/(?:0?[1-9]|1[0-2])/")),
+    ('compact', re.compile(r"(?<!\d)(?:19|20)\d\d(?:0[1-9]|1[0-2])(?:0[1-9]|[12]\d|3[01])(?!\d)")),
+)
+
+
+def _bucket(value, limits):
+    """Index of the first limit value is below, so lengths become a few coarse features."""
+    for i, limit in enumerate(limits):
+        if value < limit:
+            return i
+    return len(limits)
+
+
+def url_features(url):
+    """
+    The features of a URL, as strings: host and host/section priors, path depth, shape of the last
+    segment (digits, separators, length), date patterns, file extension, query parameter names, and
+    path tokens and token bigrams, with digit runs reduced to their length.
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return ['bias', 'invalid']
+    host = parts.netloc.lower().split('@')[-1].split(':')[0]
+    host = host[4:] if host.startswith('www.') else host
+    path = parts.path.lower()
+    segments = [segment for segment in path.split('/') if segment]
+    last = segments[-1] if segments else ''
+    stem, _, extension = last.rpartition('.') if '.' in last else (last, '', '')
+
+    features = ['bias', f'h={host}', f'd={min(len(segments), 8)}']
+    if not (parts.scheme and host):
+        features.append('invalid')
+    if segments:
+        features.append(f'hs={host}/{segments[0]}')
+    if last.isdigit():
+        features.append('last_digits')
+    if any(c in '-_.' for c in last):
+        features.append('last_special')
+    features.append(f'last_len={_bucket(len(last), (1, 8, 16, 32, 64))}')
+    features.append(f'last_words={_bucket(len(_TOKEN_RE.findall(stem)), (1, 2, 4, 6, 10))}')
+    if extension and extension.isalnum():
+        features.append(f'ext={extension[:8]}')
+    if path.endswith('/'):
+        features.append('slash')
+    for name, pattern in _DATE_RES:
+        if pattern.search(path):
+            features.append(f'date={name}')
+    if parts.query:
+        features.append('query')
+        features.extend(f'q={pair.split("=")[0][:20]}' for pair in parts.query.split('&')[:5])
+    if parts.fragment:
+        features.append('fragment')
+
+    tokens = []
+    for i, segment in enumerate(segments):
+        for token in _TOKEN_RE.findall(segment):
+            token = f'#{len(token)}' if token.isdigit() else token
+            tokens.append(token)
+            # Section words (first segments) and slug words mean different things
+            features.append(f't{min(i, 2)}={token}')
+    features.extend(f'b={first} {second}' for first, second in zip(tokens, tokens[1:]))
+    return features
+
+
+def hash_features(features, bits=HASH_BITS):
+    """Column indices of features; crc32 keeps them stable across processes, unlike hash()."""
+    mask = (1 << bits) - 1
+    return [zlib.crc32(feature.encode('utf-8')) & mask for feature in features]
+
+
+def feature_matrix(urls, bits=HASH_BITS):
+    """
+    The sparse binary feature matrix of a batch of URLs: (indices, starts), where the columns of URL i
+    are indices[starts[i]:starts[i + 1]]. Every URL has at least the bias column.
+    """
+    rows = [hash_features(url_features(url), bits) for url in urls]
+    lengths = np.fromiter((len(row) for row in rows), dtype=np.int64, count=len(rows))
+    starts = np.zeros(len(rows), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    indices = np.fromiter((index for row in rows for index in row), dtype=np.int64, count=int(lengths.sum()))
+    return indices, starts
+
+
+def predict_probabilities(weights, indices, starts):
+    if not len(starts):
+        return np.zeros(0)
+    logits = np.add.reduceat(weights[indices], starts)
+    return 1 / (1 + np.exp(-np.clip(logits, -30, 30)))
+
+
+def train(urls, labels, sample_weights=None, bits=HASH_BITS, epochs=200, learning_rate=0.5, l2=1e-6):
+    """
+    Fit hashed logistic regression to labelled URLs (1 = article) with full-batch AdaGrad.
+    Each class gets half of the total weight, so the (sampled, rarer) negatives count as much as
+    the positives. Returns the weight vector.
+    """
+    indices, starts = feature_matrix(urls, bits)
+    labels = np.asarray(labels, dtype=np.float64)
+    sample_weights = np.ones(len(labels)) if sample_weights is None else np.asarray(sample_weights, dtype=np.float64)
+    for label in (0, 1):
+        mask = labels == label
+        if sample_weights[mask].sum():
+            sample_weights[mask] *= 0.5 * len(labels) / sample_weights[mask].sum()
+    lengths = np.diff(np.append(starts, len(indices)))
+    weights = np.zeros(1 << bits)
+    squared_gradients = np.full(1 << bits, 1e-8)
+    for _ in range(epochs):
+        errors = (predict_probabilities(weights, indices, starts) - labels) * sample_weights
+        gradient = np.bincount(indices, weights=np.repeat(errors, lengths), minlength=1 << bits) / len(labels)
+        gradient += l2 * weights
+        squared_gradients += gradient * gradient
+        weights -= learning_rate * gradient / np.sqrt(squared_gradients)
+    return weights.astype(np.float32)
+
+
+def save_model(path, weights, accept=ACCEPT_PROBABILITY, reject=REJECT_PROBABILITY, **info):
+    np.savez_compressed(path, weights=weights, accept=accept, reject=reject, **info)
+
+
+class UrlClassifier:
+    """
+    Scores batches of homepage links with the model trained by train-url-classifier.py. classify()
+    answers True (article) or False (not an article) when the model is confident, and None when
+    the link still needs is_news_article's network check. The model is loaded on first use;
+    without it (or without numpy) every answer is None.
+    """
+
+    def __init__(self, path=MODEL_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.model = None
+        self.loaded = False
+
+    def _load(self):
+        with self.lock:
+            if not self.loaded:
+                self.loaded = True
+                if np is not None and os.path.exists(self.path):
+                    try:
+                        with np.load(self.path) as model:
+                            self.model = (model['weights'], float(model['accept']), float(model['reject']))
+                        logging.info(f"Loaded URL classifier {self.path}")
+                    except (OSError, KeyError, ValueError) as e:
+                        logging.error(f"Error loading URL classifier {self.path}: {e}")
+        return self.model
+
+    def probabilities(self, urls):
+        """Article probability of each URL, or None without a model."""
+        model = self._load()
+        if model is None or not urls:
+            return None
+        weights = model[0]
+        with METRICS.timer('url_classifier'):
+            return predict_probabilities(weights, *feature_matrix(urls, int(weights.size).bit_length() - 1))
+
+    def classify(self, urls):
+        """True/False/None per URL, as described in the class docstring."""
+        probabilities = self.probabilities(urls)
+        if probabilities is None:
+            return [None] * len(urls)
+        _, accept, reject = self.model
+        verdicts = [True if p >= accept else False if p <= reject else None for p in probabilities.tolist()]
+        for verdict in verdicts:
+            METRICS.inc('url_classifier_verdicts_total',
+                        verdict={True: 'article', False: 'not_article', None: 'unsure'}[verdict])
+        return verdicts
+
+
+URL_CLASSIFIER = UrlClassifier()
@@ -3,14 +3,17 @@ import json
 import os
 import hashlib
 import gzip
-import feedparser
 import datetime
 import requests
 import subprocess
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse, unquote, urlsplit
-from NwalaTextUtils.textutils import derefURI, cleanHtml
+from NwalaTextUtils.textutils import derefURI
 import time
+from seed_loader import iter_publications
+from feed_fetcher import fetch_feeds, FEED_STATS
+from article_catalog import CATALOG
+from article_scorer import is_article_text
+from html_links import LINK_PARSER
 import subprocess
 
 # Configure logging
@@ -23,12 +26,6 @@ logging.basicConfig(
     ]
 )
 
-logging.info("Starting the script...")
-
-# Load the JSON file
-with open("output.json", "r") as f:
-    data = json.load(f)
-
 # Define headers for HTTP requests
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/102.0.0.0 Safari/537.36'
@@ -65,12 +62,9 @@ def get_expanded_url(short_url):
 
 def extract_article_urls_from_html(html_content, base_url):
     """Extract all article URLs from the given HTML content."""
-    soup = BeautifulSoup(html_content, 'html.parser')
+    hrefs = LINK_PARSER.parse(html_content).anchors
     resolved_base = get_expanded_url(base_url)
-    return {
-        urljoin(resolved_base, link['href'])
-        for link in soup.find_all("a", href=True)
-    }
+    return {urljoin(resolved_base, href) for href in hrefs}
 
 
 def get_publication_date(entry):
@@ -101,13 +95,9 @@ def is_news_article(link):
 
     try:
         html = derefURI(link)
-        plaintext = cleanHtml(html)
-        count = len(plaintext)
-        if count > 20:
-            is_news_article = True
-        else:
-            logging.info(f"Word count is less for {link}\n {plaintext}\n")
-            is_news_article = False
+        is_news_article, reason = is_article_text(html)
+        if not is_news_article:
+            logging.info(f"Word count is less for {link} ({reason})\n")
     except Exception as e:
         # If an exception occurs, write the error message to the log file
         logging.error(f"Error processing link: {link} because of {e}\n")
@@ -187,12 +177,15 @@ def process_publication(state, publication, year, month, day):
         if archived_website_path:
             website_json = {
                 'website_link': website_url,
-                'publication_metadata': publication,
+                'publication_metadata': publication.metadata(),
                 'archived_time': datetime.datetime.now().isoformat(),
                 'archived_path': archived_website_path
             }
             # Save to file (append if the file doesn't exist yet)
             save_to_file(metadata_file_path, website_json, 'ab')
+            CATALOG.add_publication(state, website_hash, website_url, publication.media_type,
+                                    website_json['publication_metadata'].get('name'), website_json['archived_time'],
+                                    'browsertrix', archived_website_path)
             logging.info(f"Metadata of the website: {website_url} is successfully updated in the location: {metadata_file_path}")
     else:
         logging.info(f"File {metadata_file_path} already exists, skipping save.")
@@ -200,11 +193,11 @@ def process_publication(state, publication, year, month, day):
     article_json_objs = []
     nlinks = 0
 
-    # Process RSS Feeds
+    # Process RSS Feeds (all feeds of the publication are fetched concurrently, with timeouts)
+    feeds = fetch_feeds(rss_feeds)
     for rss_feed_url in rss_feeds:
         logging.info(f"Processing RSS feed: {rss_feed_url}")
-        feed = feedparser.parse(rss_feed_url)
-        for entry in feed.entries:
+        for entry in feeds[rss_feed_url]:
             article_url = entry.link
             if article_url and is_news_article(article_url):
                 logging.info(f"Found article: {article_url}")
@@ -250,6 +243,8 @@ def process_publication(state, publication, year, month, day):
     website_article_location = os.path.join(directory, f"{website_hash}_articles.jsonl.gz")
     logging.info(f"Articles of the website: {website_url} is successfully updated in the location: {website_article_location}")
     save_to_file(website_article_location, article_json_objs, 'ab')
+    CATALOG.add_articles(article_json_objs, state, website_hash, f"{year:04d}-{month:02d}-{day:02d}",
+                         website_article_location, publication.media_type)
     
 
 # Function to get the status code of a URL
@@ -262,16 +257,22 @@ def get_status_code(url):
         return None  # In case of error, return None
 
 # Run the Script
-while True:
-    for state, publications in data.items():
-        logging.info(f"Processing state: {state}")
-        for news_media in ['newspaper', 'tv', 'radio', 'broadcast']:
-            for publication in publications.get(news_media, []):
-                website_url = publication.get("website")
-                response_status = get_status_code(website_url)
+if __name__ == "__main__":
+    logging.info("Starting the script...")
+
+    while True:
+        # Stream compact records from the seed file instead of loading it whole
+        state = None
+        for publication in iter_publications("output.json"):
+            if publication.state != state:
+                state = publication.state
+                logging.info(f"Processing state: {state}")
+            website_url = publication.website
+            response_status = get_status_code(website_url)
+            logging.info(f"The response status of {website_url} is: {response_status}")
+            if response_status and (200 <= response_status < 300):
+                timestamp = datetime.datetime.now(datetime.timezone.utc)
                 logging.info(f"The response status of {website_url} is: {response_status}")
-                if response_status and (200 <= response_status < 300):
-                    timestamp = datetime.datetime.now(datetime.timezone.utc)
-                    logging.info(f"The response status of {website_url} is: {response_status}")
-                    process_publication(state, publication, timestamp.year, timestamp.month, timestamp.day)
-    time.sleep(1)  # Prevent overwhelming the server
+                process_publication(state, publication, timestamp.year, timestamp.month, timestamp.day)
+        logging.info(FEED_STATS.summary())
+        time.sleep(1)  # Prevent overwhelming the server
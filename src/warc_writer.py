@@ -0,0 +1,203 @@
+import base64
+import datetime
+import hashlib
+import json
+import uuid
+from urllib.parse import urlsplit
+
+# Hop-by-hop and transfer headers that no longer describe the stored (decoded) payload
+_PAYLOAD_HEADERS = ('content-encoding', 'transfer-encoding', 'content-length')
+REVISIT_PROFILE = "http://netpreserve.org/warc/1.1/revisit/identical-payload-digest"
+
+
+def warc_digest(data):
+    """Labelled SHA-256 digest in the base32 form used by WARC digests."""
+    return format_digest(hashlib.sha256(data).digest())
+
+
+def format_digest(digest):
+    """Label a raw SHA-256 digest (e.g. of a streamed body) in the WARC form."""
+    return "sha256:" + base64.b32encode(digest).decode('ascii')
+
+
+def warc_date(date=None):
+    date = date or datetime.datetime.now(datetime.timezone.utc)
+    return date.astimezone(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def new_record_id():
+    return f"<urn:uuid:{uuid.uuid4()}>"
+
+
+class StreamedRecord:
+    """A WARC record whose block is streamed from a body rather than held as bytes."""
+
+    def __init__(self, head, body, size):
+        self.head = head
+        self.body = body
+        self.size = size
+
+    def __iter__(self):
+        yield self.head
+        yield from self.body.iter_chunks()
+        yield b"\r\n\r\n"
+
+
+def warc_record_head(warc_type, url, block_length, block_digest, content_type, date=None, extra_headers=None,
+                     record_id=None):
+    """Serialize the header block of a WARC/1.1 record."""
+    headers = [
+        ("WARC-Type", warc_type),
+        ("WARC-Record-ID", record_id or new_record_id()),
+        ("WARC-Date", date if isinstance(date, str) else warc_date(date)),
+    ]
+    if url:
+        headers.append(("WARC-Target-URI", url))
+    headers.extend(extra_headers or [])
+    headers.extend([
+        ("WARC-Block-Digest", block_digest),
+        ("Content-Type", content_type),
+        ("Content-Length", str(block_length)),
+    ])
+    head = "WARC/1.1\r\n" + "".join(f"{name}: {value}\r\n" for name, value in headers) + "\r\n"
+    return head.encode('utf-8')
+
+
+def warc_record(warc_type, url, block, content_type, date=None, extra_headers=None, record_id=None):
+    """Serialize one WARC/1.1 record (uncompressed)."""
+    return warc_record_head(warc_type, url, len(block), warc_digest(block), content_type, date, extra_headers,
+                            record_id) + block + b"\r\n\r\n"
+
+
+def parse_warc_record(record):
+    """Split a serialized WARC record into (headers dict, block)."""
+    head, _, rest = record.partition(b"\r\n\r\n")
+    lines = head.decode('utf-8').split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines[1:])
+    return headers, rest[:int(headers["Content-Length"])]
+
+
+def _is_http_response(headers):
+    return headers.get("WARC-Type") in ("response", "revisit") and headers.get("Content-Type", "").startswith("application/http")
+
+
+def record_payload(headers, block):
+    """Return the payload of a record: the HTTP body of responses, the block of resources."""
+    if _is_http_response(headers):
+        return block.partition(b"\r\n\r\n")[2]
+    return block
+
+
+def record_http_headers(headers, block):
+    """Return the HTTP headers of a response record (lower-cased names), or the Content-Type of a resource."""
+    if _is_http_response(headers):
+        lines = block.partition(b"\r\n\r\n")[0].decode('iso-8859-1').split("\r\n")[1:]
+        return {name.strip().lower(): value.strip() for name, _, value in (line.partition(":") for line in lines)}
+    return {'content-type': headers.get("Content-Type", "")}
+
+
+def warcinfo_record(filename):
+    fields = f"software: html-news-collector\r\nformat: WARC File Format 1.1\r\nfilename: {filename}\r\n"
+    return warc_record("warcinfo", None, fields.encode('utf-8'), "application/warc-fields",
+                       extra_headers=[("WARC-Filename", filename)])
+
+
+def _http_version(response):
+    version = getattr(getattr(response, 'raw', None), 'version', 11)
+    return "HTTP/1.0" if version == 10 else "HTTP/1.1"
+
+
+def http_request_block(response):
+    """Rebuild the HTTP request of a requests.Response as sent."""
+    request = response.request
+    parts = urlsplit(request.url)
+    target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    lines = [f"{request.method} {target} {_http_version(response)}", f"Host: {parts.netloc}"]
+    lines.extend(f"{name}: {value}" for name, value in request.headers.items() if name.lower() != 'host')
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('utf-8')
+
+
+def http_response_head(response, payload_length):
+    """HTTP status line and headers of a requests.Response, describing the decoded payload."""
+    lines = [f"{_http_version(response)} {response.status_code} {response.reason or ''}".rstrip()]
+    lines.extend(f"{name}: {value}" for name, value in response.headers.items()
+                 if name.lower() not in _PAYLOAD_HEADERS)
+    lines.append(f"Content-Length: {payload_length}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('utf-8')
+
+
+def exchange_records(response, payload, date=None, revisit_of=None):
+    """
+    Build the request and response records of a fetch. With revisit_of=(url, warc_date), the
+    payload is already stored, so a revisit record with the HTTP headers only is written instead.
+    The payload is bytes, or a streamed body (size, digest, iter_chunks()) that becomes a StreamedRecord.
+    Returns (request record, response record, response record headers).
+    """
+    date = warc_date(date)
+    response_id = new_record_id()
+    streamed = not isinstance(payload, bytes)
+    payload_size = payload.size if streamed else len(payload)
+    payload_digest = format_digest(payload.digest) if streamed else warc_digest(payload)
+    url = response.url
+    if revisit_of:
+        block = http_response_head(response, payload_size)
+        extra_headers = [
+            ("WARC-Profile", REVISIT_PROFILE),
+            ("WARC-Refers-To-Target-URI", revisit_of[0]),
+            ("WARC-Refers-To-Date", revisit_of[1]),
+            ("WARC-Payload-Digest", payload_digest),
+        ]
+        response_record = warc_record("revisit", url, block, "application/http;msgtype=response", date,
+                                      extra_headers, response_id)
+    elif streamed:
+        http_head = http_response_head(response, payload_size)
+        block_hash = hashlib.sha256(http_head)
+        for chunk in payload.iter_chunks():
+            block_hash.update(chunk)
+        head = warc_record_head("response", url, len(http_head) + payload_size, format_digest(block_hash.digest()),
+                                "application/http;msgtype=response", date,
+                                [("WARC-Payload-Digest", payload_digest)], response_id) + http_head
+        response_record = StreamedRecord(head, payload, len(head) + payload_size + 4)
+    else:
+        block = http_response_head(response, len(payload)) + payload
+        response_record = warc_record("response", url, block, "application/http;msgtype=response", date,
+                                      [("WARC-Payload-Digest", payload_digest)], response_id)
+    request_record = warc_record("request", url, http_request_block(response), "application/http;msgtype=request",
+                                 date, [("WARC-Concurrent-To", response_id)])
+    record_headers = {
+        'url': url,
+        'date': date,
+        'status': response.status_code,
+        'mime': response.headers.get('content-type', '').split(';')[0].strip() or 'unk',
+        'digest': payload_digest,
+        'revisit': bool(revisit_of),
+    }
+    return request_record, response_record, record_headers
+
+
+def surt(url):
+    """Sort-friendly URI Reordering Transform used as the CDXJ key (e.g. com,example)/path?q)."""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    key = ",".join(reversed(host.split("."))) if host else ""
+    if parts.port and parts.port not in (80, 443):
+        key += f":{parts.port}"
+    path = (parts.path or "/").lower()
+    return f"{key}){path}" + (f"?{parts.query.lower()}" if parts.query else "")
+
+
+def cdxj_line(record_headers, filename, offset, length):
+    """One CDXJ index line for a response or revisit record."""
+    timestamp = record_headers['date'].replace("-", "").replace(":", "").replace("T", "").rstrip("Z")
+    fields = {
+        'url': record_headers['url'],
+        'mime': 'warc/revisit' if record_headers['revisit'] else record_headers['mime'],
+        'status': str(record_headers['status']),
+        'digest': record_headers['digest'],
+        'length': str(length),
+        'offset': str(offset),
+        'filename': filename,
+    }
+    return f"{surt(record_headers['url'])} {timestamp} {json.dumps(fields)}\n"
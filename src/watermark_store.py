@@ -0,0 +1,100 @@
+import datetime
+import json
+import logging
+import os
+
+# Per-site collection state that must survive across days (news/ is partitioned by day)
+WATERMARK_DIR = "watermarks"
+
+# Feed entries older than the newest entry seen minus this window are skipped;
+# the window absorbs feeds that publish entries out of order.
+FEED_SAFETY_WINDOW = datetime.timedelta(hours=6)
+MAX_SEEN_FEED_IDS = 500
+
+
+def watermark_path(state, website_hash):
+    """Return the path of the watermark file for a website."""
+    return os.path.join(WATERMARK_DIR, state, f"{website_hash}.json")
+
+
+def load_watermarks(state, website_hash):
+    """Load the stored watermarks for a website, or an empty dict if there are none."""
+    filepath = watermark_path(state, website_hash)
+    if os.path.exists(filepath):
+        try:
+            with open(filepath, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logging.error(f"Error reading watermarks {filepath}: {e}")
+    return {}
+
+
+def save_watermarks(state, website_hash, watermarks):
+    """Atomically write the watermarks of a website."""
+    filepath = watermark_path(state, website_hash)
+    try:
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        tmp_filepath = f"{filepath}.tmp"
+        with open(tmp_filepath, "w", encoding="utf-8") as f:
+            json.dump(watermarks, f)
+        os.replace(tmp_filepath, filepath)
+    except Exception as e:
+        logging.error(f"Error saving watermarks {filepath}: {e}")
+
+
+def get_entry_id(entry):
+    """Return a stable identifier for an RSS/Atom entry."""
+    return entry.get("id") or entry.get("guid") or entry.get("link")
+
+
+def get_entry_published(entry):
+    """Return the (UTC) publication time of an RSS/Atom entry, if it has one."""
+    published_time = entry.get("published_parsed") or entry.get("updated_parsed")
+    return datetime.datetime(*published_time[:6]) if published_time else None
+
+
+def new_feed_entries(watermarks, feed_url, entries, safety_window=FEED_SAFETY_WINDOW):
+    """
+    Return the feed entries that are not marked processed and not older than the feed's
+    watermark minus the safety window. The watermark is first moved to the newest processed
+    entry, but never past an entry still to process, so entries left over by an earlier pass
+    (article limit, failed check or fetch) are not cut off.
+    """
+    feed_state = watermarks.get("feeds", {}).get(feed_url, {})
+    seen_ids = set(feed_state.get("seen_ids", []))
+    newest_published = feed_state.get("newest_published")
+    cutoff = datetime.datetime.fromisoformat(newest_published) - safety_window if newest_published else None
+
+    new_entries, processed, skipped = [], [], 0
+    for entry in entries:
+        published = get_entry_published(entry)
+        if get_entry_id(entry) in seen_ids:
+            skipped += 1
+            if published:
+                processed.append(published)
+        elif cutoff and published and published < cutoff:
+            skipped += 1
+        else:
+            new_entries.append(entry)
+    if processed:
+        watermark = max(processed)
+        pending = [get_entry_published(entry) for entry in new_entries if get_entry_published(entry)]
+        if pending:
+            watermark = min(watermark, min(pending))
+        if not newest_published or watermark > datetime.datetime.fromisoformat(newest_published):
+            watermarks.setdefault("feeds", {}).setdefault(feed_url, {})["newest_published"] = watermark.isoformat()
+    if skipped:
+        logging.info(f"Skipped {skipped} entries of {feed_url} already seen in earlier passes")
+    return new_entries
+
+
+def mark_feed_entry(watermarks, feed_url, entry):
+    """Record an entry as processed (its article saved or rejected) in the feed's watermark."""
+    feed_state = watermarks.setdefault("feeds", {}).setdefault(feed_url, {})
+    entry_id = get_entry_id(entry)
+    if entry_id:
+        seen_ids = feed_state.setdefault("seen_ids", [])
+        if entry_id not in seen_ids:
+            seen_ids.append(entry_id)
+            del seen_ids[:-MAX_SEEN_FEED_IDS]
+        feed_state["last_id"] = entry_id
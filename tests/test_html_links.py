@@ -0,0 +1,64 @@
+"""
+Tests of the link parser pool (src/html_links.py). Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import os
+import signal
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from html_links import LinkParserPool, find_feed_link, parse_links  # noqa: E402
+
+PAGE = ('<html><head><link type="application/rss+xml" href="/feed.xml"></head>'
+        '<body><a href="/news/2024/12/18/story">Story</a><a href="/about">About</a><a>none</a></body></html>')
+
+
+class LinkParserPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = LinkParserPool(workers=1)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_parse(self):
+        links = self.pool.parse(PAGE)
+        self.assertEqual(links.anchors, ['/news/2024/12/18/story', '/about'])
+        self.assertEqual(find_feed_link(links.feed_links, ["application/rss+xml"]), '/feed.xml')
+
+    def test_killed_worker(self):
+        self.pool.parse(PAGE)
+        broken = self.pool.pool
+        for process in list(broken._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+            process.join()
+        # The page is parsed inline, and the next one in a new pool
+        self.assertEqual(self.pool.parse(PAGE), parse_links(PAGE))
+        self.assertEqual(self.pool.parse(PAGE), parse_links(PAGE))
+        self.assertIsNotNone(self.pool.pool)
+        self.assertIsNot(self.pool.pool, broken)
+
+    def test_timeout(self):
+        pool = LinkParserPool(workers=1, max_pending=1, timeout=0)
+        try:
+            self.assertEqual(pool.parse(PAGE * 200), parse_links(PAGE * 200))
+            # The abandoned parse gave its queue slot back, so the pool is still usable
+            pool.timeout = 60
+            self.assertEqual(pool.parse(PAGE), parse_links(PAGE))
+        finally:
+            pool.close()
+
+    def test_backpressure_slots_released(self):
+        pool = LinkParserPool(workers=1, max_pending=2)
+        try:
+            for _ in range(10):
+                pool.parse(PAGE)
+        finally:
+            pool.close()
+
+
+if __name__ == "__main__":
+    unittest.main()